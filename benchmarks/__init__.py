@@ -0,0 +1,8 @@
+"""
+View-level benchmarks for the hot pages.
+
+Scenarios live in benchmarks.scenarios and are run by
+`manage.py run_benchmarks`, which seeds datasets of increasing size,
+drives each scenario through the Django test client and compares the
+JSON report against a stored baseline.
+"""
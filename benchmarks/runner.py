@@ -0,0 +1,154 @@
+"""
+Dataset preparation, measurement and baseline comparison for the benchmarks.
+"""
+import io
+import statistics
+import time
+import tracemalloc
+from django.core.management import call_command
+from django.db import connection, reset_queries, transaction
+from django.db.models import Count
+from django.test import Client as TestClient
+from django.test.utils import CaptureQueriesContext
+from clients.models import Client
+from projects.models import Project, Issue
+from users.models import CustomUser
+from .scenarios import SCENARIOS
+
+# Metrics compared against the baseline, and whether they may grow by the tolerance
+COMPARED_METRICS = {
+    'p50_ms': True,
+    'p95_ms': True,
+    'bytes': True,
+    'peak_memory_kb': True,
+    'queries': False,
+}
+
+
+def dataset_label(size):
+    return f'bench{size}'
+
+
+def prepare_dataset(size, seed, flush=False, stdout=None):
+    """Seed the dataset of this size unless it already exists, and pick the objects the scenarios use"""
+    label = dataset_label(size)
+    if flush or not Client.objects.filter(company_name__startswith=f'{label} ').exists():
+        args = ['--issues', str(size), '--clients', '5', '--projects-per-client', '2', '--users', '30']
+        args += ['--seed', str(seed), '--label', label]
+        if flush:
+            args.append('--flush')
+        call_command('seed_perf_data', *args, stdout=stdout or io.StringIO())
+
+    # The busiest project, milestone and issue are the pages that hurt most
+    project = Project.objects.filter(name__startswith=f'{label} ').annotate(
+        total=Count('issues')
+    ).order_by('-total').first()
+    issue = Issue.objects.filter(project=project).annotate(
+        total=Count('comments')
+    ).order_by('-total').select_related('milestone').first()
+    return {
+        'label': label,
+        'project': project,
+        'milestone': issue.milestone,
+        'issue': issue,
+        'admin': CustomUser.objects.get(email=f'{label}-user0@example.com'),
+        'member': CustomUser.objects.filter(assigned_projects=project).exclude(
+            email=f'{label}-user0@example.com'
+        ).first(),
+    }
+
+
+def _content_length(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def _send(client, request):
+    method = getattr(client, request.get('method', 'get'))
+    # Every request runs in a transaction that is rolled back, so POSTs leave the dataset unchanged
+    with transaction.atomic():
+        response = method(request['url'], request.get('data'), headers=request.get('headers'))
+        size = _content_length(response)
+        transaction.set_rollback(True)
+    return response, size
+
+
+def run_scenario(request, iterations=10, warmup=2):
+    """Measure one request: latency percentiles, query count, response size and peak traced memory"""
+    client = TestClient()
+    client.force_login(request['user'])
+
+    for _ in range(warmup):
+        _send(client, request)
+
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response, size = _send(client, request)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    # Each request clears the query log, so start from an empty one and count
+    # before the next request clears it again
+    reset_queries()
+    with CaptureQueriesContext(connection) as ctx:
+        _send(client, request)
+    query_count = len(ctx.captured_queries)
+
+    # Traced separately because tracemalloc slows every allocation down
+    tracemalloc.start()
+    try:
+        _send(client, request)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'status': response.status_code,
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        'queries': query_count,
+        'bytes': size,
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run_suite(sizes, names=None, iterations=10, seed=42, flush=False, stdout=None):
+    """Run the selected scenarios against a dataset of each size and return the report"""
+    report = {'iterations': iterations, 'seed': seed, 'datasets': {}}
+    for size in sizes:
+        data = prepare_dataset(size, seed, flush=flush, stdout=stdout)
+        results = {}
+        for name, build in SCENARIOS.items():
+            if names and name not in names:
+                continue
+            try:
+                results[name] = run_scenario(build(data), iterations=iterations)
+            except Exception as e:
+                results[name] = {'error': f"{type(e).__name__}: {e}"}
+        report['datasets'][str(size)] = results
+    return report
+
+
+def compare(report, baseline, tolerance=0.25):
+    """
+    Return a list of regressions of report against baseline.
+
+    Timings, sizes and memory may grow by the tolerance before they count;
+    any growth in the number of queries is a regression.
+    """
+    regressions = []
+    for size, results in report['datasets'].items():
+        for name, result in results.items():
+            previous = baseline.get('datasets', {}).get(size, {}).get(name)
+            if not previous or 'error' in previous:
+                continue
+            if 'error' in result:
+                regressions.append(f"{name} @ {size}: {result['error']}")
+                continue
+            for metric, tolerated in COMPARED_METRICS.items():
+                limit = previous[metric] * (1 + tolerance) if tolerated else previous[metric]
+                if result[metric] > limit:
+                    regressions.append(f"{name} @ {size}: {metric} {previous[metric]} -> {result[metric]}")
+    return regressions
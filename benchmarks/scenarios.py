@@ -0,0 +1,93 @@
+"""
+The requests each benchmark run measures.
+
+A scenario receives the objects picked from a seeded dataset and returns
+the request to make: the user to log in as, the method, URL, POST data
+and extra headers.
+"""
+from django.urls import reverse
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    """Register a function that builds a benchmark request from a dataset"""
+    def register(build):
+        SCENARIOS[name] = build
+        return build
+    return register
+
+
+@scenario('project_detail')
+def project_detail(data):
+    return {
+        'user': data['admin'],
+        'url': reverse('projects:project_detail', kwargs={'pk': data['project'].pk}),
+    }
+
+
+@scenario('project_issues_section')
+def project_issues_section(data):
+    return {
+        'user': data['admin'],
+        'url': reverse('projects:project_section', kwargs={'pk': data['project'].pk, 'section': 'issues'}),
+    }
+
+
+@scenario('issue_preview')
+def issue_preview(data):
+    return {
+        'user': data['admin'],
+        'url': reverse('projects:issue_preview', kwargs={'project_id': data['project'].pk, 'pk': data['issue'].pk}),
+    }
+
+
+@scenario('milestone_detail')
+def milestone_detail(data):
+    return {
+        'user': data['admin'],
+        'url': reverse('projects:milestone_detail', kwargs={'pk': data['milestone'].pk}),
+    }
+
+
+@scenario('issue_detail')
+def issue_detail(data):
+    return {
+        'user': data['admin'],
+        'url': reverse('projects:issue_detail', kwargs={'project_id': data['project'].pk, 'pk': data['issue'].pk}),
+    }
+
+
+@scenario('issue_detail_comment_ajax')
+def issue_detail_comment(data):
+    return {
+        'user': data['admin'],
+        'method': 'post',
+        'url': reverse('projects:issue_detail', kwargs={'project_id': data['project'].pk, 'pk': data['issue'].pk}),
+        'data': {'comment_type': 'external', 'text': 'Benchmark comment', 'milestone': data['issue'].milestone_id},
+        'headers': {'X-Requested-With': 'XMLHttpRequest'},
+    }
+
+
+@scenario('dashboard')
+def dashboard(data):
+    return {
+        'user': data['member'],
+        'url': reverse('dashboard'),
+    }
+
+
+@scenario('client_dashboard')
+def client_dashboard(data):
+    return {
+        'user': data['admin'],
+        'url': reverse('clients:client_dashboard'),
+    }
+
+
+@scenario('export_project')
+def export_project(data):
+    return {
+        'user': data['admin'],
+        'url': reverse('projects:export_project', kwargs={'pk': data['project'].pk}),
+    }
@@ -1,3 +1,97 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from perspectivetracker.query_budgets import QueryBudgetMixin, budget
+from projects.models import Project, ProjectType
+from users.models import CustomUser, Role
+from .models import Client, ClientCoworker
+
+
+def client_kwargs(data):
+    return {'pk': data['client'].pk}
+
+
+def note_kwargs(data):
+    return {'pk': data['note'].pk}
+
+
+def coworker_kwargs(data):
+    return {'pk': data['coworker'].pk}
+
+
+class ClientQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Every clients URL stays within its query budget however much data it shows"""
+    urlconf = 'clients.urls'
+    budgets = {
+        'client_list': budget(10),
+        'client_dashboard': budget(17),
+        'client_progress_data': budget(12, lambda data: {'client_id': data['client'].pk}),
+        'client_create': budget(8),
+        'client_detail': budget(11, client_kwargs),
+        'client_edit': budget(9, client_kwargs),
+        'client_delete': budget(9, client_kwargs),
+        'note_create': budget(8, lambda data: {'client_pk': data['client'].pk}),
+        'note_detail': budget(10, note_kwargs),
+        'note_update': budget(9, note_kwargs),
+        'note_delete': budget(10, note_kwargs),
+        'coworker_delete': budget(0, coworker_kwargs, skip='clients/coworker_confirm_delete.html does not exist'),
+        'coworker_update': budget(0, coworker_kwargs, skip='clients/coworker_update_form.html does not exist'),
+        'resend_invitation': budget(0, coworker_kwargs, skip='clients/resend_invitation_confirm.html does not exist'),
+        'accept_invitation': budget(
+            0,
+            lambda data: {'token': data['coworker'].invitation_token},
+            skip='accept_invitation redirects to the unnamespaced client_detail URL',
+        ),
+    }
+
+
+class ClientDashboardTests(TestCase):
+    """The dashboard shows regular users the projects of the clients they work with"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email='coworker@example.com', password='password', role=Role.objects.get(name=Role.USER)
+        )
+        cls.client_record = Client.objects.create(company_name='Acme', contact_name='Cleo', email='cleo@example.com')
+        cls.other_client = Client.objects.create(company_name='Globex', contact_name='Hank', email='hank@example.com')
+        ClientCoworker.objects.create(client=cls.client_record, user=cls.user, status='active')
+        cls.project_type = ProjectType.objects.create(name='Accessibility')
+        # Not assigned to the user: the dashboard scope is the client, not the project team
+        Project.objects.create(name='Audit', client=cls.client_record, status='completed', project_type=cls.project_type)
+        Project.objects.create(name='Retest', client=cls.client_record, status='active', project_type=cls.project_type)
+        Project.objects.create(name='Elsewhere', client=cls.other_client, status='completed', project_type=cls.project_type)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_dashboard_counts_the_projects_of_the_users_clients(self):
+        response = self.client.get(reverse('clients:client_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_projects'], 2)
+        self.assertEqual(response.context['completed_projects'], 1)
+        self.assertIsNotNone(response.context['avg_completion_time'])
+
+    def test_dashboard_query_count_does_not_grow_with_projects(self):
+        url = reverse('clients:client_dashboard')
+        self.client.get(url)
+        with self.assertNumQueries(12):
+            self.client.get(url)
+        for i in range(5):
+            Project.objects.create(name=f'Audit {i}', client=self.client_record, status='completed', project_type=self.project_type)
+        with self.assertNumQueries(12):
+            self.client.get(url)
+
+    def test_progress_data_is_limited_to_the_users_clients(self):
+        response = self.client.get(reverse('clients:client_progress_data', kwargs={'client_id': self.client_record.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(item['count'] for item in response.json()['monthly_completion']), 1)
+
+        response = self.client.get(reverse('clients:client_progress_data', kwargs={'client_id': self.other_client.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_progress_etag_is_not_computed_for_other_clients(self):
+        url = reverse('clients:client_progress_data', kwargs={'client_id': self.other_client.pk})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
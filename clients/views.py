@@ -11,7 +11,10 @@ from .models import Client, ClientNote, ClientCoworker
 from .forms import ClientForm, ClientNoteForm, ClientCoworkerForm
 from users.views import admin_required, staff_required
 from users.models import CustomUser, Role
-from django.db.models import Q, Count, Avg
+from django.db.models import Q, Count, Avg, Max, F, DurationField
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+import hashlib
 import json
 import uuid
 from django.utils import timezone
@@ -129,8 +132,8 @@ def client_detail(request, pk):
     if not has_access:
         return HttpResponseForbidden("You don't have permission to view this client.")
     
-    notes = client.notes.all()
-    coworkers = client.coworkers.all()
+    notes = client.notes.select_related('author')
+    coworkers = client.coworkers.select_related('user')
     
     # Handle new note form
     if request.method == 'POST' and 'note_form' in request.POST:
@@ -577,65 +580,65 @@ def send_coworker_invitation(request, coworker):
     
     return True
 
+def _is_staff_member(user):
+    return user.is_superuser or bool(user.role and user.role.name in ['admin', 'staff'])
+
+def _dashboard_clients(user):
+    """Clients whose figures the user may see: all of them for admins and staff, otherwise those they work with"""
+    if _is_staff_member(user):
+        return Client.objects.all()
+    # The same link client_list uses for regular users
+    return Client.objects.filter(coworkers__user=user, coworkers__status='active')
+
+def _completed_projects(projects):
+    """Completed projects; a project's last update is when it was completed, as there is no completion date"""
+    return projects.filter(status='completed')
+
 @login_required
 def client_dashboard(request):
     """Display client dashboard with charts and progress"""
+    is_staff_member = _is_staff_member(request.user)
+    
     # Get clients based on user role
-    if request.user.is_superuser or (request.user.role and request.user.role.name in ['admin', 'staff']):
-        # Admins and staff can see all clients
-        clients = Client.objects.all()
+    clients = _dashboard_clients(request.user)
+    if is_staff_member:
         logger.info(f"Admin/Staff user {request.user.email} accessing dashboard - showing all clients")
     else:
-        # Regular users can only see their assigned clients
-        clients = Client.objects.filter(assigned_to=request.user)
         logger.info(f"Regular user {request.user.email} accessing dashboard - showing assigned clients")
     
-    # Get project statistics based on user role
-    if request.user.is_superuser or (request.user.role and request.user.role.name in ['admin', 'staff']):
-        total_projects = Project.objects.all().count()
-        active_projects = Project.objects.filter(status='active').count()
-        completed_projects = Project.objects.filter(status='completed').count()
-        status_distribution = Project.objects.values('status').annotate(count=Count('id'))
-        completed_projects_data = Project.objects.filter(
-            status='completed',
-            completed_date__isnull=False
-        )
+    # Get project statistics for the projects of those clients
+    projects = Project.objects.all() if is_staff_member else Project.objects.filter(client__in=clients)
+    project_counts = projects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='active')),
+        completed=Count('id', filter=Q(status='completed')),
+    )
+    total_projects = project_counts['total']
+    active_projects = project_counts['active']
+    completed_projects = project_counts['completed']
+    status_distribution = projects.values('status').annotate(count=Count('id'))
+    completed_projects_data = _completed_projects(projects)
+    if is_staff_member:
         total_comments = ClientNote.objects.count()
     else:
-        total_projects = Project.objects.filter(client__in=clients).count()
-        active_projects = Project.objects.filter(client__in=clients, status='active').count()
-        completed_projects = Project.objects.filter(client__in=clients, status='completed').count()
-        status_distribution = Project.objects.filter(client__in=clients).values('status').annotate(count=Count('id'))
-        completed_projects_data = Project.objects.filter(
-            client__in=clients,
-            status='completed',
-            completed_date__isnull=False
-        )
         total_comments = ClientNote.objects.filter(client__in=clients).count()
     
-    # Calculate average completion time
-    avg_completion_time = completed_projects_data.aggregate(
-        avg_days=Avg('completed_date') - Avg('created_at')
-    )['avg_days']
+    # Calculate average completion time in days
+    avg_duration = completed_projects_data.aggregate(
+        avg=Avg(F('updated_at') - F('created_at'), output_field=DurationField())
+    )['avg']
+    avg_completion_time = round(avg_duration.total_seconds() / 86400, 1) if avg_duration is not None else None
     
     # Get monthly completion data
-    if request.user.is_superuser or (request.user.role and request.user.role.name in ['admin', 'staff']):
-        monthly_completion = Project.objects.filter(
-            status='completed',
-            completed_date__isnull=False
-        ).values('completed_date__month').annotate(count=Count('id'))
-        
+    monthly_completion = completed_projects_data.annotate(
+        month=ExtractMonth('updated_at')
+    ).values('month').annotate(count=Count('id'))
+    if is_staff_member:
         # Get monthly comment data
         monthly_comments = ClientNote.objects.annotate(
             month=ExtractMonth('created_at')
         ).values('month').annotate(count=Count('id'))
     else:
-        monthly_completion = Project.objects.filter(
-            client__in=clients,
-            status='completed',
-            completed_date__isnull=False
-        ).values('completed_date__month').annotate(count=Count('id'))
-        
         # Get monthly comment data for assigned clients
         monthly_comments = ClientNote.objects.filter(
             client__in=clients
@@ -659,13 +662,13 @@ def client_dashboard(request):
     
     # Get additional admin-only data
     admin_data = {}
-    if request.user.is_superuser or (request.user.role and request.user.role.name in ['admin', 'staff']):
+    if is_staff_member:
         admin_data = {
             'total_clients': Client.objects.count(),
             'total_users': CustomUser.objects.count(),
-            'recent_activities': Project.objects.order_by('-created_at')[:5],
+            'recent_activities': Project.objects.with_summary().order_by('-created_at')[:5],
             'top_clients': Client.objects.annotate(
-                project_count=Count('project')
+                project_count=Count('projects')
             ).order_by('-project_count')[:5],
             'recent_comments': ClientNote.objects.select_related('client', 'author').order_by('-created_at')[:5]
         }
@@ -678,16 +681,28 @@ def client_dashboard(request):
         'completed_projects': completed_projects,
         'avg_completion_time': avg_completion_time,
         'total_comments': total_comments,
-        'is_admin': request.user.is_superuser or (request.user.role and request.user.role.name in ['admin', 'staff']),
+        'is_admin': is_staff_member,
         'admin_data': admin_data
     }
     
     return render(request, 'clients/dashboard.html', context)
 
+def _client_progress_etag(request, client_id):
+    """Validator for the progress data: it only changes when one of the client's projects does"""
+    # Clients the user may not see get no validator, so the view answers them with a 404
+    if not _dashboard_clients(request.user).filter(pk=client_id).exists():
+        return None
+    projects = Project.objects.filter(client_id=client_id).aggregate(latest=Max('updated_at'), total=Count('id'))
+    # The count catches deleted projects, which leave the latest update unchanged
+    validator = f"{projects['latest']}:{projects['total']}:{request.user.pk}"
+    return hashlib.md5(validator.encode(), usedforsecurity=False).hexdigest()
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_client_progress_etag)
 def get_client_progress_data(request, client_id):
     """API endpoint to get client progress data for charts"""
-    client = get_object_or_404(Client, id=client_id, assigned_to=request.user)
+    client = get_object_or_404(_dashboard_clients(request.user), id=client_id)
     
     # Get project status distribution for this client
     status_distribution = Project.objects.filter(
@@ -695,11 +710,9 @@ def get_client_progress_data(request, client_id):
     ).values('status').annotate(count=Count('id'))
     
     # Get monthly project completion data
-    monthly_completion = Project.objects.filter(
-        client=client,
-        status='completed',
-        completed_date__isnull=False
-    ).values('completed_date__month').annotate(count=Count('id'))
+    monthly_completion = _completed_projects(Project.objects.filter(client=client)).annotate(
+        month=ExtractMonth('updated_at')
+    ).values('month').annotate(count=Count('id'))
     
     data = {
         'status_distribution': list(status_distribution),
@@ -0,0 +1,17 @@
+from perspectivetracker.utils import collect_notifications
+
+
+class NotificationCollectorMiddleware:
+    """
+    Middleware that merges the notification emails sent while handling a
+    request, so each recipient gets one email per request
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # A view that failed with a 500 may already have committed its changes, so
+        # the status alone does not drop the batch: emails about rolled-back work
+        # never join it, since they are added when their transaction commits
+        with collect_notifications():
+            return self.get_response(request)
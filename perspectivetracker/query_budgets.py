@@ -0,0 +1,219 @@
+"""
+Query budgets for every named URL of the app urlconfs.
+
+Each app's tests register a budget per URL name: the most queries its view
+may run for an admin, and how to build its URL from the shared dataset.
+Every view is requested on a small dataset and again after the dataset has
+grown; the test fails when a view runs more queries than its budget or when
+its count changes with the amount of data, which is how N+1 queries show up.
+"""
+from importlib import import_module
+from django.core.cache import cache
+from django.db import connection, reset_queries, transaction
+from django.test import Client as TestClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from clients.models import Client, ClientCoworker, ClientNote, Coworker
+from projects.models import (
+    Comment, ExportJob, Issue, IssueModification, Milestone, Page, Project,
+    ProjectStandard, ProjectType, ProjectViolation, Standard, Violation,
+)
+from users.models import CustomUser, Role
+
+
+def budget(queries, kwargs=None, skip=None):
+    """
+    Register the query budget of one URL name.
+
+    kwargs builds the URL kwargs from the dataset; skip gives the reason a
+    view cannot be measured yet.
+    """
+    return {'queries': queries, 'kwargs': kwargs, 'skip': skip}
+
+
+def create_budget_data():
+    """Create the small dataset every budget is first measured on and return its objects by name"""
+    admin = CustomUser.objects.create_user(
+        email='budget-admin@example.com',
+        password='password',
+        first_name='Ada',
+        last_name='Admin',
+        role=Role.objects.get(name=Role.ADMIN),
+        is_staff=True,
+    )
+    client_user = CustomUser.objects.create_user(
+        email='budget-client@example.com',
+        first_name='Cleo',
+        last_name='Client',
+        role=Role.objects.get(name=Role.CLIENT),
+        manager=admin,
+    )
+    client = Client.objects.create(
+        company_name='Acme',
+        contact_name='Cleo Client',
+        email='budget-client@example.com',
+        point_of_contact=admin,
+    )
+    project_type = ProjectType.objects.create(name='Accessibility', supports_standards=True)
+    project = Project.objects.create(name='Audit', client=client, project_type=project_type, created_by=admin)
+    project.assigned_to.add(admin, client_user)
+    standard = Standard.objects.create(name='WCAG', version='2.2', created_by=admin)
+
+    data = {
+        'admin': admin,
+        'client_user': client_user,
+        'client': client,
+        'project_type': project_type,
+        'project': project,
+        'standard': standard,
+        'project_standard': ProjectStandard.objects.create(project=project, standard=standard, created_by=admin),
+        'export_job': ExportJob.objects.create(project=project, requested_by=admin, content_version='budget'),
+    }
+    grow_budget_data(data, 2)
+    return data
+
+
+def grow_budget_data(data, count):
+    """Add count more rows of every kind a view lists to the dataset"""
+    admin, client, project = data['admin'], data['client'], data['project']
+    start = CustomUser.objects.filter(email__startswith='budget-user').count()
+    for i in range(start, start + count):
+        user = CustomUser.objects.create_user(
+            email=f'budget-user{i}@example.com',
+            first_name=f'User{i}',
+            last_name='Budget',
+            role=Role.objects.get(name=Role.STAFF),
+            manager=admin,
+        )
+        project.assigned_to.add(user)
+        coworker = ClientCoworker.objects.create(
+            client=client, user=user, role='editor', invitation_token=f'budget-token-{i}'
+        )
+        Coworker.objects.create(client=client, user=user, email=user.email, invited_by=admin)
+        note = ClientNote.objects.create(client=client, author=user, title=f'Note {i}', content='Notes')
+        Project.objects.create(
+            name=f'Audit {i}', client=client, project_type=data['project_type'], created_by=admin
+        ).assigned_to.add(admin)
+
+        violation = Violation.objects.create(name=f'Violation {i}', standard=data['standard'], created_by=admin)
+        project_violation = ProjectViolation.objects.create(
+            project=project, violation=violation, created_by=admin, assigned_to=user
+        )
+        page = Page.objects.create(project=project, name=f'Page {i}', created_by=admin)
+        milestone = Milestone.objects.create(
+            project=project, name=f'Round {i}', assigned_to=user, created_by=admin
+        )
+        issue = Issue.objects.create(
+            project=project,
+            milestone=milestone,
+            page=page,
+            violation=violation,
+            issue_description=f'Issue {i}',
+            steps_to_reproduce='Steps',
+            tool_or_method='nvda',
+            user_impact='high',
+            user_impact_description='Blocks screen reader users',
+            created_by=admin,
+            assigned_to=user,
+        )
+        for author in (admin, user):
+            comment = Comment.objects.create(issue=issue, author=author, milestone=milestone, text=f'Comment {i}')
+            IssueModification.objects.create(
+                issue=issue,
+                milestone=milestone,
+                modified_by=author,
+                modification_type='comment',
+                comment=comment,
+            )
+
+        # The views under test work on the first of each kind
+        for name, obj in (
+            ('user', user), ('coworker', coworker), ('note', note), ('violation', violation),
+            ('project_violation', project_violation), ('page', page), ('milestone', milestone),
+            ('issue', issue), ('comment', comment),
+        ):
+            data.setdefault(name, obj)
+
+
+class QueryBudgetMixin:
+    """
+    Checks every named URL of urlconf against the budgets registered for it.
+
+    Mix into a TestCase and set urlconf to the dotted path of the urlconf
+    module and budgets to a dict of URL name to budget().
+    """
+    urlconf = None
+    budgets = {}
+    # Rows of each kind added between the two measurements
+    growth = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.data = create_budget_data()
+
+    def url_names(self):
+        module = import_module(self.urlconf)
+        return [
+            pattern.name for pattern in module.urlpatterns
+            if isinstance(pattern, URLPattern) and pattern.name
+        ]
+
+    def url(self, name):
+        namespace = getattr(import_module(self.urlconf), 'app_name', None)
+        build = self.budgets[name]['kwargs']
+        return reverse(f'{namespace}:{name}' if namespace else name, kwargs=build(self.data) if build else None)
+
+    def count_queries(self, name):
+        client = TestClient()
+        url = self.url(name)
+        counts = []
+        # The first request warms process-level registries; both start from an empty cache
+        # so that cached fragments cannot hide the queries behind them
+        for _ in range(2):
+            # Logged in each time, since logging out is one of the views
+            client.force_login(self.data['admin'])
+            cache.clear()
+            reset_queries()
+            with transaction.atomic(), CaptureQueriesContext(connection) as ctx:
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                transaction.set_rollback(True)
+            counts.append(len(ctx.captured_queries))
+        return counts[-1]
+
+    def measure(self):
+        counts = {}
+        for name, spec in self.budgets.items():
+            if spec['skip']:
+                continue
+            try:
+                counts[name] = self.count_queries(name)
+            except Exception as e:
+                counts[name] = f"{type(e).__name__}: {e}"
+        return counts
+
+    def test_every_url_name_has_a_budget(self):
+        names = self.url_names()
+        self.assertEqual(sorted(set(names) - set(self.budgets)), [], "URL names without a query budget")
+        self.assertEqual(sorted(set(self.budgets) - set(names)), [], "Budgets for URL names that no longer exist")
+
+    def test_query_counts_are_within_budget_and_flat(self):
+        small = self.measure()
+        grow_budget_data(self.data, self.growth)
+        large = self.measure()
+
+        for name, spec in self.budgets.items():
+            if spec['skip']:
+                continue
+            with self.subTest(url_name=name):
+                self.assertIsInstance(small[name], int, small[name])
+                self.assertEqual(
+                    large[name], small[name],
+                    f"{name} runs {small[name]} queries on the small dataset but {large[name]} on the large one",
+                )
+                self.assertLessEqual(
+                    large[name], spec['queries'],
+                    f"{name} runs {large[name]} queries, over its budget of {spec['queries']}",
+                )
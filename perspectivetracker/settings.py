@@ -74,6 +74,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'social_django.middleware.SocialAuthExceptionMiddleware',
     'users.middleware.Auth0SyncMiddleware',
+    'perspectivetracker.middleware.NotificationCollectorMiddleware',
 ]
 
 ROOT_URLCONF = 'perspectivetracker.urls'
@@ -200,6 +201,41 @@ if 'DATABASE_URL' in os.environ:
     )
     # Removed print statement that was showing in production logs
 
+# Cache
+# Shared Redis cache when REDIS_URL is provided (Heroku), otherwise files in a local
+# directory. Project cache versions have to be seen by every web worker, which the
+# file cache shares on one machine without any setup; deployments running more than
+# one dyno need Redis. The test runner swaps in a memory cache (see test_runner.py).
+if 'REDIS_URL' in os.environ:
+    REDIS_URL = os.environ.get('REDIS_URL')
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'perspectivetracker',
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                # Treat an unavailable Redis as cache misses instead of failing requests
+                'IGNORE_EXCEPTIONS': True,
+            },
+        }
+    }
+    if REDIS_URL.startswith('rediss://'):
+        # Heroku Redis uses self-signed certificates
+        CACHES['default']['OPTIONS']['CONNECTION_POOL_KWARGS'] = {'ssl_cert_reqs': None}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, '.cache')),
+        }
+    }
+
+TEST_RUNNER = 'perspectivetracker.test_runner.TestRunner'
+
+# Seconds a cached project fragment or aggregate is kept; project changes replace them sooner
+PROJECT_CACHE_TIMEOUT = int(os.environ.get('PROJECT_CACHE_TIMEOUT', 60 * 60 * 24))
+
 # Session configuration
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_AGE = 1209600  # 2 weeks
@@ -314,6 +350,9 @@ SOCIAL_AUTH_AUTH0_SCOPE = [
     'email'
 ]
 
+# Seconds Auth0SyncMiddleware trusts its last sync while the user's role state is unchanged
+AUTH0_SYNC_TTL = int(os.environ.get('AUTH0_SYNC_TTL', 300))
+
 # Auth0 UI customization
 SOCIAL_AUTH_AUTH0_EXTRA_AUTHORIZE_PARAMS = {
     'ui_locales': 'en',
@@ -387,6 +426,12 @@ DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'Techopolis Online Sol
 SERVER_EMAIL = os.environ.get('SERVER_EMAIL', 'tracker@techopolis.app')
 EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', 30))
 
+# Outbox: notification emails are stored and sent by `manage.py send_outbox`
+# Set EMAIL_USE_OUTBOX=False to send them during the request instead
+EMAIL_USE_OUTBOX = os.environ.get('EMAIL_USE_OUTBOX', 'True') == 'True'
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 6))
+EMAIL_OUTBOX_RETRY_DELAY = int(os.environ.get('EMAIL_OUTBOX_RETRY_DELAY', 60))
+
 # Only override email settings if explicitly set to use console backend
 if os.environ.get('USE_CONSOLE_EMAIL', 'False') == 'True':
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
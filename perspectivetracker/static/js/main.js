@@ -43,4 +43,56 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         });
     });
-}); 
\ No newline at end of file
+}); 
+// Comment lists grow after the page loads (new and older comments), so their buttons are handled by delegation
+if (window.jQuery) {
+    $(document).on('click', '.edit-comment', function() {
+        const button = $(this);
+        const editUrl = button.data('edit-url');
+        const commentDiv = button.closest('.comment');
+        const commentText = commentDiv.find('.comment-text');
+        
+        // Hide the comment text and show loading state
+        commentText.hide();
+        commentDiv.append('<div class="text-center py-3"><div class="spinner-border text-primary" role="status"><span class="visually-hidden">Loading edit form...</span></div></div>');
+        
+        // Load the edit form
+        $.get(editUrl, function(response) {
+            commentDiv.find('.spinner-border').remove();
+            commentDiv.append(response);
+        }).fail(function() {
+            commentDiv.find('.spinner-border').remove();
+            commentText.show();
+            alert('Error loading edit form');
+        });
+    });
+}
+
+// Each page of older comments ends with the button for the page after it
+document.addEventListener('click', function(event) {
+    const button = event.target.closest('.load-older-comments');
+    if (!button) return;
+    
+    button.disabled = true;
+    fetch(button.dataset.url, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
+            }
+            return response.text();
+        })
+        .then(html => {
+            button.insertAdjacentHTML('afterend', html);
+            // Keep keyboard focus in the list by moving it to the first older comment
+            const firstComment = button.nextElementSibling;
+            button.remove();
+            if (firstComment) {
+                firstComment.setAttribute('tabindex', '-1');
+                firstComment.focus();
+            }
+        })
+        .catch(error => {
+            console.error('Error loading older comments:', error);
+            button.disabled = false;
+        });
+});
@@ -1,6 +1,7 @@
 """
 Utility functions for the Perspective Tracker project.
 """
+from django.core.cache import cache
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
@@ -8,27 +9,435 @@ from django.conf import settings
 from django.urls import reverse
 from django.core.mail import get_connection
 from django.core.mail import EmailMultiAlternatives
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import groupby
 import datetime
 import logging
-from users.models import CustomUser, Role, AdminSettings
+from users.models import CustomUser, Role, AdminSettings, DigestEvent, OutboundEmail
 
+ADMIN_CC_CACHE_KEY = 'emails:admin_cc'
+ADMIN_CC_CACHE_TIMEOUT = 300
 
-def send_email(subject, template_name, context, recipient_list, from_email=None):
+# Notification collector for the current request, see collect_notifications()
+_notification_collector = ContextVar('notification_collector', default=None)
+
+# Seconds a claimed outbox email may stay in 'sending' before another worker retries it
+OUTBOX_CLAIM_TIMEOUT = 600
+
+
+def send_email(subject, template_name, context, recipient_list, from_email=None, digest=None):
     """
     Generic function to send emails using templates.
     
+    The email is rendered now and handed to deliver_emails, which stores it
+    in the outbox for the send_outbox worker once the surrounding transaction
+    commits, so the request never waits on the mail server.
+    
     Args:
         subject (str): Email subject
         template_name (str): Path to the HTML template
         context (dict): Context data for the template
         recipient_list (list): List of recipient email addresses
         from_email (str, optional): Sender email address. Defaults to DEFAULT_FROM_EMAIL.
+        digest (dict, optional): 'summary' and 'url' of the event for recipients
+            who get digests instead of immediate emails. Defaults to emailing everyone.
     
     Returns:
-        bool: True if email was sent successfully
+        bool: True if email was queued (or sent, when the outbox is disabled)
+    """
+    if from_email is None:
+        from_email = settings.DEFAULT_FROM_EMAIL
+    
+    # Add company name to context
+    if 'company_name' not in context:
+        context['company_name'] = 'Techopolis Online Solutions, LLC'
+    
+    _include_admin_recipients(recipient_list)
+    
+    if digest is not None:
+        recipient_list = hold_for_digests(recipient_list, subject, **digest)
+        if not recipient_list:
+            return True
+    
+    html_message = render_to_string(template_name, context)
+    return deliver_emails([(subject, html_message, from_email, list(recipient_list))])
+
+
+def send_personalized_emails(subject, template_name, context, recipient_list, from_email=None,
+                             recipient_fields=('first_name',), digest=None):
+    """
+    Send each recipient their own copy of a template that greets them by name.
+    
+    All recipients are resolved to users with one query, and the template is
+    rendered once per distinct set of recipient_fields rather than once per
+    recipient. The messages are then delivered together by deliver_emails.
+    
+    Args:
+        subject (str): Email subject
+        template_name (str): Path to the HTML template, which may use {{ recipient }}
+        context (dict): Context data for the template
+        recipient_list (list): List of recipient email addresses
+        from_email (str, optional): Sender email address. Defaults to DEFAULT_FROM_EMAIL.
+        recipient_fields (tuple, optional): Recipient attributes the template reads.
+        digest (dict, optional): 'summary' and 'url' for recipients who get digests,
+            as for send_email.
+    
+    Returns:
+        bool: True if the emails were queued or sent
+    """
+    if from_email is None:
+        from_email = settings.DEFAULT_FROM_EMAIL
+    
+    # Add company name to context
+    if 'company_name' not in context:
+        context['company_name'] = 'Techopolis Online Solutions, LLC'
+    
+    _include_admin_recipients(recipient_list)
+    
+    if digest is not None:
+        recipient_list = hold_for_digests(recipient_list, subject, **digest)
+        if not recipient_list:
+            return True
+    
+    recipients = {user.email: user for user in CustomUser.objects.filter(email__in=recipient_list)}
+    
+    rendered = {}
+    emails = []
+    for recipient_email in dict.fromkeys(recipient_list):
+        recipient = recipients.get(recipient_email)
+        key = tuple(getattr(recipient, field) for field in recipient_fields) if recipient else None
+        if key not in rendered:
+            rendered[key] = render_to_string(template_name, {**context, 'recipient': recipient})
+        emails.append((subject, rendered[key], from_email, [recipient_email]))
+    
+    return deliver_emails(emails)
+
+
+def hold_for_digests(recipient_list, subject, summary='', url=''):
+    """
+    Store a digest event for each recipient who prefers digests.
+    
+    Args:
+        recipient_list (list): List of recipient email addresses
+        subject (str): Subject of the email the event stands in for
+        summary (str, optional): One or two lines describing the event
+        url (str, optional): Link to the changed object
+    
+    Returns:
+        list: The recipients who should still be emailed immediately
+    """
+    held = dict(
+        CustomUser.objects.filter(email__in=recipient_list).exclude(
+            email_digest='immediate'
+        ).values_list('email', 'pk')
+    )
+    if not held:
+        return recipient_list
+    
+    events = [
+        DigestEvent(user_id=user_id, subject=subject, summary=summary, url=url)
+        for user_id in held.values()
+    ]
+    transaction.on_commit(lambda: DigestEvent.objects.bulk_create(events))
+    return [email for email in recipient_list if email not in held]
+
+
+def send_digests(frequency, batch_size=100):
+    """
+    Send each user with the given digest frequency one email of their held events.
+    
+    Events of users who have since switched back to immediate emails are sent
+    too, so nothing is left behind. Each batch of users is rendered, handed to
+    deliver_emails in one call and removed from the event table together.
+    
+    Args:
+        frequency (str): 'hourly' or 'daily'
+        batch_size (int, optional): Users per delivery batch
+    
+    Returns:
+        int: Number of digests sent
+    """
+    events = DigestEvent.objects.filter(user__email_digest__in=[frequency, 'immediate'])
+    last_id = events.aggregate(last_id=models.Max('id'))['last_id']
+    if last_id is None:
+        return 0
+    
+    events = events.filter(pk__lte=last_id).select_related('user').order_by('user_id', 'created_at', 'id')
+    label = dict(CustomUser.EMAIL_DIGEST_CHOICES).get(frequency, 'Digest')
+    
+    def flush(batch):
+        with transaction.atomic():
+            deliver_emails([email for email, _ in batch])
+            DigestEvent.objects.filter(
+                user_id__in=[user_id for _, user_id in batch], pk__lte=last_id
+            ).delete()
+    
+    sent = 0
+    batch = []
+    for user, user_events in groupby(events.iterator(), key=lambda event: event.user):
+        user_events = list(user_events)
+        html_message = render_to_string('emails/notification_digest.html', {
+            'recipient': user,
+            'events': user_events,
+            'label': label,
+            'company_name': 'Techopolis Online Solutions, LLC',
+        })
+        subject = f"{label}: {len(user_events)} update{'s' if len(user_events) > 1 else ''} in Perspective Tracker"
+        batch.append(((subject, html_message, settings.DEFAULT_FROM_EMAIL, [user.email]), user.pk))
+        sent += 1
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return sent
+
+
+def deliver_emails(emails):
     """
-    return send_email_with_fallback(subject, template_name, context, recipient_list, from_email)
+    Hand rendered emails to the outbox, or send them over one connection.
+    
+    With the outbox enabled the rows are inserted in one query when the
+    surrounding transaction commits. Otherwise every message goes out through
+    a single mail connection with send_messages, falling back to the console
+    backend if SMTP fails.
+    
+    Args:
+        emails (list): (subject, html_message, from_email, recipient_list) tuples
+    
+    Returns:
+        bool: True if the emails were queued or sent
+    """
+    logger = logging.getLogger(__name__)
+    
+    if not emails:
+        return False
+    
+    # Inside a request the emails are merged and delivered when it finishes. They
+    # join the batch only once the changes they describe are committed, so a
+    # rolled-back transaction sends nothing.
+    collector = _notification_collector.get()
+    if collector is not None:
+        transaction.on_commit(lambda: collector.extend(emails))
+        return True
+    
+    if settings.EMAIL_USE_OUTBOX:
+        outbound = [
+            OutboundEmail(
+                subject=subject,
+                body=strip_tags(html_message),
+                html_body=html_message,
+                from_email=from_email,
+                to=recipient_list,
+            )
+            for subject, html_message, from_email, recipient_list in emails
+        ]
+        transaction.on_commit(lambda: OutboundEmail.objects.bulk_create(outbound))
+        return True
+    
+    def build_messages(connection):
+        messages = []
+        for subject, html_message, from_email, recipient_list in emails:
+            message = EmailMultiAlternatives(
+                subject=subject,
+                body=strip_tags(html_message),
+                from_email=from_email,
+                to=recipient_list,
+                connection=connection
+            )
+            message.attach_alternative(html_message, "text/html")
+            messages.append(message)
+        return messages
+    
+    try:
+        connection = get_connection(fail_silently=False)
+        connection.send_messages(build_messages(connection))
+        logger.info(f"Sent {len(emails)} emails over one SMTP connection")
+        return True
+    except Exception as e:
+        logger.error(f"SMTP email failed: {str(e)}")
+        logger.info("Falling back to console email backend")
+        try:
+            console_connection = get_connection(
+                backend='django.core.mail.backends.console.EmailBackend'
+            )
+            console_connection.send_messages(build_messages(console_connection))
+            return True
+        except Exception as e:
+            logger.error(f"Console email failed: {str(e)}")
+            return False
+
+
+@contextmanager
+def collect_notifications():
+    """
+    Gather the emails sent inside the block and deliver them merged at the end.
+    
+    Used by NotificationCollectorMiddleware so that one request sends each
+    recipient a single email, however many notifications it triggered.
+    Delivery waits for the surrounding transaction to commit, and the batch is
+    dropped if the block raises.
+    """
+    collected = []
+    
+    def flush():
+        if collected:
+            deliver_emails(merge_notifications(collected))
+    
+    token = _notification_collector.set(collected)
+    try:
+        yield collected
+    finally:
+        _notification_collector.reset(token)
+    # Not reached if the block raised. Registered after the emails' own callbacks,
+    # so it runs once they have joined the batch.
+    transaction.on_commit(flush)
+
+
+def _email_content(html_message):
+    """Return the content block of an email rendered from emails/base_email.html"""
+    start = html_message.find('<!-- content -->')
+    end = html_message.find('<!-- /content -->')
+    if start == -1 or end == -1:
+        return html_message
+    return html_message[start + len('<!-- content -->'):end]
+
+
+def merge_notifications(emails):
+    """
+    Merge emails so each recipient receives one message.
+    
+    Recipients who were sent exactly the same emails share a message, and an
+    email that is the only one for its recipients is kept as it is. Otherwise
+    the content of each email becomes a section of a combined message.
+    
+    Args:
+        emails (list): (subject, html_message, from_email, recipient_list) tuples
+    
+    Returns:
+        list: Merged (subject, html_message, from_email, recipient_list) tuples
+    """
+    received = {}
+    for index, (_, _, _, recipient_list) in enumerate(emails):
+        for recipient in recipient_list:
+            indexes = received.setdefault(recipient, [])
+            if index not in indexes:
+                indexes.append(index)
+    
+    groups = {}
+    for recipient, indexes in received.items():
+        groups.setdefault(tuple(indexes), []).append(recipient)
+    
+    merged = []
+    for indexes, recipient_list in groups.items():
+        subject, html_message, from_email, _ = emails[indexes[0]]
+        if len(indexes) > 1:
+            # The same content can arrive twice, e.g. two helpers sharing a template
+            sections = list(dict.fromkeys(_email_content(emails[index][1]) for index in indexes))
+            html_message = render_to_string('emails/combined_notification.html', {
+                'subject': subject,
+                'sections': [mark_safe(section) for section in sections],
+            })
+            more = len(indexes) - 1
+            subject = f"{subject} (and {more} more update{'s' if more > 1 else ''})"
+        merged.append((subject, html_message, from_email, recipient_list))
+    return merged
+
+
+def claim_outbound_emails(batch_size=50):
+    """
+    Claim up to batch_size due outbox emails for this worker.
+    
+    Claimed rows are marked 'sending' with a deadline, so a worker that dies
+    mid-batch only delays its emails until the deadline passes.
+    
+    Returns:
+        list: OutboundEmail instances to send
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True).filter(
+                status__in=['pending', 'sending'],
+                next_attempt_at__lte=now,
+            ).order_by('next_attempt_at')[:batch_size]
+        )
+        if emails:
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                status='sending',
+                next_attempt_at=now + datetime.timedelta(seconds=OUTBOX_CLAIM_TIMEOUT),
+            )
+    return emails
+
+
+def _schedule_outbound_retry(outbound, error):
+    """Record a failed attempt, backing off exponentially until the email is dead-lettered"""
+    logger = logging.getLogger(__name__)
+    
+    outbound.attempts += 1
+    outbound.last_error = str(error)
+    if outbound.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        outbound.status = 'dead'
+        logger.error(f"Giving up on outbox email {outbound.pk} after {outbound.attempts} attempts: {error}")
+    else:
+        delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (outbound.attempts - 1)
+        outbound.status = 'pending'
+        outbound.next_attempt_at = timezone.now() + datetime.timedelta(seconds=delay)
+        logger.warning(f"Outbox email {outbound.pk} failed, retrying in {delay}s: {error}")
+    outbound.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def send_outbound_emails(emails, connection=None):
+    """
+    Send claimed outbox emails over a single mail connection.
+    
+    Args:
+        emails (list): OutboundEmail instances from claim_outbound_emails
+        connection (optional): Mail backend connection. Defaults to get_connection().
+    
+    Returns:
+        tuple: (sent, failed) counts
+    """
+    if connection is None:
+        connection = get_connection(fail_silently=False)
+    
+    try:
+        connection.open()
+    except Exception as e:
+        for outbound in emails:
+            _schedule_outbound_retry(outbound, e)
+        return 0, len(emails)
+    
+    sent = failed = 0
+    try:
+        for outbound in emails:
+            message = EmailMultiAlternatives(
+                subject=outbound.subject,
+                body=outbound.body,
+                from_email=outbound.from_email,
+                to=outbound.to,
+                connection=connection
+            )
+            if outbound.html_body:
+                message.attach_alternative(outbound.html_body, "text/html")
+            try:
+                message.send()
+            except Exception as e:
+                _schedule_outbound_retry(outbound, e)
+                failed += 1
+                continue
+            outbound.attempts += 1
+            outbound.status = 'sent'
+            outbound.sent_at = timezone.now()
+            outbound.save(update_fields=['attempts', 'status', 'sent_at'])
+            sent += 1
+    finally:
+        connection.close()
+    return sent, failed
 
 
 def send_project_created_email(request, project, recipient_list=None):
@@ -231,11 +640,16 @@ def send_comment_notification_email(request, comment, recipient_list=None):
         'issue_url': issue_url,
     }
     
+    author_name = (comment.author.get_full_name() or comment.author.email) if comment.author else 'Someone'
     return send_email(
         f'New Comment on Issue: {issue.project.name}',
         'emails/comment_notification.html',
         context,
-        recipient_list
+        recipient_list,
+        digest={
+            'summary': f"{author_name}: {comment.text[:200]}",
+            'url': issue_url,
+        }
     )
 
 
@@ -689,103 +1103,57 @@ def test_smtp_connection():
         return False, error_message
 
 
-def send_email_with_fallback(subject, template_name, context, recipient_list, from_email=None):
+def get_admin_cc_emails():
     """
-    Send email with fallback to console backend if SMTP fails.
+    Return the emails of admins who receive copies of all system emails.
     
-    Args:
-        subject (str): Email subject
-        template_name (str): Path to the HTML template
-        context (dict): Context data for the template
-        recipient_list (list): List of recipient email addresses
-        from_email (str, optional): Sender email address. Defaults to DEFAULT_FROM_EMAIL.
+    The list is cached and cleared by signals in users.signals when admin
+    settings, roles or admin users change, so sending an email normally
+    costs no queries here. The timeout bounds staleness for caches that are
+    local to each process.
     
     Returns:
-        bool: True if email was sent successfully
+        list: Admin email addresses, empty when admins have opted out
     """
-    from django.core.mail import get_connection
-    from django.core.mail import EmailMultiAlternatives
-    from django.template.loader import render_to_string
-    from django.utils.html import strip_tags
-    from django.conf import settings
-    import logging
-    from users.models import CustomUser, Role, AdminSettings
-    
-    logger = logging.getLogger(__name__)
-    
-    if from_email is None:
-        from_email = settings.DEFAULT_FROM_EMAIL
-    
-    # Add company name to context
-    if 'company_name' not in context:
-        context['company_name'] = 'Techopolis Online Solutions, LLC'
-    
-    # Check if admin emails should be included based on admin settings
-    try:
-        admin_settings = AdminSettings.objects.first()
-        if admin_settings and admin_settings.receive_all_emails:
-            # Get all admin users (both superusers and users with admin role)
-            admin_users = CustomUser.objects.filter(
+    emails = cache.get(ADMIN_CC_CACHE_KEY)
+    if emails is not None:
+        return emails
+    
+    emails = []
+    admin_settings = AdminSettings.objects.first()
+    if admin_settings and admin_settings.receive_all_emails:
+        # Get all admin users (both superusers and users with admin role)
+        emails = list(
+            CustomUser.objects.filter(
                 models.Q(is_superuser=True) | 
                 models.Q(role__name='admin')
-            )
-            
-            # Add admin emails to the recipient list if they're not already included
-            admin_emails = [admin.email for admin in admin_users]
-            for admin_email in admin_emails:
-                if admin_email not in recipient_list:
-                    recipient_list.append(admin_email)
-                    logger.info(f"Added admin {admin_email} to recipient list based on admin settings")
-    except Exception as e:
-        logger.error(f"Error including admin emails: {str(e)}")
-        
-    html_message = render_to_string(template_name, context)
-    plain_message = strip_tags(html_message)
+            ).values_list('email', flat=True)
+        )
+    cache.set(ADMIN_CC_CACHE_KEY, emails, ADMIN_CC_CACHE_TIMEOUT)
+    return emails
+
+
+def invalidate_admin_cc_emails():
+    """Forget the cached admin CC list so the next email reloads it"""
+    cache.delete(ADMIN_CC_CACHE_KEY)
+
+
+def _include_admin_recipients(recipient_list):
+    """Add admin emails to recipient_list in place when admins receive copies of all emails"""
+    logger = logging.getLogger(__name__)
     
-    # Try with SMTP backend first
     try:
-        # Log SMTP configuration
-        logger.info(f"Attempting to send email with SMTP configuration:")
-        logger.info(f"  Host: {settings.EMAIL_HOST}")
-        logger.info(f"  Port: {settings.EMAIL_PORT}")
-        logger.info(f"  Use SSL: {settings.EMAIL_USE_SSL}")
-        logger.info(f"  Use TLS: {settings.EMAIL_USE_TLS}")
-        logger.info(f"  From: {from_email}")
-        logger.info(f"  To: {recipient_list}")
-        
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=plain_message,
-            from_email=from_email,
-            to=recipient_list
-        )
-        email.attach_alternative(html_message, "text/html")
-        email.send()
-        logger.info("Email sent successfully via SMTP")
-        return True
+        admin_emails = get_admin_cc_emails()
     except Exception as e:
-        logger.error(f"SMTP email failed: {str(e)}")
-        logger.info("Falling back to console email backend")
-        
-        # Fall back to console backend
-        try:
-            console_connection = get_connection(
-                backend='django.core.mail.backends.console.EmailBackend'
-            )
-            email = EmailMultiAlternatives(
-                subject=subject,
-                body=plain_message,
-                from_email=from_email,
-                to=recipient_list,
-                connection=console_connection
-            )
-            email.attach_alternative(html_message, "text/html")
-            email.send()
-            logger.info("Email sent using console backend")
-            return True
-        except Exception as e:
-            logger.error(f"Console email failed: {str(e)}")
-            return False
+        logger.error(f"Error including admin emails: {str(e)}")
+        return
+    
+    # Add admin emails to the recipient list if they're not already included
+    recipients = set(recipient_list)
+    added = [email for email in admin_emails if email not in recipients]
+    if added:
+        recipient_list.extend(added)
+        logger.info(f"Added admins {', '.join(added)} to recipient list based on admin settings")
 
 
 def test_smtp_ports():
@@ -1211,7 +1579,6 @@ def send_status_change_notification_email(request, issue, previous_status_value,
         'previous_status_display': previous_status_display,
         'new_status_display': new_status_display,
         'comment': comment,
-        'recipient': None,  # Will be set for each recipient
         'assigned_to': issue.assigned_to
     }
     
@@ -1222,25 +1589,13 @@ def send_status_change_notification_email(request, issue, previous_status_value,
         subject = f'Issue Status Changed: {issue.project.name} - {issue.issue_description[:50]}'
     
     # Send personalized emails to each recipient
-    success = True
-    for recipient_email in recipient_list:
-        # Try to find the recipient user
-        try:
-            from users.models import CustomUser
-            recipient = CustomUser.objects.get(email=recipient_email)
-            # Update context with recipient for personalization
-            context['recipient'] = recipient
-        except:
-            # If user not found, continue without personalization
-            context['recipient'] = None
-        
-        # Send the email
-        result = send_email(
-            subject,
-            'emails/status_change_notification.html',
-            context,
-            [recipient_email]
-        )
-        success = success and result
-    
-    return success
\ No newline at end of file
+    return send_personalized_emails(
+        subject,
+        'emails/status_change_notification.html',
+        context,
+        recipient_list,
+        digest={
+            'summary': f"Status changed from '{previous_status_display}' to '{new_status_display}' by {request.user.get_full_name() or request.user.email}",
+            'url': issue_url,
+        }
+    )
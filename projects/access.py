@@ -0,0 +1,90 @@
+from django.utils.functional import cached_property
+from users.models import Role
+from .models import Project
+
+
+class ProjectAccess:
+    """
+    Answers project permission questions for one user.
+
+    Role checks use the cached role registry and membership is tested with an
+    indexed exists() query on the assignment table. Every answer is memoized,
+    so repeated checks in a view and its templates cost nothing after the first.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._memberships = {}
+
+    @classmethod
+    def for_user(cls, user):
+        """Return the access checker stored on this user object, creating it if needed"""
+        access = getattr(user, '_project_access', None)
+        if access is None:
+            access = cls(user)
+            user._project_access = access
+        return access
+
+    @classmethod
+    def for_request(cls, request):
+        """Return the access checker for the current request"""
+        return cls.for_user(request.user)
+
+    @cached_property
+    def role_name(self):
+        role_id = getattr(self.user, 'role_id', None)
+        if not self.user.is_authenticated or role_id is None:
+            return None
+        return Role.cached_by_pk(role_id).name
+
+    @cached_property
+    def is_admin(self):
+        return self.user.is_superuser or self.role_name == Role.ADMIN
+
+    @cached_property
+    def is_staff_member(self):
+        """Admins and Techopolis staff, who see internal comments and every project"""
+        return self.user.is_superuser or self.role_name in (Role.ADMIN, Role.STAFF)
+
+    @cached_property
+    def is_client(self):
+        return self.role_name == Role.CLIENT
+
+    @cached_property
+    def visibility(self):
+        """The class of viewers who see the same project pages: admin, staff, or their own role"""
+        if self.is_admin:
+            return Role.ADMIN
+        if self.is_staff_member:
+            return Role.STAFF
+        return self.role_name or 'none'
+
+    def is_member(self, project):
+        """Whether the user is assigned to the project (a Project or its primary key)"""
+        project_id = getattr(project, 'pk', project)
+        if project_id not in self._memberships:
+            self._memberships[project_id] = self.user.is_authenticated and Project.assigned_to.through.objects.filter(
+                project_id=project_id, customuser_id=self.user.pk
+            ).exists()
+        return self._memberships[project_id]
+
+    def prefetch(self, projects):
+        """Resolve membership for many projects with one query"""
+        project_ids = [getattr(project, 'pk', project) for project in projects]
+        missing = [pk for pk in project_ids if pk not in self._memberships]
+        if not missing:
+            return
+        member_of = set()
+        if self.user.is_authenticated:
+            member_of = set(Project.assigned_to.through.objects.filter(
+                project_id__in=missing, customuser_id=self.user.pk
+            ).values_list('project_id', flat=True))
+        for pk in missing:
+            self._memberships[pk] = pk in member_of
+
+    def can_view(self, project):
+        return self.is_admin or self.is_member(project)
+
+    def can_edit(self, project):
+        # Everyone assigned to a project works on its issues, pages and standards
+        return self.is_admin or self.is_member(project)
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from .access import ProjectAccess
 from .models import ProjectType, Project, Standard, Violation, ProjectViolation, ProjectStandard
 
 @admin.register(ProjectType)
@@ -15,18 +16,26 @@ class ProjectViolationInline(admin.TabularInline):
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
-    list_display = ('name', 'client', 'status', 'created_at')
+    list_display = ('name', 'client', 'status', 'open_issues', 'next_milestone_due', 'created_at')
     list_filter = ('status', 'client', 'created_at')
     search_fields = ('name', 'description', 'client__name')
     raw_id_fields = ('client', 'created_by', 'assigned_to')
     filter_horizontal = ('assigned_to',)
     
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser or (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin'):
+        qs = super().get_queryset(request).with_summary()
+        if ProjectAccess.for_request(request).is_admin:
             return qs
         return qs.filter(assigned_to=request.user)
     
+    @admin.display(description='Open issues', ordering='open_issue_count')
+    def open_issues(self, obj):
+        return f"{obj.open_issue_count} / {obj.issue_count}"
+    
+    @admin.display(description='Next milestone due', ordering='next_milestone_due')
+    def next_milestone_due(self, obj):
+        return obj.next_milestone_due
+    
     def has_add_permission(self, request):
         return request.user.is_superuser or (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin')
     
@@ -0,0 +1,96 @@
+"""
+Versioned cache keys for per-project fragments and aggregates.
+
+Every project has a version number in the cache. Keys for anything derived
+from the project embed it (project:<id>:v<version>:<name>), and the signals
+in projects.signals bump it whenever the project or one of its rows
+changes. Bumping makes every old key unreachable at once, so nothing has to
+find and delete them; they simply expire.
+
+A missing version (never set, evicted or lost with the cache) is seeded
+from the clock rather than restarting at 1, so a fresh version can never
+collide with keys written under an earlier one.
+"""
+import hashlib
+import time
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from .access import ProjectAccess
+
+
+def _version_key(project_id):
+    return f'project:{project_id}:version'
+
+
+def _new_version():
+    return time.time_ns() // 1000
+
+
+def project_version(project_id):
+    """Return the current cache version of a project"""
+    key = _version_key(project_id)
+    version = cache.get(key)
+    if version is None:
+        # add() keeps a version another process set in the meantime
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_project_version(project_id):
+    """Invalidate everything cached for a project by moving it to a new version"""
+    key = _version_key(project_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def project_cache_key(project_id, *parts):
+    """Return the key for a value derived from the project at its current version"""
+    return ':'.join([f'project:{project_id}:v{project_version(project_id)}', *map(str, parts)])
+
+
+def cached_for_project(project_id, name, compute, timeout=None):
+    """Return the value cached under name for the project's current version, computing it on a miss"""
+    key = project_cache_key(project_id, name)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.PROJECT_CACHE_TIMEOUT if timeout is None else timeout)
+    return value
+
+
+def project_etag(request, project_id, *parts):
+    """
+    Return the ETag of a page of the project as this viewer sees it, or None
+    when the page has to be rendered.
+
+    The tag moves with the project's cache version, so it changes on every
+    write to the project including deletes, and with everything about the
+    viewer the page shows: their visibility class, their name and links in
+    the navbar and the CSRF secret its forms were rendered for.
+
+    Viewers who may not see the project get no tag, so their requests always
+    reach the view's access check and never learn when the project changed.
+    """
+    user = request.user
+    if request.method not in ('GET', 'HEAD') or not user.is_authenticated or project_id is None:
+        return None
+    access = ProjectAccess.for_request(request)
+    if not access.can_view(project_id):
+        return None
+    # Pending flash messages have to be rendered into a fresh page
+    if len(get_messages(request)):
+        return None
+    validator = ':'.join(map(str, [
+        project_version(project_id),
+        access.visibility,
+        user.pk,
+        user.get_full_name(),
+        user.is_staff,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        *parts,
+    ]))
+    return hashlib.md5(validator.encode(), usedforsecurity=False).hexdigest()
@@ -0,0 +1,388 @@
+"""
+Project export engine.
+
+Workbooks are written row by row with xlsxwriter's constant_memory mode, so
+only the row being written is held in memory. Rows are read from the
+database in chunks with .iterator() and select_related, and the workbook is
+built in a spooled temporary file.
+
+Exports run off the request path as ExportJob rows processed by the
+process_export_jobs management command. Finished workbooks are stored in
+the database as ExportChunk rows, where every dyno can read them and from
+which downloads are streamed a chunk at a time. They are keyed by the
+project's content version, so exporting an unchanged project reuses the
+stored one.
+
+Issues, comments and modification histories can also be streamed as CSV or
+NDJSON: rows are read with .values_list().iterator() and encoded one at a
+time, so memory use and time to first byte do not depend on the row count.
+"""
+import csv
+import datetime
+import hashlib
+import json
+import tempfile
+
+import xlsxwriter
+from django.db import transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .models import Page, Milestone, Issue, Comment, IssueModification, ExportJob, ExportChunk
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Rows fetched from the database per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# Workbooks smaller than this stay in memory; larger ones spill to disk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Bytes of a finished workbook stored per ExportChunk row and sent per read
+STORED_CHUNK_SIZE = 1024 * 1024
+
+# Seconds a claimed job may stay 'running' before another worker takes it over
+EXPORT_CLAIM_TIMEOUT = 1800
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATE_FORMAT = '%Y-%m-%d'
+
+PAGE_COLUMNS = ['Name', 'URL', 'Status', 'Last Checked', 'Notes', 'Created At', 'Updated At']
+ISSUE_COLUMNS = [
+    'Description', 'Status', 'Severity', 'Page', 'Milestone', 'Assigned To', 'Steps to Reproduce',
+    'User Impact', 'User Impact Description', 'Created By', 'Created At', 'Updated At',
+]
+MILESTONE_COLUMNS = [
+    'Name', 'Description', 'Due Date', 'Completed Date', 'Status', 'Type', 'Assigned To',
+    'Created By', 'Notes', 'Created At', 'Updated At',
+]
+COMMENT_COLUMNS = [
+    'Issue', 'Author', 'Type', 'Text', 'Status Changed', 'Previous Status', 'New Status',
+    'Created At', 'Updated At',
+]
+
+# Streamed datasets: the queryset for a project and the (column, lookup) pairs to read
+STREAM_DATASETS = {
+    'issues': (
+        lambda project: Issue.objects.filter(project=project),
+        [
+            ('id', 'id'),
+            ('page', 'page__name'),
+            ('milestone', 'milestone__name'),
+            ('violation', 'violation__name'),
+            ('description', 'issue_description'),
+            ('steps_to_reproduce', 'steps_to_reproduce'),
+            ('tool_or_method', 'tool_or_method'),
+            ('user_impact', 'user_impact'),
+            ('user_impact_description', 'user_impact_description'),
+            ('workarounds', 'workarounds'),
+            ('status', 'current_status'),
+            ('assigned_to', 'assigned_to__email'),
+            ('created_by', 'created_by__email'),
+            ('created_at', 'created_at'),
+            ('updated_at', 'updated_at'),
+        ],
+    ),
+    'comments': (
+        lambda project: Comment.objects.filter(issue__project=project),
+        [
+            ('id', 'id'),
+            ('issue_id', 'issue_id'),
+            ('milestone', 'milestone__name'),
+            ('author', 'author__email'),
+            ('type', 'comment_type'),
+            ('text', 'text'),
+            ('status_changed', 'status_changed'),
+            ('previous_status', 'previous_status'),
+            ('new_status', 'new_status'),
+            ('created_at', 'created_at'),
+            ('updated_at', 'updated_at'),
+        ],
+    ),
+    'modifications': (
+        lambda project: IssueModification.objects.filter(issue__project=project),
+        [
+            ('id', 'id'),
+            ('issue_id', 'issue_id'),
+            ('milestone', 'milestone__name'),
+            ('modified_by', 'modified_by__email'),
+            ('type', 'modification_type'),
+            ('previous_value', 'previous_value'),
+            ('new_value', 'new_value'),
+            ('comment_id', 'comment_id'),
+            ('created_at', 'created_at'),
+        ],
+    ),
+}
+
+STREAM_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _full_name(user):
+    return user.get_full_name() if user else ''
+
+
+def _truncate(text, length=50):
+    return text[:length] + '...' if len(text) > length else text
+
+
+def _write_sheet(workbook, name, columns, rows):
+    """Write a header row followed by each row from an iterable"""
+    worksheet = workbook.add_worksheet(name)
+    worksheet.write_row(0, 0, columns)
+    for row_number, row in enumerate(rows, start=1):
+        worksheet.write_row(row_number, 0, row)
+
+
+def _project_rows(project):
+    team = project.assigned_to.all()
+    return [
+        ['Name', project.name],
+        ['Client', project.client.company_name if project.client else ''],
+        ['Project Type', project.project_type.name if project.project_type else ''],
+        ['Status', project.get_status_display()],
+        ['Created At', project.created_at.strftime(DATETIME_FORMAT)],
+        ['Updated At', project.updated_at.strftime(DATETIME_FORMAT)],
+        ['Team Members', ', '.join([user.get_full_name() for user in team])],
+        ['Notes', project.notes or ''],
+    ]
+
+
+def _page_rows(project):
+    pages = Page.objects.filter(project=project).order_by('name', 'id')
+    for page in pages.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            page.name,
+            page.url,
+            '',
+            '',
+            '',
+            page.created_at.strftime(DATETIME_FORMAT),
+            page.updated_at.strftime(DATETIME_FORMAT),
+        ]
+
+
+def _issue_rows(project):
+    issues = Issue.objects.filter(project=project).select_related(
+        'page', 'milestone', 'assigned_to', 'created_by'
+    ).order_by('-created_at', '-id')
+    for issue in issues.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            issue.issue_description,
+            issue.get_current_status_display(),
+            '',
+            issue.page.name if issue.page else '',
+            issue.milestone.name if issue.milestone else '',
+            _full_name(issue.assigned_to),
+            issue.steps_to_reproduce or '',
+            issue.user_impact or '',
+            issue.user_impact_description or '',
+            _full_name(issue.created_by),
+            issue.created_at.strftime(DATETIME_FORMAT),
+            issue.updated_at.strftime(DATETIME_FORMAT),
+        ]
+
+
+def _milestone_rows(project):
+    milestones = Milestone.objects.filter(project=project).select_related(
+        'assigned_to', 'created_by'
+    ).order_by('due_date', 'name', 'id')
+    for milestone in milestones.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            milestone.name,
+            milestone.description or '',
+            milestone.due_date.strftime(DATE_FORMAT) if milestone.due_date else '',
+            milestone.completed_date.strftime(DATE_FORMAT) if milestone.completed_date else '',
+            milestone.get_status_display(),
+            milestone.milestone_type,
+            _full_name(milestone.assigned_to),
+            _full_name(milestone.created_by),
+            '',
+            milestone.created_at.strftime(DATETIME_FORMAT),
+            milestone.updated_at.strftime(DATETIME_FORMAT),
+        ]
+
+
+def _comment_rows(project):
+    comments = Comment.objects.filter(issue__project=project).select_related(
+        'issue', 'author'
+    ).only(
+        'issue', 'author', 'comment_type', 'text', 'status_changed', 'previous_status', 'new_status',
+        'created_at', 'updated_at', 'issue__issue_description',
+        'author__first_name', 'author__last_name',
+    ).order_by('-created_at', '-id')
+    for comment in comments.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            _truncate(comment.issue.issue_description),
+            _full_name(comment.author),
+            comment.get_comment_type_display(),
+            comment.text,
+            'Yes' if comment.status_changed else 'No',
+            comment.previous_status if comment.status_changed else '',
+            comment.new_status if comment.status_changed else '',
+            comment.created_at.strftime(DATETIME_FORMAT),
+            comment.updated_at.strftime(DATETIME_FORMAT),
+        ]
+
+
+def write_project_workbook(project, output):
+    """
+    Write the project export workbook to a file path or binary file object.
+
+    Args:
+        project: Project instance, ideally with client and project_type selected
+        output: File path or writable binary file object
+    """
+    # Cell text is user input, so never let it be interpreted as a formula
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'strings_to_formulas': False})
+    try:
+        _write_sheet(workbook, 'Project Details', ['Field', 'Value'], _project_rows(project))
+        _write_sheet(workbook, 'Pages', PAGE_COLUMNS, _page_rows(project))
+        _write_sheet(workbook, 'Issues', ISSUE_COLUMNS, _issue_rows(project))
+        _write_sheet(workbook, 'Milestones', MILESTONE_COLUMNS, _milestone_rows(project))
+        _write_sheet(workbook, 'Comments', COMMENT_COLUMNS, _comment_rows(project))
+    finally:
+        workbook.close()
+
+
+def build_project_workbook(project):
+    """
+    Build the project export workbook in a spooled temporary file.
+
+    Returns:
+        SpooledTemporaryFile: The finished workbook, rewound to the start
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        write_project_workbook(project, output)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output
+
+
+def project_content_version(project):
+    """
+    Return a version string that changes whenever the exported content changes.
+
+    The version combines the newest updated_at and the row count of the
+    project's issues, comments, milestones and pages, so edits, additions and
+    deletions all produce a new version. The team and the client shown on the
+    Project Details sheet are part of it too; team changes do not touch
+    project.updated_at.
+    """
+    parts = [project.updated_at.isoformat()]
+    parts.append(project.client.updated_at.isoformat() if project.client else '')
+    parts.append(','.join(
+        f'{pk}:{first_name} {last_name}'
+        for pk, first_name, last_name in project.assigned_to.order_by('pk').values_list('pk', 'first_name', 'last_name')
+    ))
+    for queryset in [
+        Issue.objects.filter(project=project),
+        Comment.objects.filter(issue__project=project),
+        Milestone.objects.filter(project=project),
+        Page.objects.filter(project=project),
+    ]:
+        summary = queryset.order_by().aggregate(latest=Max('updated_at'), total=Count('id'))
+        parts.append(f"{summary['latest'].isoformat() if summary['latest'] else ''}:{summary['total']}")
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def request_export(project, user):
+    """
+    Return the export job for the project's current content.
+
+    A finished export of the same version is reused as is, as is a job for
+    that version that is still queued or running. Otherwise a new pending job
+    is created for the worker to pick up.
+    """
+    version = project_content_version(project)
+    job = ExportJob.objects.filter(
+        project=project,
+        content_version=version,
+        status__in=['pending', 'running', 'completed'],
+    ).first()
+    if job:
+        return job
+    return ExportJob.objects.create(project=project, requested_by=user, content_version=version)
+
+
+def claim_next_export_job():
+    """
+    Mark the oldest pending job as running and return it, or None if the queue is empty.
+    
+    A job left running by a worker that died is claimed again once it has run
+    for longer than EXPORT_CLAIM_TIMEOUT, so request_export never keeps
+    handing out a job nobody is working on.
+    """
+    stale = timezone.now() - datetime.timedelta(seconds=EXPORT_CLAIM_TIMEOUT)
+    with transaction.atomic():
+        job = ExportJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status='pending') | Q(status='running', started_at__lt=stale)
+        ).order_by('created_at').first()
+        if job is None:
+            return None
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+    return job
+
+
+def run_export_job(job):
+    """Build the workbook for a claimed job and store it in chunks, replacing older exports of the project"""
+    project = job.project
+    with build_project_workbook(project) as workbook, transaction.atomic():
+        # A job taken over from a dead worker may have stored part of a workbook
+        job.chunks.all().delete()
+        size = 0
+        for index, data in enumerate(iter(lambda: workbook.read(STORED_CHUNK_SIZE), b'')):
+            ExportChunk.objects.create(job=job, index=index, data=data)
+            size += len(data)
+        job.size = size
+        job.status = 'completed'
+        job.completed_at = timezone.now()
+        job.save(update_fields=['size', 'status', 'completed_at'])
+    
+    # Older exports of this project are stale now, so free their space
+    ExportJob.objects.filter(project=project, status='completed').exclude(pk=job.pk).delete()
+
+
+def stream_export(job):
+    """Yield the stored workbook of a finished job one chunk at a time"""
+    chunks = job.chunks.order_by('index').values_list('data', flat=True)
+    for data in chunks.iterator(chunk_size=1):
+        yield bytes(data)
+
+
+class _Echo:
+    """File-like object whose write() returns the value, so csv.writer yields lines"""
+    def write(self, value):
+        return value
+
+
+def _dataset_rows(project, dataset):
+    queryset, columns = STREAM_DATASETS[dataset]
+    lookups = [lookup for _, lookup in columns]
+    rows = queryset(project).order_by('id').values_list(*lookups)
+    return [name for name, _ in columns], rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def stream_dataset_csv(project, dataset):
+    """Yield a dataset as CSV lines, starting with the header"""
+    columns, rows = _dataset_rows(project, dataset)
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_dataset_ndjson(project, dataset):
+    """Yield a dataset as newline-delimited JSON objects"""
+    columns, rows = _dataset_rows(project, dataset)
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
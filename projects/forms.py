@@ -537,7 +537,7 @@ class IssueForm(forms.ModelForm):
         
         # Filter milestone and page options by project
         if project:
-            self.fields['milestone'].queryset = Milestone.objects.filter(project=project)
+            self.fields['milestone'].queryset = Milestone.objects.filter(project=project).select_related('project')
             self.fields['page'].queryset = Page.objects.filter(project=project)
             
             # Filter violations by project standards if project type is accessibility
@@ -552,7 +552,7 @@ class IssueForm(forms.ModelForm):
         
         # If instance exists, filter by its project
         elif self.instance and self.instance.project:
-            self.fields['milestone'].queryset = Milestone.objects.filter(project=self.instance.project)
+            self.fields['milestone'].queryset = Milestone.objects.filter(project=self.instance.project).select_related('project')
             self.fields['page'].queryset = Page.objects.filter(project=self.instance.project)
             
             # Filter violations by project standards if project type is accessibility
@@ -582,12 +582,12 @@ class CommentForm(forms.ModelForm):
         
         # Filter milestone options by project
         if issue and issue.project:
-            self.fields['milestone'].queryset = Milestone.objects.filter(project=issue.project)
+            self.fields['milestone'].queryset = Milestone.objects.filter(project=issue.project).select_related('project')
         elif self.instance and hasattr(self.instance, 'issue'):
             try:
                 # Safely check if the related issue exists and has a project
                 if self.instance.issue and self.instance.issue.project:
-                    self.fields['milestone'].queryset = Milestone.objects.filter(project=self.instance.issue.project)
+                    self.fields['milestone'].queryset = Milestone.objects.filter(project=self.instance.issue.project).select_related('project')
             except Comment.issue.RelatedObjectDoesNotExist:
                 # Handle the case where there is no related issue
                 pass
@@ -601,4 +601,61 @@ class IssueStatusForm(forms.Form):
     comment = forms.CharField(
         widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
         required=False
-    )
\ No newline at end of file
+    )
+class IssueFilterForm(forms.Form):
+    """Filters, sort order and cursor for the paginated project issue table"""
+    SORT_CHOICES = [
+        ('newest', 'Newest first'),
+        ('oldest', 'Oldest first'),
+    ]
+    
+    current_status = forms.ChoiceField(
+        choices=[('', 'All statuses')] + Issue.STATUS_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    user_impact = forms.ChoiceField(
+        choices=[('', 'All impacts')] + Issue.IMPACT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    tool_or_method = forms.ChoiceField(
+        choices=[('', 'All tools')] + Issue.TOOL_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    page = forms.ModelChoiceField(
+        queryset=Page.objects.none(),
+        required=False,
+        empty_label='All pages',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    milestone = forms.ModelChoiceField(
+        queryset=Milestone.objects.none(),
+        required=False,
+        empty_label='All milestones',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    assigned_to = forms.ModelChoiceField(
+        queryset=CustomUser.objects.none(),
+        required=False,
+        empty_label='Anyone',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    sort = forms.ChoiceField(
+        choices=SORT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    cursor = forms.CharField(required=False, widget=forms.HiddenInput())
+    page_size = forms.IntegerField(required=False, min_value=1, max_value=200, widget=forms.HiddenInput())
+    
+    def __init__(self, *args, **kwargs):
+        project = kwargs.pop('project', None)
+        super().__init__(*args, **kwargs)
+        
+        # Only offer the pages, milestones and people that belong to this project
+        if project:
+            self.fields['page'].queryset = Page.objects.filter(project=project)
+            self.fields['milestone'].queryset = Milestone.objects.filter(project=project).select_related('project')
+            self.fields['assigned_to'].queryset = project.assigned_to.all()
@@ -0,0 +1,77 @@
+"""
+The queries the project pages run most often, registered so that
+`manage.py explain_hot_queries` can check each one is served by an index.
+"""
+import re
+from datetime import timedelta
+from django.utils import timezone
+from .models import Issue, Comment, IssueModification
+
+HOT_QUERIES = {}
+
+# Plan lines that mean a table is read row by row rather than through an index
+SEQUENTIAL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)\s*$'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+
+def hot_query(name):
+    """Register a function that builds a hot query from a sample issue"""
+    def register(build):
+        HOT_QUERIES[name] = build
+        return build
+    return register
+
+
+def sample_issue():
+    """An issue with a comment and a modification to fill in the query parameters, or None"""
+    issue_id = Comment.objects.order_by().values_list('issue_id', flat=True).first()
+    if issue_id is None:
+        return None
+    return Issue.objects.select_related('project', 'milestone', 'created_by').get(pk=issue_id)
+
+
+def sequential_scans(queryset, vendor):
+    """Return the EXPLAIN output of queryset and the tables its plan scans sequentially"""
+    plan = queryset.explain()
+    pattern = SEQUENTIAL_SCAN_PATTERNS[vendor]
+    tables = []
+    for line in plan.splitlines():
+        match = pattern.search(line)
+        if match:
+            tables.append(match.group(1))
+    return plan, tables
+
+
+@hot_query('issues by project and status')
+def issues_by_project_status(issue):
+    return Issue.objects.filter(project_id=issue.project_id, current_status='ready_for_testing')
+
+
+@hot_query('issues by milestone, newest first')
+def issues_by_milestone(issue):
+    return Issue.objects.filter(milestone_id=issue.milestone_id).order_by('-created_at')
+
+
+@hot_query('modifications by milestone in the last week')
+def modifications_by_milestone(issue):
+    return IssueModification.objects.filter(
+        milestone_id=issue.milestone_id,
+        created_at__gte=timezone.now() - timedelta(days=7),
+    ).order_by('-created_at')
+
+
+@hot_query('modifications by user, newest first')
+def modifications_by_user(issue):
+    return IssueModification.objects.filter(modified_by_id=issue.created_by_id).order_by('-created_at')
+
+
+@hot_query('comments on an issue in order')
+def comments_by_issue(issue):
+    return Comment.objects.filter(issue_id=issue.pk).order_by('created_at')
+
+
+@hot_query('comments by author, newest first')
+def comments_by_author(issue):
+    return Comment.objects.filter(author_id=issue.created_by_id).order_by('-created_at')
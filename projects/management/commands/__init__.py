@@ -0,0 +1,3 @@
+# Management commands package 
+
+# This file is intentionally left empty to make the directory a Python package 
\ No newline at end of file
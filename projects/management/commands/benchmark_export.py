@@ -0,0 +1,267 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from clients.models import Client
+from projects.exports import build_project_workbook
+from projects.models import ProjectType, Project, Page, Milestone, Issue, Comment, IssueStatusCounter
+from users.models import CustomUser
+from io import BytesIO
+import multiprocessing
+import resource
+import time
+
+
+def legacy_export(project):
+    """
+    The pandas DataFrame export that build_project_workbook replaced, kept for comparison.
+
+    The body of export_project_to_excel before the streaming engine, copied
+    verbatim; only the access check before it and the HttpResponse built
+    from the bytes after it are left out.
+    """
+    import pandas as pd
+
+    # Create Excel writer
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        # Project Details Sheet
+        project_data = {
+            'Field': [
+                'Name', 'Client', 'Project Type', 'Status', 'Created At', 'Updated At',
+                'Team Members', 'Notes'
+            ],
+            'Value': [
+                project.name,
+                project.client.company_name if project.client else '',
+                project.project_type.name if project.project_type else '',
+                project.get_status_display(),
+                project.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                project.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
+                ', '.join([user.get_full_name() for user in project.assigned_to.all()]),
+                project.notes or ''
+            ]
+        }
+        pd.DataFrame(project_data).to_excel(writer, sheet_name='Project Details', index=False)
+        
+        # Pages Sheet
+        pages = Page.objects.filter(project=project)
+        pages_data = []
+        for page in pages:
+            pages_data.append({
+                'Name': page.name,
+                'URL': page.url,
+                'Status': getattr(page, 'status', ''),
+                'Last Checked': getattr(page, 'last_checked', '').strftime('%Y-%m-%d %H:%M:%S') if hasattr(page, 'last_checked') and page.last_checked else '',
+                'Notes': getattr(page, 'notes', '') or '',
+                'Created At': page.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                'Updated At': page.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+            })
+        pd.DataFrame(pages_data).to_excel(writer, sheet_name='Pages', index=False)
+        
+        # Issues Sheet
+        issues = Issue.objects.filter(project=project)
+        issues_data = []
+        for issue in issues:
+            issues_data.append({
+                'Description': issue.issue_description,
+                'Status': issue.get_current_status_display(),
+                'Severity': getattr(issue, 'get_severity_display', lambda: '')() if hasattr(issue, 'severity') else '',
+                'Page': issue.page.name if issue.page else '',
+                'Milestone': issue.milestone.name if issue.milestone else '',
+                'Assigned To': issue.assigned_to.get_full_name() if issue.assigned_to else '',
+                'Steps to Reproduce': getattr(issue, 'steps_to_reproduce', '') or '',
+                'User Impact': getattr(issue, 'user_impact', '') or '',
+                'User Impact Description': getattr(issue, 'user_impact_description', '') or '',
+                'Created By': issue.created_by.get_full_name() if issue.created_by else '',
+                'Created At': issue.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                'Updated At': issue.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+            })
+        pd.DataFrame(issues_data).to_excel(writer, sheet_name='Issues', index=False)
+        
+        # Milestones Sheet
+        milestones = Milestone.objects.filter(project=project)
+        milestones_data = []
+        for milestone in milestones:
+            milestones_data.append({
+                'Name': milestone.name,
+                'Description': getattr(milestone, 'description', '') or '',
+                'Due Date': milestone.due_date.strftime('%Y-%m-%d') if milestone.due_date else '',
+                'Completed Date': getattr(milestone, 'completed_date', '').strftime('%Y-%m-%d') if hasattr(milestone, 'completed_date') and milestone.completed_date else '',
+                'Status': milestone.get_status_display(),
+                'Type': getattr(milestone, 'milestone_type', '') if hasattr(milestone, 'milestone_type') else '',
+                'Assigned To': milestone.assigned_to.get_full_name() if milestone.assigned_to else '',
+                'Created By': milestone.created_by.get_full_name() if milestone.created_by else '',
+                'Notes': getattr(milestone, 'notes', '') or '',
+                'Created At': milestone.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                'Updated At': milestone.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+            })
+        pd.DataFrame(milestones_data).to_excel(writer, sheet_name='Milestones', index=False)
+        
+        # Comments Sheet
+        comments = Comment.objects.filter(issue__project=project)
+        comments_data = []
+        for comment in comments:
+            comments_data.append({
+                'Issue': comment.issue.issue_description[:50] + '...' if len(comment.issue.issue_description) > 50 else comment.issue.issue_description,
+                'Author': comment.author.get_full_name() if comment.author else '',
+                'Type': comment.get_comment_type_display(),
+                'Text': comment.text,
+                'Status Changed': 'Yes' if comment.status_changed else 'No',
+                'Previous Status': comment.previous_status if comment.status_changed else '',
+                'New Status': comment.new_status if comment.status_changed else '',
+                'Created At': comment.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                'Updated At': comment.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+            })
+        pd.DataFrame(comments_data).to_excel(writer, sheet_name='Comments', index=False)
+        
+        # Project Standards Sheet
+        if hasattr(project, 'standards'):
+            standards = project.standards.all()
+            standards_data = []
+            for standard in standards:
+                standards_data.append({
+                    'Name': standard.name,
+                    'Description': getattr(standard, 'description', '') or '',
+                    'Version': getattr(standard, 'version', '') or '',
+                    'Status': getattr(standard, 'get_status_display', lambda: '')() if hasattr(standard, 'status') else '',
+                    'Created At': standard.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                    'Updated At': standard.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+                })
+            pd.DataFrame(standards_data).to_excel(writer, sheet_name='Standards', index=False)
+        
+        # Violations Sheet
+        if hasattr(project, 'violations'):
+            violations = project.violations.all()
+            violations_data = []
+            for violation in violations:
+                violations_data.append({
+                    'Standard': violation.standard.name if violation.standard else '',
+                    'Name': violation.name,
+                    'Description': getattr(violation, 'description', '') or '',
+                    'Severity': getattr(violation, 'get_severity_display', lambda: '')() if hasattr(violation, 'severity') else '',
+                    'Status': getattr(violation, 'get_status_display', lambda: '')() if hasattr(violation, 'status') else '',
+                    'Created At': violation.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                    'Updated At': violation.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+                })
+            pd.DataFrame(violations_data).to_excel(writer, sheet_name='Violations', index=False)
+    
+    # Prepare response
+    output.seek(0)
+    return output.read()
+
+
+def streaming_export(project):
+    """Drain the new engine's spooled workbook the way FileResponse does"""
+    size = 0
+    with build_project_workbook(project) as workbook:
+        for chunk in iter(lambda: workbook.read(64 * 1024), b''):
+            size += len(chunk)
+    return size
+
+
+def _run_in_child(name, project_id, results):
+    """Run one export in a fresh process so ru_maxrss reflects only that export"""
+    project = Project.objects.select_related('client', 'project_type').get(pk=project_id)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if name == 'legacy':
+        size = len(legacy_export(project))
+    else:
+        size = streaming_export(project)
+    elapsed = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({
+        'name': name,
+        'seconds': elapsed,
+        'peak_rss_mb': peak_kb / 1024,
+        'rss_growth_mb': (peak_kb - baseline_kb) / 1024,
+        'bytes': size,
+    })
+
+
+class Command(BaseCommand):
+    help = 'Compare peak RSS and wall time of the streaming Excel export against the pandas implementation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--issues', type=int, default=50000, help='Number of synthetic issues')
+        parser.add_argument('--comments-per-issue', type=int, default=2, help='Comments per synthetic issue')
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic project afterwards')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Seeding a synthetic project with {options['issues']} issues...")
+        client, project = self.seed(options['issues'], options['comments_per_issue'])
+
+        try:
+            # Each child opens its own database connection
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            results = context.Queue()
+            for name in ['legacy', 'streaming']:
+                child = context.Process(target=_run_in_child, args=(name, project.pk, results))
+                child.start()
+                result = results.get()
+                child.join()
+                self.stdout.write(
+                    f"{result['name']:>10}: {result['seconds']:.2f}s, "
+                    f"peak RSS {result['peak_rss_mb']:.1f} MB "
+                    f"(+{result['rss_growth_mb']:.1f} MB during export), "
+                    f"{result['bytes'] / 1024 / 1024:.1f} MB workbook"
+                )
+        finally:
+            if not options['keep']:
+                client.delete()
+                self.stdout.write('Removed the synthetic project')
+
+    def seed(self, issue_count, comments_per_issue):
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S')
+        user = CustomUser.objects.filter(is_superuser=True).first() or CustomUser.objects.first()
+        client = Client.objects.create(
+            company_name=f'Export benchmark {suffix}',
+            contact_name='Benchmark',
+            email='benchmark@example.com',
+        )
+        project_type, _ = ProjectType.objects.get_or_create(
+            name='Export Benchmark',
+            defaults={'supports_standards': False},
+        )
+        project = Project.objects.create(
+            name=f'Export benchmark {suffix}',
+            client=client,
+            project_type=project_type,
+            created_by=user,
+        )
+        pages = Page.objects.bulk_create([
+            Page(project=project, name=f'Page {i}', url=f'https://example.com/{i}', created_by=user)
+            for i in range(50)
+        ])
+        milestones = Milestone.objects.bulk_create([
+            Milestone(project=project, name=f'Milestone {i}', assigned_to=user, created_by=user)
+            for i in range(10)
+        ])
+
+        batch_size = 2000
+        for start in range(0, issue_count, batch_size):
+            issues = Issue.objects.bulk_create([
+                Issue(
+                    project=project,
+                    page=pages[i % len(pages)],
+                    milestone=milestones[i % len(milestones)],
+                    issue_description=f'Synthetic issue {i}: the control has no accessible name. ' * 3,
+                    steps_to_reproduce='1. Open the page\n2. Tab to the control\n3. Listen to the announcement',
+                    tool_or_method=Issue.TOOL_CHOICES[i % len(Issue.TOOL_CHOICES)][0],
+                    user_impact=Issue.IMPACT_CHOICES[i % len(Issue.IMPACT_CHOICES)][0],
+                    user_impact_description='Screen reader users cannot identify the control.',
+                    current_status=Issue.STATUS_CHOICES[i % len(Issue.STATUS_CHOICES)][0],
+                    created_by=user,
+                    assigned_to=user,
+                )
+                for i in range(start, min(start + batch_size, issue_count))
+            ], batch_size=batch_size)
+            Comment.objects.bulk_create([
+                Comment(issue=issue, author=user, milestone=issue.milestone, text=f'Retested, still failing ({j}).')
+                for issue in issues
+                for j in range(comments_per_issue)
+            ], batch_size=batch_size)
+        # bulk_create skips the signals that keep the status counters, and --keep leaves the project in use
+        IssueStatusCounter.rebuild([project])
+        return client, project
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from projects.hot_queries import HOT_QUERIES, sample_issue, sequential_scans
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN on each registered hot query and fail if any plan falls back to a '
+        'sequential scan. Run it against a large dataset: planners may prefer scans on small tables.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Print the full plan of every query, not only the failing ones',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f"EXPLAIN checks support SQLite and PostgreSQL, not {connection.vendor}")
+
+        issue = sample_issue()
+        if issue is None:
+            raise CommandError("No commented issues to build the queries from; run seed_perf_data first")
+
+        failures = []
+        for name, build in HOT_QUERIES.items():
+            plan, tables = sequential_scans(build(issue), connection.vendor)
+            if tables:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: sequential scan on {', '.join(tables)}"))
+                self.stdout.write(plan)
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: uses an index"))
+                if options['verbose_plans']:
+                    self.stdout.write(plan)
+
+        if failures:
+            logger.warning(f"Hot queries without an index: {', '.join(failures)}")
+            raise CommandError(f"{len(failures)} of {len(HOT_QUERIES)} hot queries scan a table sequentially")
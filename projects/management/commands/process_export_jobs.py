@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from projects.exports import claim_next_export_job, run_export_job
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Build queued project Excel exports in the background'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs that are currently queued and exit',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            job = claim_next_export_job()
+
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+
+            try:
+                run_export_job(job)
+                self.stdout.write(self.style.SUCCESS(f"Built export {job.pk} for project {job.project_id}"))
+            except Exception as e:
+                logger.exception(f"Export job {job.pk} failed")
+                job.status = 'failed'
+                job.error = str(e)
+                job.completed_at = timezone.now()
+                job.save(update_fields=['status', 'error', 'completed_at'])
+                self.stdout.write(self.style.ERROR(f"Export {job.pk} failed: {e}"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from projects.models import IssueStatusCounter, Project
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Recount the per-project and per-milestone issue status counters from the issues table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--project',
+            type=int,
+            action='append',
+            help='Only rebuild the counters of this project id (may be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        projects = None
+        if options['project']:
+            projects = Project.objects.filter(pk__in=options['project'])
+        rows = IssueStatusCounter.rebuild(projects)
+        logger.info(f"Rebuilt {rows} issue status counters")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} issue status counters"))
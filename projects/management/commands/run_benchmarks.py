@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment, teardown_test_environment
+from benchmarks.runner import compare, run_suite
+from benchmarks.scenarios import SCENARIOS
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the hot pages on seeded datasets of increasing size and report latency, queries, '
+        'bytes and peak memory as JSON, flagging regressions against a stored baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='1000,10000',
+            help='Comma-separated issue counts of the datasets to seed and measure',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=sorted(SCENARIOS),
+            help='Only run this scenario (may be repeated)',
+        )
+        parser.add_argument('--iterations', type=int, default=10, help='Timed requests per scenario')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for the generated datasets')
+        parser.add_argument('--flush', action='store_true', help='Regenerate datasets seeded by an earlier run')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline report to compare against')
+        parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Fraction by which timings, sizes and memory may exceed the baseline',
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+
+        # Allows the test client's host and keeps notification emails in memory
+        setup_test_environment()
+        try:
+            report = run_suite(
+                sizes,
+                names=options['scenario'],
+                iterations=options['iterations'],
+                seed=options['seed'],
+                flush=options['flush'],
+                stdout=self.stdout,
+            )
+        finally:
+            teardown_test_environment()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stdout.write(f"Wrote report to {options['output']}")
+        else:
+            self.stdout.write(output)
+
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}"))
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(self.style.WARNING("No baseline to compare against; rerun with --save-baseline"))
+            return
+
+        with open(options['baseline']) as f:
+            regressions = compare(report, json.load(f), options['tolerance'])
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            logger.warning(f"Benchmark regressions: {len(regressions)}")
+            raise CommandError(f"{len(regressions)} benchmark regressions against {options['baseline']}")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
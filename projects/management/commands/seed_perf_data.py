@@ -0,0 +1,409 @@
+from contextlib import contextmanager
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from clients.models import Client
+from projects.models import (
+    ProjectType, Project, Standard, Violation, ProjectStandard, Page, Milestone,
+    Issue, Comment, IssueComment, IssueModification, IssueStatusCounter,
+)
+from users.models import CustomUser, Role
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Roughly how issue statuses are spread across real projects
+STATUS_WEIGHTS = {
+    'fail': 40,
+    'in_remediation': 15,
+    'ready_for_testing': 10,
+    'qa': 5,
+    'pass': 30,
+}
+
+PROJECT_TYPES = [
+    {
+        'name': 'Accessibility Audit',
+        'supports_standards': True,
+        'status_choices': [
+            ['audit', 'Audit'], ['remediation', 'Remediation'], ['qa', 'QA'], ['completed', 'Completed'],
+        ],
+        'milestone_choices': [['audit', 'Audit'], ['retest', 'Retest'], ['final', 'Final Report']],
+        'issue_fields': [
+            {'name': 'wcag_level', 'type': 'select', 'required': True, 'choices': [['a', 'A'], ['aa', 'AA'], ['aaa', 'AAA']]},
+            {'name': 'browser', 'type': 'text', 'required': False},
+        ],
+    },
+    {
+        'name': 'Beta App Review',
+        'supports_standards': False,
+        'status_choices': [['in_progress', 'In Progress'], ['completed', 'Completed']],
+        'milestone_choices': [['beta', 'Beta'], ['release', 'Release Candidate']],
+        'issue_fields': [
+            {'name': 'platform', 'type': 'select', 'required': True, 'choices': [['ios', 'iOS'], ['android', 'Android']]},
+            {'name': 'build_number', 'type': 'text', 'required': False},
+        ],
+    },
+    {
+        'name': 'App Development',
+        'supports_standards': False,
+        'status_choices': [['in_development', 'In Development'], ['qa', 'QA'], ['completed', 'Completed']],
+        'milestone_choices': [['sprint', 'Sprint'], ['release', 'Release']],
+        'issue_fields': [{'name': 'component', 'type': 'text', 'required': False}],
+    },
+]
+
+COMMENT_TEXTS = [
+    'Retested with NVDA and Firefox, the control still has no accessible name.',
+    'Fixed in the latest deploy, ready for another look.',
+    'This also affects the mobile navigation menu.',
+    'Focus order jumps from the header straight to the footer.',
+    'Confirmed with VoiceOver on iOS. The announcement is now correct.',
+    'Could you share the exact steps? I cannot reproduce this on staging.',
+]
+
+
+COMMENT_COLUMNS = [
+    'issue', 'author', 'milestone', 'comment_type', 'text', 'status_changed', 'created_at', 'updated_at',
+]
+MODIFICATION_COLUMNS = [
+    'issue', 'milestone', 'modified_by', 'modification_type', 'previous_value', 'new_value', 'created_at',
+]
+
+
+def insert_rows(model, field_names, rows, batch_size):
+    """
+    INSERT tuples of database-ready values with one executemany per batch_size rows.
+    
+    Used for the comment and history tables, which hold most of the rows:
+    building a model instance per row and compiling bulk_create batches
+    costs several times more than the database work itself.
+    """
+    qn = connection.ops.quote_name
+    columns = [model._meta.get_field(name).column for name in field_names]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        qn(model._meta.db_table),
+        ', '.join(qn(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+
+
+@contextmanager
+def manual_timestamps(*models):
+    """Let bulk_create store the given created_at/updated_at values instead of now()"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generate a large, deterministic synthetic dataset for load tests and benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--issues', type=int, default=100000, help='Total number of issues to create')
+        parser.add_argument('--clients', type=int, default=20, help='Number of clients')
+        parser.add_argument('--projects-per-client', type=int, default=5, help='Projects created for each client')
+        parser.add_argument('--users', type=int, default=50, help='Number of staff and client users')
+        parser.add_argument('--pages-per-project', type=int, default=30, help='Pages created for each project')
+        parser.add_argument('--milestones-per-project', type=int, default=4, help='Milestones created for each project')
+        parser.add_argument('--standards', type=int, default=3, help='Number of standards')
+        parser.add_argument('--violations-per-standard', type=int, default=50, help='Violations created for each standard')
+        parser.add_argument('--comments-per-issue', type=float, default=6, help='Mean comments per issue (long-tailed)')
+        parser.add_argument('--modifications-per-issue', type=float, default=12, help='Mean history entries per issue (long-tailed)')
+        parser.add_argument('--days', type=int, default=365, help='Spread creation dates over this many days')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT batch')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--label', default='perf', help='Prefix of every generated name, used to find the data again')
+        parser.add_argument('--flush', action='store_true', help='Delete data generated earlier with this label first')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        self.label = options['label']
+        self.batch_size = options['batch_size']
+        self.now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        if options['flush']:
+            self.flush()
+        elif Client.objects.filter(company_name__startswith=f'{self.label} ').exists():
+            raise CommandError(f"Data labelled '{self.label}' already exists; pass --flush or another --label")
+
+        started = time.perf_counter()
+        with manual_timestamps(Client, Project, Page, Milestone, Issue):
+            with transaction.atomic():
+                users = self.create_users()
+                project_types = self.create_project_types()
+                violations = self.create_standards(users)
+                projects = self.create_projects(users, project_types, violations)
+            issue_count = self.create_issues(projects, users)
+
+        IssueStatusCounter.rebuild(Project.objects.filter(pk__in=[project['id'] for project in projects]))
+        elapsed = time.perf_counter() - started
+        logger.info(f"Seeded {issue_count} issues labelled '{self.label}' in {elapsed:.1f}s")
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(projects)} projects and {issue_count} issues in {elapsed:.1f}s"
+        ))
+
+    def past(self):
+        """A deterministic timestamp within the seeded history"""
+        return self.now - timedelta(seconds=self.rng.randrange(max(self.options['days'] * 86400, 1)))
+
+    def long_tail(self, mean):
+        """Counts with many small values and a few very large ones, like real comment threads"""
+        if mean <= 0:
+            return 0
+        return int(self.rng.expovariate(1 / mean))
+
+    def flush(self):
+        self.stdout.write(f"Deleting data labelled '{self.label}'...")
+        with transaction.atomic():
+            # The issue tables are emptied with plain DELETEs; going through the
+            # collector would load every row to send post_delete signals
+            issues = Issue.objects.filter(project__client__company_name__startswith=f'{self.label} ')
+            for model in [IssueModification, Comment, IssueComment]:
+                model.objects.filter(issue__in=issues)._raw_delete(model.objects.db)
+            Issue.objects.filter(pk__in=issues.values('pk'))._raw_delete(Issue.objects.db)
+            Client.objects.filter(company_name__startswith=f'{self.label} ').delete()
+            Standard.objects.filter(name__startswith=f'{self.label} ').delete()
+            ProjectType.objects.filter(name__startswith=f'{self.label} ').delete()
+            CustomUser.objects.filter(email__startswith=f'{self.label}-user').delete()
+
+    def create_users(self):
+        roles = [Role.cached(Role.STAFF), Role.cached(Role.CLIENT), Role.cached(Role.ADMIN)]
+        users = []
+        for i in range(self.options['users']):
+            user = CustomUser(
+                email=f'{self.label}-user{i}@example.com',
+                first_name=f'User{i}',
+                last_name=self.label.title(),
+                role=roles[0] if i % 3 else roles[1] if i % 9 else roles[2],
+            )
+            user.set_unusable_password()
+            users.append(user)
+        return [user.pk for user in CustomUser.objects.bulk_create(users, batch_size=self.batch_size)]
+
+    def create_project_types(self):
+        return [
+            ProjectType.objects.create(**{**definition, 'name': f"{self.label} {definition['name']}"})
+            for definition in PROJECT_TYPES
+        ]
+
+    def create_standards(self, users):
+        standards = Standard.objects.bulk_create([
+            Standard(name=f'{self.label} WCAG', version=f'2.{i}', created_by_id=users[0])
+            for i in range(self.options['standards'])
+        ])
+        violations = Violation.objects.bulk_create([
+            Violation(
+                name=f'{i // 10 + 1}.{i % 10 + 1}.{i % 4 + 1} Criterion {i}',
+                description='The content does not meet this success criterion.',
+                standard=standard,
+                created_by_id=users[0],
+            )
+            for standard in standards
+            for i in range(self.options['violations_per_standard'])
+        ], batch_size=self.batch_size)
+        by_standard = {}
+        for violation in violations:
+            by_standard.setdefault(violation.standard_id, []).append(violation.pk)
+        return by_standard
+
+    def create_projects(self, users, project_types, violations):
+        rng = self.rng
+        clients = Client.objects.bulk_create([
+            Client(
+                company_name=f'{self.label} Client {i}',
+                contact_name=f'Contact {i}',
+                email=f'{self.label}-client{i}@example.com',
+                point_of_contact_id=users[0],
+                created_at=self.past(),
+                updated_at=self.now,
+            )
+            for i in range(self.options['clients'])
+        ])
+
+        projects = []
+        for client in clients:
+            for i in range(self.options['projects_per_client']):
+                project_type = project_types[rng.randrange(len(project_types))]
+                projects.append(Project(
+                    name=f'{self.label} {client.company_name} project {i}',
+                    client=client,
+                    project_type=project_type,
+                    status=rng.choice(project_type.status_choices)[0],
+                    created_by_id=users[0],
+                    created_at=self.past(),
+                    updated_at=self.now,
+                ))
+        projects = Project.objects.bulk_create(projects, batch_size=self.batch_size)
+
+        Through = Project.assigned_to.through
+        Through.objects.bulk_create([
+            Through(project_id=project.pk, customuser_id=user_id)
+            for project in projects
+            for user_id in rng.sample(users, min(len(users), 5))
+        ], batch_size=self.batch_size)
+
+        standard_ids = list(violations)
+        ProjectStandard.objects.bulk_create([
+            ProjectStandard(project=project, standard_id=rng.choice(standard_ids), created_by_id=users[0])
+            for project in projects
+            if project.project_type.supports_standards and standard_ids
+        ], batch_size=self.batch_size)
+        standard_of = dict(ProjectStandard.objects.filter(project__in=projects).values_list('project_id', 'standard_id'))
+
+        pages = Page.objects.bulk_create([
+            Page(
+                project=project,
+                name=f'Page {i}',
+                url=f'https://{project.pk}.example.com/{i}',
+                created_by_id=users[0],
+                created_at=project.created_at,
+                updated_at=self.now,
+            )
+            for project in projects
+            for i in range(self.options['pages_per_project'])
+        ], batch_size=self.batch_size)
+        milestones = Milestone.objects.bulk_create([
+            Milestone(
+                project=project,
+                name=f'Round {i + 1}',
+                milestone_type=project.project_type.milestone_choices[i % len(project.project_type.milestone_choices)][0],
+                status=rng.choice(Milestone.STATUS_CHOICES)[0],
+                assigned_to_id=rng.choice(users),
+                due_date=(self.now + timedelta(days=rng.randrange(-60, 120))).date(),
+                created_by_id=users[0],
+                created_at=project.created_at,
+                updated_at=self.now,
+            )
+            for project in projects
+            for i in range(self.options['milestones_per_project'])
+        ], batch_size=self.batch_size)
+
+        summaries = {
+            project.pk: {
+                'id': project.pk,
+                'created_at': project.created_at,
+                'issue_fields': project.project_type.issue_fields,
+                'violations': violations.get(standard_of.get(project.pk), []),
+                'pages': [],
+                'milestones': [],
+            }
+            for project in projects
+        }
+        for page in pages:
+            summaries[page.project_id]['pages'].append(page.pk)
+        for milestone in milestones:
+            summaries[milestone.project_id]['milestones'].append(milestone.pk)
+        return list(summaries.values())
+
+    def dynamic_fields(self, issue_fields, i):
+        values = {}
+        for field in issue_fields:
+            if field.get('choices'):
+                values[field['name']] = field['choices'][i % len(field['choices'])][0]
+            else:
+                values[field['name']] = f"{field['name']} {i % 17}"
+        return values
+
+    def create_issues(self, projects, users):
+        rng = self.rng
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+        tools = [key for key, _ in Issue.TOOL_CHOICES]
+        impacts = [key for key, _ in Issue.IMPACT_CHOICES]
+        total = self.options['issues']
+        created = 0
+
+        while created < total:
+            batch = []
+            for i in range(created, min(created + self.batch_size, total)):
+                project = projects[rng.randrange(len(projects))]
+                created_at = project['created_at'] + (self.now - project['created_at']) * rng.random()
+                batch.append(Issue(
+                    project_id=project['id'],
+                    page_id=rng.choice(project['pages']),
+                    milestone_id=rng.choice(project['milestones']),
+                    violation_id=rng.choice(project['violations']) if project['violations'] else None,
+                    issue_description=f'Issue {i}: the control has no accessible name and cannot be identified.',
+                    steps_to_reproduce='1. Open the page\n2. Tab to the control\n3. Listen to the announcement',
+                    tool_or_method=rng.choice(tools),
+                    user_impact=rng.choice(impacts),
+                    user_impact_description='Screen reader users cannot identify the control.',
+                    current_status=rng.choices(statuses, weights)[0],
+                    dynamic_fields=self.dynamic_fields(project['issue_fields'], i),
+                    created_by_id=rng.choice(users),
+                    assigned_to_id=rng.choice(users),
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+
+            with transaction.atomic():
+                issues = Issue.objects.bulk_create(batch, batch_size=self.batch_size)
+                self.create_history(issues, users, statuses, weights)
+            created += len(batch)
+            self.stdout.write(f"  {created}/{total} issues")
+        return created
+
+    def create_history(self, issues, users, statuses, weights):
+        """Comments and a status history for each issue, flushed in batches"""
+        rng = self.rng
+        db_datetime = connection.ops.adapt_datetimefield_value
+        now = db_datetime(self.now)
+        comments = []
+        modifications = []
+        for issue in issues:
+            span = max((self.now - issue.created_at).total_seconds(), 1)
+            for _ in range(self.long_tail(self.options['comments_per_issue'])):
+                comments.append((
+                    issue.pk,
+                    rng.choice(users),
+                    issue.milestone_id,
+                    'internal' if rng.random() < 0.3 else 'external',
+                    rng.choice(COMMENT_TEXTS),
+                    False,
+                    db_datetime(issue.created_at + timedelta(seconds=rng.random() * span)),
+                    now,
+                ))
+
+            history = self.long_tail(self.options['modifications_per_issue'])
+            previous = None
+            for step in range(history + 1):
+                # The last entry leaves the issue in its current status
+                status = issue.current_status if step == history else rng.choices(statuses, weights)[0]
+                modifications.append((
+                    issue.pk,
+                    issue.milestone_id,
+                    rng.choice(users),
+                    'creation' if step == 0 else 'status_change',
+                    previous,
+                    status,
+                    db_datetime(issue.created_at + timedelta(seconds=span * step / (history + 1))),
+                ))
+                previous = status
+
+            # Issues add rows to both tables, so flush each as it fills a batch
+            if len(comments) >= self.batch_size:
+                insert_rows(Comment, COMMENT_COLUMNS, comments, self.batch_size)
+                comments = []
+            if len(modifications) >= self.batch_size:
+                insert_rows(IssueModification, MODIFICATION_COLUMNS, modifications, self.batch_size)
+                modifications = []
+
+        insert_rows(Comment, COMMENT_COLUMNS, comments, self.batch_size)
+        insert_rows(IssueModification, MODIFICATION_COLUMNS, modifications, self.batch_size)
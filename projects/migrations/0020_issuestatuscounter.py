@@ -0,0 +1,45 @@
+# Generated by Django 5.1.7 on 2026-10-16 20:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_issues(apps, schema_editor):
+    """Fill the counters from the issues that already exist"""
+    Issue = apps.get_model('projects', 'Issue')
+    IssueStatusCounter = apps.get_model('projects', 'IssueStatusCounter')
+    rows = Issue.objects.order_by().values('project_id', 'milestone_id', 'current_status').annotate(total=Count('id'))
+    IssueStatusCounter.objects.bulk_create([
+        IssueStatusCounter(
+            project_id=row['project_id'],
+            milestone_id=row['milestone_id'],
+            status=row['current_status'],
+            count=row['total'],
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0019_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueStatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pass', 'Pass'), ('fail', 'Fail'), ('qa', 'QA'), ('in_remediation', 'In Remediation'), ('ready_for_testing', 'Ready For Testing')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('milestone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='issue_status_counters', to='projects.milestone')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='issue_status_counters', to='projects.project')),
+            ],
+            options={
+                'unique_together': {('project', 'milestone', 'status')},
+            },
+        ),
+        migrations.RunPython(count_existing_issues, migrations.RunPython.noop),
+    ]
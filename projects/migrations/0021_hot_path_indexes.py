@@ -0,0 +1,39 @@
+# Generated by Django 5.1.7 on 2026-10-16 20:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0020_issuestatuscounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['issue', 'created_at'], name='projects_co_issue_i_07dc6e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['author', 'created_at'], name='projects_co_author__e774f7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'current_status'], name='projects_is_project_94691f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['milestone', 'created_at'], name='projects_is_milesto_12cbce_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issuemodification',
+            index=models.Index(fields=['milestone', 'created_at'], name='projects_is_milesto_c5b049_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issuemodification',
+            index=models.Index(fields=['modified_by', 'created_at'], name='projects_is_modifie_1cc7d1_idx'),
+        ),
+    ]
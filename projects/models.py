@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils.text import slugify
 from clients.models import Client
-from users.models import CustomUser
+from users.models import CustomUser, FieldTrackingMixin
 
 class ProjectType(models.Model):
     """Project type model (e.g., Accessibility, Beta App Review, App Development, Other)"""
@@ -30,6 +32,32 @@ class ProjectType(models.Model):
     def __str__(self):
         return self.name
 
+class ProjectQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Projects the user may see: all of them for admins and staff, otherwise the assigned ones"""
+        from .access import ProjectAccess
+        if ProjectAccess.for_user(user).is_staff_member:
+            return self
+        if not user.is_authenticated:
+            return self.none()
+        return self.filter(assigned_to=user)
+
+    def with_summary(self):
+        """
+        Load client and project type and annotate issue counts (read from the
+        status counters) and the next milestone due date, all in the one grouped
+        query that lists the projects.
+        """
+        return self.select_related('client', 'project_type').annotate(
+            issue_count=IssueStatusCounter.total_for_project(),
+            open_issue_count=IssueStatusCounter.total_for_project(exclude=['pass']),
+            fail_issue_count=IssueStatusCounter.total_for_project(statuses=['fail']),
+            ready_for_testing_count=IssueStatusCounter.total_for_project(statuses=['ready_for_testing']),
+            next_milestone_due=Min(
+                'milestones__due_date', filter=~Q(milestones__status__in=['completed', 'published'])
+            ),
+        )
+
 class Project(models.Model):
     """Project model with status choices based on project type"""
     # Default status choices if project type doesn't define any
@@ -49,6 +77,8 @@ class Project(models.Model):
     created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, related_name='created_projects')
     assigned_to = models.ManyToManyField(CustomUser, related_name='assigned_projects', blank=True)
     
+    objects = ProjectQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.name} ({self.client.company_name})"
     
@@ -212,7 +242,7 @@ class Milestone(models.Model):
     class Meta:
         ordering = ['due_date', 'name']
 
-class Issue(models.Model):
+class Issue(FieldTrackingMixin, models.Model):
     """Issue model for tracking issues in projects"""
     TOOL_CHOICES = [
         ('jaws', 'JAWS'),
@@ -261,6 +291,9 @@ class Issue(models.Model):
     def __str__(self):
         return f"{self.project.name} - {self.page.name} - {self.issue_description[:50]}"
     
+    # Fields the status counters are keyed on, tracked so signals see the old values
+    tracked_fields = ('project', 'milestone', 'current_status')
+    
     def get_current_status_display(self):
         """Return the display value for the current status"""
         for key, display in self.STATUS_CHOICES:
@@ -270,6 +303,83 @@ class Issue(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['project', 'current_status']),
+            models.Index(fields=['milestone', 'created_at']),
+        ]
+
+class IssueStatusCounter(models.Model):
+    """
+    Number of issues per project, milestone and status.
+    
+    Kept current by the Issue signals in projects.signals; rebuild() (or the
+    rebuild_counters command) recounts them after bulk changes that skip signals.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='issue_status_counters')
+    milestone = models.ForeignKey(Milestone, on_delete=models.CASCADE, related_name='issue_status_counters')
+    status = models.CharField(max_length=20, choices=Issue.STATUS_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.project_id}/{self.milestone_id}/{self.status}: {self.count}"
+    
+    @classmethod
+    def adjust(cls, project_id, milestone_id, status, delta):
+        """Add delta to one counter with an F() update, creating the row on first use"""
+        counters = cls.objects.filter(project_id=project_id, milestone_id=milestone_id, status=status)
+        if delta < 0:
+            # Never go below zero if the counters have drifted; rebuild() repairs them
+            counters = counters.filter(count__gte=-delta)
+        if counters.update(count=F('count') + delta) or delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(project_id=project_id, milestone_id=milestone_id, status=status, count=delta)
+        except IntegrityError:
+            # Another transaction created the row first
+            counters.update(count=F('count') + delta)
+    
+    @classmethod
+    def summary(cls, **filters):
+        """Return {status: count} for the counters matching filters, e.g. project=... or milestone=..."""
+        rows = cls.objects.filter(count__gt=0, **filters).values('status').annotate(total=Sum('count'))
+        return {row['status']: row['total'] for row in rows.order_by()}
+    
+    @classmethod
+    def total_for_project(cls, statuses=None, exclude=None):
+        """Subquery summing a project's counters, for annotating Project querysets"""
+        counters = cls.objects.filter(project=OuterRef('pk'))
+        if statuses:
+            counters = counters.filter(status__in=statuses)
+        if exclude:
+            counters = counters.exclude(status__in=exclude)
+        total = counters.order_by().values('project').annotate(total=Sum('count')).values('total')
+        return Coalesce(Subquery(total), 0)
+    
+    @classmethod
+    def rebuild(cls, projects=None):
+        """Recount the counters from the issues table, for every project or the given ones"""
+        issues = Issue.objects.order_by()
+        counters = cls.objects.all()
+        if projects is not None:
+            issues = issues.filter(project__in=projects)
+            counters = counters.filter(project__in=projects)
+        rows = issues.values('project_id', 'milestone_id', 'current_status').annotate(total=Count('id'))
+        with transaction.atomic():
+            counters.delete()
+            cls.objects.bulk_create([
+                cls(
+                    project_id=row['project_id'],
+                    milestone_id=row['milestone_id'],
+                    status=row['current_status'],
+                    count=row['total'],
+                )
+                for row in rows
+            ])
+        return len(rows)
+    
+    class Meta:
+        unique_together = ['project', 'milestone', 'status']
 
 class Comment(models.Model):
     """Comment model for issues"""
@@ -300,6 +410,10 @@ class Comment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['issue', 'created_at']),
+            models.Index(fields=['author', 'created_at']),
+        ]
 
 class IssueComment(models.Model):
     """Simple comment model for issues from milestone view"""
@@ -330,3 +444,48 @@ class IssueModification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['milestone', 'created_at']),
+            models.Index(fields=['modified_by', 'created_at']),
+        ]
+
+class ExportJob(models.Model):
+    """Background Excel export of a project, cached by the project's content version"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='export_jobs')
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, related_name='export_jobs')
+    content_version = models.CharField(max_length=64, help_text="Version of the project content this export was built from")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    size = models.PositiveBigIntegerField(null=True, blank=True, help_text="Size of the finished workbook in bytes")
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Export of {self.project.name} ({self.get_status_display()})"
+    
+    class Meta:
+        ordering = ['-created_at']
+
+class ExportChunk(models.Model):
+    """
+    Piece of a finished export workbook.
+
+    Kept in the database rather than on disk, since the worker dyno that builds
+    the workbook and the web dyno that serves it do not share a filesystem, and
+    split into chunks so neither has to hold a whole workbook in memory.
+    """
+    job = models.ForeignKey(ExportJob, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    data = models.BinaryField()
+    
+    class Meta:
+        ordering = ['job', 'index']
+        unique_together = ['job', 'index']
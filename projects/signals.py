@@ -1,10 +1,14 @@
-from django.db.models.signals import post_save, pre_save, post_delete
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.text import slugify
+from clients.models import Client
+from users.models import CustomUser
+from .caching import bump_project_version
 from .models import (
     Project, Standard, Violation, ProjectViolation, ProjectStandard, 
-    Page, Milestone, Issue, Comment, IssueModification, ProjectType
+    Page, Milestone, Issue, Comment, IssueModification, ProjectType, IssueStatusCounter
 )
 
 @receiver(pre_save, sender=ProjectViolation)
@@ -13,47 +17,126 @@ def update_violation_timestamps(sender, instance, **kwargs):
     if instance.pk:  # Only for existing instances
         instance.updated_at = timezone.now()
 
+def _counter_key(issue, loaded=False):
+    if loaded:
+        return (issue.loaded_value('project'), issue.loaded_value('milestone'), issue.loaded_value('current_status'))
+    return (issue.project_id, issue.milestone_id, issue.current_status)
+
 @receiver(post_save, sender=Issue)
-def handle_issue_save(sender, instance, created, **kwargs):
-    """Handle post-save operations for issues"""
+def update_issue_status_counters(sender, instance, created, raw=False, **kwargs):
+    """Move the issue between status counters when it is created or its status, project or milestone changes"""
+    if raw:
+        return
     if created:
-        # Create initial IssueModification for new issues
-        IssueModification.objects.create(
-            issue=instance,
-            milestone=instance.milestone,
-            modified_by=instance.created_by,
-            modification_type='creation',
-            new_value=instance.current_status
-        )
-    else:
-        # Get the latest modification to avoid duplicate entries
-        latest_mod = instance.modifications.first()
-        if not latest_mod or latest_mod.new_value != instance.current_status:
-            # Create modification only if status has changed
-            IssueModification.objects.create(
-                issue=instance,
-                milestone=instance.milestone,
-                modified_by=instance.created_by,
-                modification_type='status_change',
-                previous_value=latest_mod.new_value if latest_mod else None,
-                new_value=instance.current_status
-            )
-
-@receiver(post_save, sender=Comment)
-def handle_comment_save(sender, instance, created, **kwargs):
-    """Handle post-save operations for comments"""
-    if created and instance.issue:
-        # Create IssueModification for new comments
-        IssueModification.objects.create(
-            issue=instance.issue,
-            milestone=instance.issue.milestone,
-            modified_by=instance.created_by,
-            modification_type='comment',
-            comment=instance
-        )
+        IssueStatusCounter.adjust(*_counter_key(instance), 1)
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'project', 'milestone', 'current_status'} & set(update_fields):
+        return
+    if not instance.has_changed('project', 'milestone', 'current_status'):
+        return
+    with transaction.atomic():
+        IssueStatusCounter.adjust(*_counter_key(instance, loaded=True), -1)
+        IssueStatusCounter.adjust(*_counter_key(instance), 1)
+
+@receiver(post_delete, sender=Issue)
+def decrement_issue_status_counter(sender, instance, **kwargs):
+    """Remove a deleted issue from its status counter"""
+    # The row is gone, so only an in-memory snapshot can tell what was stored
+    loaded = getattr(instance, '_loaded_values', {})
+    key = tuple(loaded.get(name, value) for name, value in zip(instance.tracked_fields, _counter_key(instance)))
+    IssueStatusCounter.adjust(*key, -1)
 
 @receiver(pre_save, sender=ProjectType)
 def handle_project_type_slug(sender, instance, **kwargs):
     """Generate slug for project types if not provided"""
     if not instance.slug:
-        instance.slug = slugify(instance.name)
\ No newline at end of file
+        instance.slug = slugify(instance.name)
+
+def _invalidate_projects(project_ids):
+    """Move the projects to new cache versions now and again once the transaction commits"""
+    project_ids = {project_id for project_id in project_ids if project_id}
+    for project_id in project_ids:
+        bump_project_version(project_id)
+    # A request reading between the save and the commit could cache the old rows
+    # under the new version, so the version moves once more when they are visible
+    if project_ids:
+        transaction.on_commit(lambda: [bump_project_version(project_id) for project_id in project_ids])
+
+def _issue_project_id(instance):
+    """Project of a row that belongs to an issue, without loading the issue when it is already cached"""
+    if type(instance).issue.is_cached(instance):
+        return instance.issue.project_id
+    return Issue.objects.filter(pk=instance.issue_id).values_list('project_id', flat=True).first()
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_project_cache(sender, instance, **kwargs):
+    """Invalidate the cached fragments and aggregates of a saved or deleted project"""
+    _invalidate_projects([instance.pk])
+
+@receiver([post_save, post_delete], sender=Page)
+@receiver([post_save, post_delete], sender=Milestone)
+@receiver([post_save, post_delete], sender=Issue)
+@receiver([post_save, post_delete], sender=ProjectViolation)
+@receiver([post_save, post_delete], sender=ProjectStandard)
+def invalidate_project_cache_for_row(sender, instance, **kwargs):
+    """Invalidate the project a page, milestone, issue or project standard or violation belongs to"""
+    _invalidate_projects([instance.project_id])
+
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=IssueModification)
+def invalidate_project_cache_for_issue_row(sender, instance, **kwargs):
+    """Invalidate the project of the issue a comment or modification belongs to"""
+    if isinstance(kwargs.get('origin'), (Issue, Project)):
+        # Deleted along with its issue or project, whose own signal covers it
+        return
+    _invalidate_projects([_issue_project_id(instance)])
+
+@receiver(m2m_changed, sender=Project.assigned_to.through)
+def invalidate_project_cache_for_team(sender, instance, action, reverse, pk_set, **kwargs):
+    """Invalidate projects whose team changed, from either side of the relation"""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        _invalidate_projects([instance.pk])
+    elif pk_set:
+        _invalidate_projects(pk_set)
+    else:
+        # post_clear from the user side does not say which projects lost the user
+        _invalidate_projects(instance.assigned_projects.values_list('pk', flat=True))
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_project_cache_for_user(sender, instance, created, raw=False, **kwargs):
+    """Invalidate the projects of a team member whose name or email changed"""
+    if created or raw:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'email', 'first_name', 'last_name'} & set(update_fields):
+        return
+    if not instance.has_changed('email', 'first_name', 'last_name'):
+        return
+    # Looked up once the save commits, so a plain save stays a single UPDATE. The
+    # bump only has to follow the commit, which is when the new name is visible.
+    user_id = instance.pk
+    transaction.on_commit(lambda: [
+        bump_project_version(project_id)
+        for project_id in Project.assigned_to.through.objects.filter(
+            customuser_id=user_id
+        ).values_list('project_id', flat=True)
+    ])
+
+@receiver([post_save, post_delete], sender=Client)
+@receiver([post_save, post_delete], sender=ProjectType)
+@receiver([post_save, post_delete], sender=Standard)
+@receiver([post_save, post_delete], sender=Violation)
+def invalidate_project_cache_for_shared_row(sender, instance, **kwargs):
+    """Invalidate every project showing a client, project type, standard or violation"""
+    if sender is Client:
+        projects = Project.objects.filter(client_id=instance.pk)
+    elif sender is ProjectType:
+        projects = Project.objects.filter(project_type_id=instance.pk)
+    elif sender is Standard:
+        projects = Project.objects.filter(project_standards__standard_id=instance.pk)
+    else:
+        projects = Project.objects.filter(project_violations__violation_id=instance.pk)
+    _invalidate_projects(projects.values_list('pk', flat=True))
@@ -1,5 +1,10 @@
 from django import template
+from django.conf import settings
+from django.core.cache import cache
 from django.template.defaultfilters import stringfilter
+from django.utils.safestring import mark_safe
+from projects.access import ProjectAccess
+from projects.caching import project_cache_key
 
 register = template.Library()
 
@@ -20,9 +25,49 @@ def split(value, delimiter):
 @register.filter
 def can_see_internal_comments(user):
     """Check if a user can see internal comments."""
-    return user.is_superuser or (hasattr(user, 'role') and user.role and user.role.name == 'admin')
+    return ProjectAccess.for_user(user).is_admin
 
 @register.filter
 def can_mark_ready_for_testing(user):
     """Check if a user can mark issues as ready for testing."""
-    return user.is_superuser or (user.is_authenticated and hasattr(user, 'role') and user.role and user.role.name == 'admin') 
\ No newline at end of file
+    return user.is_authenticated and ProjectAccess.for_user(user).is_admin
+
+# Stands in for the CSRF token while a fragment is rendered for the cache
+CSRF_PLACEHOLDER = 'PROJECTCACHE-CSRF-TOKEN'
+
+class ProjectCacheNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        project = context['project']
+        visibility = ProjectAccess.for_user(context['user']).visibility
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = project_cache_key(project.pk, 'fragment', self.name.resolve(context), visibility, *vary_on)
+        content = cache.get(key)
+        if content is None:
+            with context.push(csrf_token=CSRF_PLACEHOLDER):
+                content = self.nodelist.render(context)
+            cache.set(key, content, settings.PROJECT_CACHE_TIMEOUT)
+        # Forms in the fragment get the current viewer's token, not the one it was rendered with
+        return mark_safe(content.replace(CSRF_PLACEHOLDER, str(context.get('csrf_token', ''))))
+
+@register.tag
+def projectcache(parser, token):
+    """
+    Cache a fragment of a project page until the project changes.
+
+        {% projectcache 'team' [vary_on ...] %} ... {% endprojectcache %}
+
+    The key combines the project's cache version, the fragment name, the
+    viewer's visibility class (admin, staff or client) and any extra values,
+    so fragments may use role checks but nothing else about the viewer.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name.")
+    nodelist = parser.parse(('endprojectcache',))
+    parser.delete_first_token()
+    return ProjectCacheNode(nodelist, parser.compile_filter(bits[1]), [parser.compile_filter(bit) for bit in bits[2:]])
@@ -1,3 +1,994 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import re
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponseServerError
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from benchmarks.runner import compare, run_suite
+from perspectivetracker.middleware import NotificationCollectorMiddleware
+from perspectivetracker.query_budgets import QueryBudgetMixin, budget
+from perspectivetracker.utils import collect_notifications, send_email
+from clients.models import Client
+from users.models import CustomUser, OutboundEmail, Role
+from .access import ProjectAccess
+from .caching import cached_for_project, project_cache_key
+from .exports import EXPORT_CLAIM_TIMEOUT, claim_next_export_job, write_project_workbook
+from .hot_queries import sequential_scans
+from .models import ProjectType, Project, Page, Milestone, Issue, Comment, ExportJob, ExportChunk, IssueStatusCounter
+from .templatetags.project_tags import CSRF_PLACEHOLDER
+
+
+class ProjectTestCase(TestCase):
+    """Shared fixture: one project with an admin, a client user, a page and a milestone"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            email='admin@example.com',
+            password='password',
+            first_name='Ada',
+            last_name='Admin',
+            role=Role.objects.get(name=Role.ADMIN),
+        )
+        cls.client_user = CustomUser.objects.create_user(
+            email='client@example.com',
+            password='password',
+            first_name='Cleo',
+            last_name='Client',
+            role=Role.objects.get(name=Role.CLIENT),
+        )
+        client = Client.objects.create(
+            company_name='Acme',
+            contact_name='Cleo Client',
+            email='client@example.com',
+        )
+        project_type = ProjectType.objects.create(name='Accessibility', supports_standards=True)
+        cls.project = Project.objects.create(
+            name='Audit',
+            client=client,
+            project_type=project_type,
+            created_by=cls.admin,
+        )
+        cls.project.assigned_to.add(cls.admin, cls.client_user)
+        cls.page = Page.objects.create(project=cls.project, name='Home', created_by=cls.admin)
+        cls.milestone = Milestone.objects.create(
+            project=cls.project,
+            name='Round 1',
+            assigned_to=cls.admin,
+            created_by=cls.admin,
+        )
+
+    def add_issues(self, count, comments_per_issue=3):
+        for i in range(count):
+            issue = Issue.objects.create(
+                project=self.project,
+                milestone=self.milestone,
+                page=self.page,
+                issue_description=f'Issue {i}',
+                steps_to_reproduce='Steps',
+                tool_or_method='nvda',
+                user_impact='high',
+                user_impact_description='Blocks screen reader users',
+                created_by=self.admin,
+                assigned_to=self.client_user,
+            )
+            for j in range(comments_per_issue):
+                Comment.objects.create(issue=issue, author=self.admin, text=f'Comment {j}')
+
+
+class ProjectDetailQueryTests(ProjectTestCase):
+    """project_detail and its sections run a fixed number of queries however many issues they show"""
+
+    def fetch(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_does_not_grow_with_issues(self):
+        self.client.force_login(self.admin)
+        urls = [
+            reverse('projects:project_detail', kwargs={'pk': self.project.pk}),
+            reverse('projects:project_section', kwargs={'pk': self.project.pk, 'section': 'issues'}),
+        ]
+
+        self.add_issues(2)
+        small = [self.fetch(url)[0] for url in urls]
+
+        self.add_issues(20, comments_per_issue=5)
+        large = [self.fetch(url)[0] for url in urls]
+
+        self.assertEqual(small, large)
+        issue = Issue.objects.latest('pk')
+        _, response = self.fetch(reverse('projects:issue_preview', kwargs={'project_id': self.project.pk, 'pk': issue.pk}))
+        self.assertContains(response, 'Comments (<span class="preview-comment-count">5</span>)')
+
+    def test_page_leaves_issues_and_comments_to_its_sections(self):
+        self.client.force_login(self.admin)
+        self.add_issues(2)
+        _, small = self.fetch(reverse('projects:project_detail', kwargs={'pk': self.project.pk}))
+
+        self.add_issues(20, comments_per_issue=5)
+        _, large = self.fetch(reverse('projects:project_detail', kwargs={'pk': self.project.pk}))
+
+        self.assertEqual(len(small.content), len(large.content))
+        self.assertNotContains(large, 'Issue 1')
+        self.assertContains(large, reverse('projects:project_section', kwargs={'pk': self.project.pk, 'section': 'issues'}))
+
+    def test_issues_section_serves_the_first_page_of_the_issue_table(self):
+        from .views import ISSUE_PAGE_SIZE
+        self.client.force_login(self.admin)
+        self.add_issues(ISSUE_PAGE_SIZE + 1, comments_per_issue=0)
+        _, response = self.fetch(reverse('projects:project_section', kwargs={'pk': self.project.pk, 'section': 'issues'}))
+
+        content = response.content.decode()
+        self.assertEqual(len(set(re.findall(r'issue-row-(\d+)"', content))), ISSUE_PAGE_SIZE)
+        self.assertIn('load-more-issues', content)
+        self.assertIn('issue-filter-form', content)
+        self.assertIn(reverse('projects:project_issues', kwargs={'pk': self.project.pk}), content)
+        # Comments open the on-demand preview instead of modals the table does not contain
+        self.assertNotIn('data-bs-target="#commentsModal', content)
+
+    def test_unknown_sections_are_not_found(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('projects:project_section', kwargs={'pk': self.project.pk, 'section': 'export'}))
+        self.assertEqual(response.status_code, 404)
+
+
+class ProjectAccessTests(ProjectTestCase):
+    """Membership is tested with one exists() query and memoized for the request"""
+
+    def setUp(self):
+        Role.clear_cache()
+        Role.cached(Role.ADMIN)
+        self.outsider = CustomUser.objects.create_user(
+            email='outsider@example.com',
+            role=Role.objects.get(name=Role.CLIENT),
+        )
+        self.other_project = Project.objects.create(
+            name='Redesign',
+            client=self.project.client,
+            project_type=self.project.project_type,
+            created_by=self.admin,
+        )
+
+    def test_membership_is_checked_once_without_loading_users(self):
+        access = ProjectAccess(CustomUser.objects.get(pk=self.client_user.pk))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(access.can_view(self.project))
+            self.assertTrue(access.can_edit(self.project))
+            self.assertFalse(access.can_view(self.other_project))
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertTrue(all('LIMIT 1' in query['sql'] for query in ctx.captured_queries))
+        self.assertFalse(any('FROM "users_customuser"' in query['sql'] for query in ctx.captured_queries))
+
+    def test_prefetch_resolves_many_projects_in_one_query(self):
+        access = ProjectAccess(CustomUser.objects.get(pk=self.client_user.pk))
+        with self.assertNumQueries(1):
+            access.prefetch([self.project, self.other_project])
+            self.assertTrue(access.can_view(self.project))
+            self.assertFalse(access.can_view(self.other_project))
+
+    def test_admins_need_no_membership_query(self):
+        access = ProjectAccess(CustomUser.objects.get(pk=self.admin.pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(access.can_view(self.other_project))
+
+    def test_views_forbid_users_outside_the_project(self):
+        self.client.force_login(self.outsider)
+        response = self.client.get(reverse('projects:project_detail', kwargs={'pk': self.project.pk}))
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(self.client_user)
+        response = self.client.get(reverse('projects:project_detail', kwargs={'pk': self.project.pk}))
+        self.assertEqual(response.status_code, 200)
+
+
+class ProjectListQueryTests(ProjectTestCase):
+    """project_list runs a fixed number of queries and shows the annotated summary"""
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('projects:project_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def add_project(self, name):
+        project = Project.objects.create(
+            name=name,
+            client=self.project.client,
+            project_type=self.project.project_type,
+            created_by=self.admin,
+        )
+        project.assigned_to.add(self.client_user)
+        return project
+
+    def test_query_count_does_not_grow_with_projects(self):
+        self.client.force_login(self.client_user)
+        # Warm the per-user caches so both counts start from the same state
+        self.count_list_queries()
+        small, _ = self.count_list_queries()
+
+        for i in range(5):
+            self.add_project(f'Project {i}')
+        large, response = self.count_list_queries()
+
+        self.assertEqual(small, large)
+        self.assertContains(response, 'Project 4')
+
+    def test_summary_counts_issues_and_next_milestone(self):
+        self.add_issues(3, comments_per_issue=0)
+        for issue, status in zip(Issue.objects.all()[:2], ['pass', 'ready_for_testing']):
+            issue.current_status = status
+            issue.save()
+        Milestone.objects.filter(pk=self.milestone.pk).update(due_date='2030-01-31')
+        Milestone.objects.create(
+            project=self.project, name='Done', status='completed', due_date='2020-01-01', created_by=self.admin
+        )
+
+        project = Project.objects.visible_to(self.client_user).with_summary().get(pk=self.project.pk)
+        self.assertEqual(project.issue_count, 3)
+        self.assertEqual(project.open_issue_count, 2)
+        self.assertEqual(project.fail_issue_count, 1)
+        self.assertEqual(project.ready_for_testing_count, 1)
+        self.assertEqual(str(project.next_milestone_due), '2030-01-31')
+
+    def test_visible_to_limits_users_to_their_projects(self):
+        other = Project.objects.create(
+            name='Hidden', client=self.project.client, project_type=self.project.project_type
+        )
+        self.assertNotIn(other, Project.objects.visible_to(self.client_user))
+        self.assertIn(other, Project.objects.visible_to(self.admin))
+
+
+class IssueStatusCounterTests(ProjectTestCase):
+    """Issue saves and deletes keep the status counters in step with the issues table"""
+
+    def counted(self, **filters):
+        return IssueStatusCounter.summary(**filters)
+
+    def recounted(self, **filters):
+        counts = {}
+        for issue in Issue.objects.filter(**filters):
+            counts[issue.current_status] = counts.get(issue.current_status, 0) + 1
+        return counts
+
+    def test_counters_follow_creates_status_changes_moves_and_deletes(self):
+        self.add_issues(4, comments_per_issue=0)
+        self.assertEqual(self.counted(project=self.project), {'fail': 4})
+
+        issue, moved, deleted = Issue.objects.all()[:3]
+        issue.current_status = 'ready_for_testing'
+        issue.save()
+
+        other = Milestone.objects.create(project=self.project, name='Round 2', created_by=self.admin)
+        moved.milestone = other
+        moved.current_status = 'pass'
+        moved.save()
+
+        deleted.delete()
+
+        self.assertEqual(self.counted(project=self.project), self.recounted(project=self.project))
+        self.assertEqual(self.counted(milestone=other), {'pass': 1})
+        self.assertEqual(self.counted(milestone=self.milestone), {'fail': 1, 'ready_for_testing': 1})
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('projects:milestone_detail', kwargs={'pk': self.milestone.pk}))
+        self.assertContains(response, 'Ready For Testing: 1')
+
+    def test_unrelated_saves_do_not_touch_the_counters(self):
+        self.add_issues(1, comments_per_issue=0)
+        issue = Issue.objects.get()
+        issue.workarounds = 'Use the keyboard'
+        with CaptureQueriesContext(connection) as ctx:
+            issue.save()
+        self.assertFalse(any('projects_issuestatuscounter' in query['sql'] for query in ctx.captured_queries))
+
+    def test_rebuild_counters_repairs_drift(self):
+        self.add_issues(3, comments_per_issue=0)
+        Issue.objects.update(current_status='qa')
+        self.assertEqual(self.counted(project=self.project), {'fail': 3})
+
+        call_command('rebuild_counters', stdout=io.StringIO())
+        self.assertEqual(self.counted(project=self.project), {'qa': 3})
+
+
+class ProjectCacheVersionTests(ProjectTestCase):
+    """Project cache keys move to a new version whenever the project or its rows change"""
+
+    def setUp(self):
+        cache.clear()
+        self.other = Project.objects.create(
+            name='Other', client=self.project.client, project_type=self.project.project_type
+        )
+
+    def test_keys_are_stable_until_something_changes(self):
+        key = project_cache_key(self.project.pk, 'detail', 'staff')
+        self.assertRegex(key, rf'^project:{self.project.pk}:v\d+:detail:staff$')
+        self.assertEqual(project_cache_key(self.project.pk, 'detail', 'staff'), key)
+
+        self.add_issues(1, comments_per_issue=0)
+        self.assertNotEqual(project_cache_key(self.project.pk, 'detail', 'staff'), key)
+
+    def test_changes_only_invalidate_their_own_project(self):
+        self.add_issues(1, comments_per_issue=0)
+        issue = Issue.objects.get()
+        other_key = project_cache_key(self.other.pk, 'detail')
+
+        for change in [
+            lambda: Comment.objects.create(issue=issue, author=self.admin, text='Looks fixed'),
+            lambda: self.project.assigned_to.remove(self.client_user),
+            lambda: self.client_user.assigned_projects.add(self.project),
+            lambda: Page.objects.create(project=self.project, name='Contact', created_by=self.admin),
+            lambda: issue.delete(),
+        ]:
+            key = project_cache_key(self.project.pk, 'detail')
+            change()
+            self.assertNotEqual(project_cache_key(self.project.pk, 'detail'), key)
+        self.assertEqual(project_cache_key(self.other.pk, 'detail'), other_key)
+
+    def test_shared_rows_invalidate_every_project_showing_them(self):
+        keys = [project_cache_key(project.pk, 'detail') for project in (self.project, self.other)]
+        self.project.client.company_name = 'Acme Corp'
+        self.project.client.save()
+        for project, key in zip((self.project, self.other), keys):
+            self.assertNotEqual(project_cache_key(project.pk, 'detail'), key)
+
+    def test_renamed_team_members_invalidate_their_projects(self):
+        key = project_cache_key(self.project.pk, 'detail')
+        other_key = project_cache_key(self.other.pk, 'detail')
+        user = CustomUser.objects.get(pk=self.client_user.pk)
+        user.save(update_fields=['last_login'])
+        self.assertEqual(project_cache_key(self.project.pk, 'detail'), key)
+
+        user.last_name = 'Customer'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertNotEqual(project_cache_key(self.project.pk, 'detail'), key)
+        self.assertEqual(project_cache_key(self.other.pk, 'detail'), other_key)
+
+    def test_cached_values_are_recomputed_after_a_change(self):
+        def count():
+            return Issue.objects.filter(project=self.project).count()
+
+        self.assertEqual(cached_for_project(self.project.pk, 'issues', count), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_for_project(self.project.pk, 'issues', count), 0)
+
+        self.add_issues(2, comments_per_issue=0)
+        self.assertEqual(cached_for_project(self.project.pk, 'issues', count), 2)
+
+    def test_version_moves_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.milestone.save()
+            key = project_cache_key(self.project.pk, 'detail')
+        self.assertNotEqual(project_cache_key(self.project.pk, 'detail'), key)
+
+    def test_lost_versions_never_reuse_old_keys(self):
+        key = project_cache_key(self.project.pk, 'detail')
+        cache.delete(f'project:{self.project.pk}:version')
+        self.assertNotEqual(project_cache_key(self.project.pk, 'detail'), key)
+
+
+class ProjectFragmentCacheTests(ProjectTestCase):
+    """Project sections, issue previews and milestone pages reuse their cached fragments until the project changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.add_issues(3)
+        self.issue = Issue.objects.first()
+        self.milestone.status = 'published'
+        self.milestone.save()
+        self.urls = {
+            'issues section': reverse('projects:project_section', kwargs={'pk': self.project.pk, 'section': 'issues'}),
+            'issue preview': reverse('projects:issue_preview', kwargs={'project_id': self.project.pk, 'pk': self.issue.pk}),
+            'milestone_detail': reverse('projects:milestone_detail', kwargs={'pk': self.milestone.pk}),
+        }
+
+    def get(self, url, user=None):
+        self.client.force_login(user or self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        tables = [Issue._meta.db_table, Comment._meta.db_table]
+        issue_queries = [q['sql'] for q in ctx.captured_queries if any(f'"{t}"' in q['sql'] for t in tables)]
+        return response.content.decode(), issue_queries
+
+    def test_repeat_requests_skip_issue_and_comment_queries(self):
+        for name in ('issues section', 'milestone_detail'):
+            with self.subTest(name):
+                first, issue_queries = self.get(self.urls[name])
+                self.assertTrue(issue_queries)
+                second, issue_queries = self.get(self.urls[name])
+                self.assertEqual(issue_queries, [])
+                self.assertIn('Issue 2', second)
+
+    def test_changes_show_up_on_the_next_request(self):
+        for name in ('issue preview', 'milestone_detail'):
+            with self.subTest(name):
+                self.get(self.urls[name])
+                Comment.objects.create(issue=self.issue, author=self.admin, text=f'Retested for {name}')
+                content, _ = self.get(self.urls[name])
+                self.assertIn(f'Retested for {name}', content)
+
+    def test_clients_never_get_sections_rendered_for_staff(self):
+        Comment.objects.create(issue=self.issue, author=self.admin, text='Internal triage', comment_type='internal')
+        for name in ('issue preview', 'milestone_detail'):
+            with self.subTest(name):
+                content, _ = self.get(self.urls[name])
+                self.assertIn('Internal triage', content)
+                content, _ = self.get(self.urls[name], user=self.client_user)
+                self.assertNotIn('Internal triage', content)
+
+    def test_csrf_tokens_are_filled_in_per_response(self):
+        for name in ('issue preview', 'milestone_detail'):
+            with self.subTest(name):
+                for _ in range(2):
+                    content, _ = self.get(self.urls[name])
+                    self.assertNotIn(CSRF_PLACEHOLDER, content)
+                    self.assertIn('name="csrfmiddlewaretoken"', content)
+
+
+class ConditionalGetTests(ProjectTestCase):
+    """Reloads of unchanged project, milestone and issue pages and previews get 304 Not Modified"""
+
+    def setUp(self):
+        cache.clear()
+        self.add_issues(1)
+        self.issue = Issue.objects.get()
+        self.urls = [
+            reverse('projects:project_detail', kwargs={'pk': self.project.pk}),
+            reverse('projects:milestone_detail', kwargs={'pk': self.milestone.pk}),
+            reverse('projects:issue_detail', kwargs={'project_id': self.project.pk, 'pk': self.issue.pk}),
+            reverse('projects:issue_preview', kwargs={'project_id': self.project.pk, 'pk': self.issue.pk}),
+        ]
+
+    def get(self, url, user=None, etag=None):
+        self.client.force_login(user or self.admin)
+        headers = {'If-None-Match': etag} if etag else None
+        return self.client.get(url, headers=headers)
+
+    def test_unchanged_pages_are_not_rendered_again(self):
+        # The first page sets the CSRF cookie, which is part of every later tag
+        self.get(self.urls[0])
+        for url in self.urls:
+            with self.subTest(url):
+                response = self.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('no-cache', response['Cache-Control'])
+                with self.assertTemplateNotUsed('base.html'), CaptureQueriesContext(connection) as ctx:
+                    response = self.get(url, etag=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(any(f'"{Issue._meta.db_table}"' in q['sql'] for q in ctx.captured_queries))
+
+    def test_changes_to_the_project_make_a_new_etag(self):
+        etags = [self.get(url)['ETag'] for url in self.urls]
+        Comment.objects.create(issue=self.issue, author=self.admin, text='Retested')
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url):
+                response = self.get(url, etag=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_etags_belong_to_one_viewer(self):
+        self.milestone.status = 'published'
+        self.milestone.save()
+        for url in self.urls:
+            with self.subTest(url):
+                etag = self.get(url)['ETag']
+                response = self.get(url, user=self.client_user, etag=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_non_members_get_no_etag(self):
+        outsider = CustomUser.objects.create_user(
+            email='outsider@example.com', password='password', role=Role.objects.get(name=Role.USER)
+        )
+        etag = self.get(self.urls[0])['ETag']
+        urls = [*self.urls, reverse('projects:project_section', kwargs={'pk': self.project.pk, 'section': 'issues'})]
+        for url in urls:
+            with self.subTest(url):
+                for if_none_match in (etag, '*'):
+                    response = self.get(url, user=outsider, etag=if_none_match)
+                    self.assertNotEqual(response.status_code, 304)
+                    self.assertFalse(response.has_header('ETag'))
+
+    def test_pending_messages_are_always_rendered(self):
+        etag = self.get(self.urls[0], user=self.client_user)['ETag']
+        # Clients are sent back to the project with a warning from issues of unpublished milestones
+        self.get(self.urls[2], user=self.client_user)
+        response = self.get(self.urls[0], user=self.client_user, etag=etag)
+        self.assertContains(response, 'under internal review')
+
+
+class HotQueryIndexTests(ProjectTestCase):
+    """Every registered hot query is planned with an index"""
+
+    def test_hot_queries_use_indexes(self):
+        self.add_issues(3)
+        out = io.StringIO()
+        call_command('explain_hot_queries', stdout=out)
+        self.assertNotIn('sequential scan', out.getvalue())
+
+    def test_unindexed_filters_are_reported(self):
+        _, tables = sequential_scans(Issue.objects.filter(workarounds='none'), connection.vendor)
+        self.assertEqual(tables, ['projects_issue'])
+
+
+class SeedPerfDataTests(TestCase):
+    """seed_perf_data builds the same dataset for the same seed"""
+
+    def seed(self, *args):
+        call_command(
+            'seed_perf_data', '--issues', '60', '--clients', '2', '--projects-per-client', '2', '--users', '6',
+            '--pages-per-project', '3', '--violations-per-standard', '5', '--batch-size', '25', *args,
+            stdout=io.StringIO(),
+        )
+        return list(Issue.objects.order_by('pk').values_list(
+            'project__name', 'milestone__name', 'current_status', 'dynamic_fields'
+        ))
+
+    def test_same_seed_gives_same_data(self):
+        first = self.seed()
+        self.assertEqual(len(first), 60)
+        self.assertTrue(Comment.objects.exists())
+        self.assertEqual(
+            IssueStatusCounter.summary(),
+            {status: sum(1 for row in first if row[2] == status) for status in {row[2] for row in first}},
+        )
+
+        self.assertEqual(self.seed('--flush'), first)
+        self.assertNotEqual(self.seed('--flush', '--seed', '7'), first)
+
+
+class BenchmarkSuiteTests(TestCase):
+    """The benchmark runner measures scenarios on a seeded dataset and flags regressions"""
+
+    def test_report_has_every_metric(self):
+        report = run_suite([40], names=['issue_detail', 'issue_detail_comment_ajax'], iterations=2)
+        result = report['datasets']['40']['issue_detail']
+        self.assertEqual(result['status'], 200)
+        self.assertGreater(result['queries'], 0)
+        self.assertGreater(result['bytes'], 0)
+        self.assertGreater(result['peak_memory_kb'], 0)
+        self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+        # The AJAX comment is rolled back after each request
+        self.assertFalse(Comment.objects.filter(text='Benchmark comment').exists())
+
+    def test_compare_tolerates_noise_but_not_extra_queries(self):
+        baseline = {'datasets': {'40': {'issue_detail': {
+            'p50_ms': 10, 'p95_ms': 12, 'queries': 8, 'bytes': 1000, 'peak_memory_kb': 500,
+        }}}}
+        report = {'datasets': {'40': {'issue_detail': {
+            'p50_ms': 11, 'p95_ms': 13, 'queries': 9, 'bytes': 1000, 'peak_memory_kb': 500,
+        }}}}
+        self.assertEqual(compare(report, baseline), ['issue_detail @ 40: queries 8 -> 9'])
+
+
+class ProjectIssuesPaginationTests(ProjectTestCase):
+    """The issue table fragment pages with a keyset cursor and filters server-side"""
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = reverse('projects:project_issues', kwargs={'pk': self.project.pk})
+
+    def fetch_all(self, **params):
+        seen = []
+        cursor = ''
+        while True:
+            response = self.client.get(self.url, {**params, 'cursor': cursor, 'page_size': 3})
+            self.assertEqual(response.status_code, 200)
+            seen.extend(int(pk) for pk in re.findall(r'issue-row-(\d+)"', response.content.decode()))
+            cursor = response['X-Next-Cursor']
+            if not cursor:
+                return seen
+
+    def test_cursor_walks_every_issue_once_in_order(self):
+        self.add_issues(8, comments_per_issue=0)
+        expected = list(Issue.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        self.assertEqual(self.fetch_all(), expected)
+        self.assertEqual(self.fetch_all(sort='oldest'), expected[::-1])
+
+    def test_filters_are_applied(self):
+        self.add_issues(4, comments_per_issue=0)
+        Issue.objects.filter(pk__in=Issue.objects.values('pk')[:1]).update(current_status='pass')
+
+        passed = list(Issue.objects.filter(current_status='pass').values_list('id', flat=True))
+        self.assertEqual(self.fetch_all(current_status='pass'), passed)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class IssueCommentPaginationTests(ProjectTestCase):
+    """Comment threads are paged by cursor and a new comment is sent back on its own"""
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.add_issues(1, comments_per_issue=0)
+        self.issue = Issue.objects.get()
+        self.kwargs = {'project_id': self.project.pk, 'pk': self.issue.pk}
+
+    def add_comments(self, count, **fields):
+        Comment.objects.bulk_create(
+            Comment(issue=self.issue, author=self.admin, text=f'Comment {i}', **fields) for i in range(count)
+        )
+
+    def post_comment(self, text):
+        return self.client.post(
+            reverse('projects:issue_detail', kwargs=self.kwargs),
+            {'text': text, 'comment_type': 'external'},
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+
+    def fetch_all(self):
+        seen = []
+        url = reverse('projects:issue_comments', kwargs=self.kwargs)
+        cursor = ''
+        while True:
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            seen.extend(int(pk) for pk in re.findall(r'id="comment-(\d+)"', response.content.decode()))
+            cursor = response['X-Next-Cursor']
+            if not cursor:
+                return seen
+
+    def test_ajax_post_returns_only_the_new_comment(self):
+        self.add_comments(3)
+        response = self.post_comment('Fixed on staging')
+        data = response.json()
+
+        comment = Comment.objects.get(text='Fixed on staging')
+        self.assertEqual(data['comment_id'], comment.pk)
+        self.assertEqual(data['comment_count_delta'], 1)
+        self.assertNotIn('comments_html', data)
+        self.assertEqual(re.findall(r'id="comment-(\d+)"', data['comment_html']), [str(comment.pk)])
+
+    def test_ajax_post_cost_does_not_grow_with_the_thread(self):
+        counts = []
+        for total in (5, 500):
+            self.add_comments(total - Comment.objects.count())
+            with CaptureQueriesContext(connection) as ctx:
+                self.post_comment(f'Comment on {total}')
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_edit_returns_only_the_edited_comment(self):
+        self.add_comments(3)
+        comment = Comment.objects.order_by('id').first()
+        url = reverse('projects:edit_issue_comment', kwargs={
+            'project_id': self.project.pk, 'issue_id': self.issue.pk, 'comment_id': comment.pk,
+        })
+        data = self.client.post(url, {'text': 'Retested', 'comment_type': 'external'}).json()
+
+        self.assertTrue(data['success'], data)
+        self.assertNotIn('comments_html', data)
+        self.assertEqual(re.findall(r'id="comment-(\d+)"', data['comment_html']), [str(comment.pk)])
+        self.assertIn('Retested', data['comment_html'])
+
+    def test_cursor_walks_every_comment_once_newest_first(self):
+        from .views import COMMENT_PAGE_SIZE
+        self.add_comments(COMMENT_PAGE_SIZE * 2 + 3)
+        expected = list(Comment.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        self.assertEqual(self.fetch_all(), expected)
+
+    def test_issue_detail_shows_the_newest_page_and_the_full_count(self):
+        from .views import COMMENT_PAGE_SIZE
+        self.add_comments(COMMENT_PAGE_SIZE + 1)
+        response = self.client.get(reverse('projects:issue_detail', kwargs=self.kwargs))
+
+        self.assertEqual(len(response.context['comments']), COMMENT_PAGE_SIZE)
+        self.assertContains(response, f'<span id="commentCount">{COMMENT_PAGE_SIZE + 1}</span>')
+        self.assertContains(response, 'load-older-comments')
+
+    def test_clients_never_page_into_internal_comments(self):
+        Milestone.objects.filter(pk=self.milestone.pk).update(status='published')
+        self.add_comments(2, comment_type='internal')
+        self.add_comments(2, comment_type='external')
+        self.client.force_login(self.client_user)
+
+        external = list(
+            Comment.objects.filter(comment_type='external').order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(self.fetch_all(), external)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('projects:issue_comments', kwargs=self.kwargs), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ProjectExportTests(ProjectTestCase):
+    """Exports are built by the worker and reused while the project is unchanged"""
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = reverse('projects:export_project', kwargs={'pk': self.project.pk})
+
+    def test_export_job_builds_a_workbook_with_every_sheet(self):
+        self.add_issues(2)
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job['status'], 'pending')
+
+        call_command('process_export_jobs', '--once', stdout=io.StringIO())
+
+        job = self.client.get(job['status_url']).json()
+        self.assertEqual(job['status'], 'completed')
+        # Stored in the database, so a web dyno can serve what the worker dyno built
+        self.assertTrue(ExportChunk.objects.filter(job_id=job['job_id']).exists())
+        response = self.client.get(job['download_url'])
+        content = b''.join(response.streaming_content)
+        self.assertEqual(int(response['Content-Length']), len(content))
+        with zipfile.ZipFile(io.BytesIO(content)) as workbook:
+            sheets = workbook.read('xl/workbook.xml').decode()
+        for name in ['Project Details', 'Pages', 'Issues', 'Milestones', 'Comments']:
+            self.assertIn(f'name="{name}"', sheets)
+
+    def test_large_workbooks_are_stored_and_sent_in_chunks(self):
+        self.add_issues(20)
+        job_id = self.client.post(self.url).json()['job_id']
+        with mock.patch('projects.exports.STORED_CHUNK_SIZE', 1024):
+            call_command('process_export_jobs', '--once', stdout=io.StringIO())
+
+        job = ExportJob.objects.get(pk=job_id)
+        self.assertGreater(job.chunks.count(), 1)
+        response = self.client.get(reverse('projects:export_job_download', kwargs={'pk': job_id}))
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), job.chunks.count())
+        self.assertEqual(len(b''.join(chunks)), job.size)
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as workbook:
+            self.assertIsNone(workbook.testzip())
+
+    def test_unchanged_project_reuses_the_cached_export(self):
+        self.add_issues(2)
+        first = self.client.post(self.url).json()
+        call_command('process_export_jobs', '--once', stdout=io.StringIO())
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['job_id'], first['job_id'])
+
+        Issue.objects.first().delete()
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 202)
+        self.assertNotEqual(response.json()['job_id'], first['job_id'])
+
+    def test_team_and_client_changes_invalidate_the_cached_export(self):
+        first = self.client.post(self.url).json()
+        call_command('process_export_jobs', '--once', stdout=io.StringIO())
+
+        self.project.assigned_to.remove(self.client_user)
+        second = self.client.post(self.url)
+        self.assertEqual(second.status_code, 202)
+        self.assertNotEqual(second.json()['job_id'], first['job_id'])
+        call_command('process_export_jobs', '--once', stdout=io.StringIO())
+
+        client = self.project.client
+        client.company_name = 'Acme Corporation'
+        client.save()
+        third = self.client.post(self.url)
+        self.assertEqual(third.status_code, 202)
+        self.assertNotEqual(third.json()['job_id'], second.json()['job_id'])
+
+    def test_job_of_a_dead_worker_is_claimed_again(self):
+        job_id = self.client.post(self.url).json()['job_id']
+        self.assertEqual(claim_next_export_job().pk, job_id)
+        self.assertIsNone(claim_next_export_job())
+
+        # The worker died without finishing: the job is taken over after the timeout
+        ExportJob.objects.filter(pk=job_id).update(
+            started_at=timezone.now() - datetime.timedelta(seconds=EXPORT_CLAIM_TIMEOUT + 1)
+        )
+        self.assertEqual(self.client.post(self.url).json()['job_id'], job_id)
+        call_command('process_export_jobs', '--once', stdout=io.StringIO())
+        self.assertEqual(ExportJob.objects.get(pk=job_id).status, 'completed')
+
+    def test_export_query_count_does_not_grow_with_issues(self):
+        self.add_issues(2)
+        project = Project.objects.select_related('client', 'project_type').get(pk=self.project.pk)
+        with CaptureQueriesContext(connection) as small:
+            write_project_workbook(project, io.BytesIO())
+
+        self.add_issues(10)
+        with CaptureQueriesContext(connection) as large:
+            write_project_workbook(project, io.BytesIO())
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class ProjectDatasetExportTests(ProjectTestCase):
+    """Issues, comments and modifications stream as CSV and NDJSON"""
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.add_issues(3, comments_per_issue=2)
+
+    def fetch(self, dataset, format):
+        url = reverse('projects:export_project_dataset', kwargs={
+            'pk': self.project.pk, 'dataset': dataset, 'format': format,
+        })
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_has_a_header_and_one_line_per_row(self):
+        rows = list(csv.reader(io.StringIO(self.fetch('comments', 'csv'))))
+        self.assertEqual(rows[0][:2], ['id', 'issue_id'])
+        self.assertEqual(len(rows), 1 + Comment.objects.count())
+
+    def test_ndjson_has_one_object_per_line(self):
+        lines = self.fetch('issues', 'ndjson').splitlines()
+        issues = [json.loads(line) for line in lines]
+        self.assertEqual(len(issues), 3)
+        self.assertEqual(issues[0]['page'], 'Home')
+
+    def test_unknown_dataset_is_not_found(self):
+        url = reverse('projects:export_project_dataset', kwargs={
+            'pk': self.project.pk, 'dataset': 'users', 'format': 'csv',
+        })
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(EMAIL_USE_OUTBOX=True)
+class NotificationCoalescingTests(ProjectTestCase):
+    """A request that triggers several notifications sends each recipient one email"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+        self.staff = CustomUser.objects.create_user(
+            email='staff@example.com',
+            first_name='Sam',
+            last_name='Staff',
+            role=Role.objects.get(name=Role.STAFF),
+        )
+        self.project.assigned_to.add(self.staff)
+        OutboundEmail.objects.all().delete()
+
+    def test_milestone_update_sends_one_email_per_recipient(self):
+        url = reverse('projects:milestone_update', kwargs={'pk': self.milestone.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {
+                'name': 'Round 1',
+                'status': 'completed',
+                'assigned_to': self.staff.pk,
+            })
+        self.assertEqual(response.status_code, 302)
+
+        received = {}
+        for outbound in OutboundEmail.objects.all():
+            for recipient in outbound.to:
+                received.setdefault(recipient, []).append(outbound)
+        self.assertEqual(
+            {recipient: len(emails) for recipient, emails in received.items()},
+            {'admin@example.com': 1, 'client@example.com': 1, 'staff@example.com': 1},
+        )
+
+        # Assignment, update and completion notifications in one message
+        email = received['staff@example.com'][0]
+        self.assertIn('(and 2 more updates)', email.subject)
+        self.assertEqual(email.html_body.count('<h2>'), 3)
+        self.assertEqual(email.html_body.count('<html'), 1)
+
+    def send_notification(self):
+        send_email('Issue updated', 'emails/base_email.html', {}, ['staff@example.com'])
+
+    def test_notifications_of_a_rolled_back_transaction_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True), collect_notifications():
+            with transaction.atomic():
+                self.send_notification()
+                transaction.set_rollback(True)
+            self.send_notification()
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    def test_notifications_of_committed_work_survive_a_server_error(self):
+        def view(request):
+            Page.objects.create(project=self.project, name='Contact', created_by=self.admin)
+            self.send_notification()
+            return HttpResponseServerError()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = NotificationCollectorMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    def test_notifications_of_a_failed_request_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError), collect_notifications():
+                self.send_notification()
+                raise ValueError
+        self.assertFalse(OutboundEmail.objects.exists())
+
+
+def project_kwargs(data):
+    return {'project_id': data['project'].pk}
+
+
+def issue_kwargs(data):
+    return {'project_id': data['project'].pk, 'pk': data['issue'].pk}
+
+
+def comment_kwargs(data):
+    return {'project_id': data['project'].pk, 'issue_id': data['issue'].pk, 'comment_id': data['comment'].pk}
+
+
+def pk_of(name):
+    return lambda data: {'pk': data[name].pk}
+
+
+class ProjectQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Every projects URL stays within its query budget however much data it shows"""
+    urlconf = 'projects.urls'
+    budgets = {
+        'project_list': budget(9),
+        'project_detail': budget(13, pk_of('project')),
+        'project_section': budget(12, lambda data: {'pk': data['project'].pk, 'section': 'issues'}),
+        'project_issues': budget(9, pk_of('project')),
+        'project_create': budget(11),
+        'project_update': budget(15, pk_of('project')),
+        'project_delete': budget(8, pk_of('project')),
+        'project_type_list': budget(8),
+        'project_type_create': budget(7),
+        'project_type_update': budget(8, pk_of('project_type')),
+        'project_type_delete': budget(9, pk_of('project_type')),
+        'project_type_status_choices': budget(7, pk_of('project_type')),
+        'project_type_milestone_choices': budget(7, pk_of('project_type')),
+        'standard_list': budget(9),
+        'standard_detail': budget(9, pk_of('standard')),
+        'standard_create': budget(7),
+        'standard_update': budget(8, pk_of('standard')),
+        'standard_delete': budget(8, pk_of('standard')),
+        'violation_create': budget(8, lambda data: {'standard_id': data['standard'].pk}),
+        'violation_update': budget(9, pk_of('violation')),
+        'violation_delete': budget(9, pk_of('violation')),
+        'project_violation_create': budget(0, project_kwargs, skip='ProjectViolationForm does not accept project'),
+        'project_violation_update': budget(9, pk_of('project_violation')),
+        'project_violation_delete': budget(9, pk_of('project_violation')),
+        'project_standard_create': budget(8, project_kwargs),
+        'project_standard_delete': budget(8, pk_of('project_standard')),
+        'page_create': budget(8, project_kwargs),
+        'page_update': budget(9, pk_of('page')),
+        'page_delete': budget(9, pk_of('page')),
+        'milestone_create': budget(0, project_kwargs, skip='MilestoneForm reads instance.project before it is set'),
+        'milestone_update': budget(11, pk_of('milestone')),
+        'milestone_delete': budget(9, pk_of('milestone')),
+        'milestone_publish': budget(9, pk_of('milestone')),
+        'milestone_detail': budget(25, pk_of('milestone')),
+        'issues_needing_testing': budget(
+            10, lambda data: {'project_id': data['project'].pk, 'milestone_id': data['milestone'].pk}
+        ),
+        'accessibility_issue_create': budget(13, project_kwargs),
+        'accessibility_issue_edit': budget(14, issue_kwargs),
+        'accessibility_issue_delete': budget(8, issue_kwargs),
+        'issue_create': budget(13, project_kwargs),
+        'issue_detail': budget(18, issue_kwargs),
+        'issue_preview': budget(9, issue_kwargs),
+        'issue_comments': budget(10, issue_kwargs),
+        'issue_edit': budget(14, issue_kwargs),
+        'issue_update_status': budget(8, issue_kwargs),
+        'issue_delete': budget(8, issue_kwargs),
+        'mark_issue_ready_for_testing': budget(6, issue_kwargs),
+        'issue_comment': budget(8, issue_kwargs),
+        'edit_issue_comment': budget(11, comment_kwargs),
+        'delete_comment': budget(7, comment_kwargs),
+        'export_project': budget(14, pk_of('project')),
+        'export_project_dataset': budget(
+            8, lambda data: {'pk': data['project'].pk, 'dataset': 'comments', 'format': 'csv'}
+        ),
+        'export_job_status': budget(7, pk_of('export_job')),
+        'export_job_download': budget(7, pk_of('export_job')),
+    }
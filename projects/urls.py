@@ -7,6 +7,8 @@ urlpatterns = [
     # Project URLs
     path('', views.project_list, name='project_list'),
     path('<int:pk>/', views.project_detail, name='project_detail'),
+    path('<int:pk>/issues/', views.project_issues, name='project_issues'),
+    path('<int:pk>/sections/<slug:section>/', views.project_section, name='project_section'),
     path('create/', views.project_create, name='project_create'),
     path('<int:pk>/update/', views.project_update, name='project_update'),
     path('<int:pk>/delete/', views.project_delete, name='project_delete'),
@@ -61,6 +63,8 @@ urlpatterns = [
     # Issue URLs
     path('<int:project_id>/issues/create/', views.issue_create, name='issue_create'),
     path('<int:project_id>/issues/<int:pk>/', views.issue_detail, name='issue_detail'),
+    path('<int:project_id>/issues/<int:pk>/preview/', views.issue_preview, name='issue_preview'),
+    path('<int:project_id>/issues/<int:pk>/comments/', views.issue_comments, name='issue_comments'),
     path('<int:project_id>/issues/<int:pk>/update/', views.issue_edit, name='issue_edit'),
     path('<int:project_id>/issues/<int:pk>/update-status/', views.issue_update_status, name='issue_update_status'),
     path('<int:project_id>/issues/<int:pk>/delete/', views.issue_delete, name='issue_delete'),
@@ -69,4 +73,7 @@ urlpatterns = [
     path('<int:project_id>/issues/<int:issue_id>/comments/<int:comment_id>/edit/', views.edit_issue_comment, name='edit_issue_comment'),
     path('<int:project_id>/issues/<int:issue_id>/comments/<int:comment_id>/delete/', views.delete_comment, name='delete_comment'),
     path('<int:pk>/export/', views.export_project_to_excel, name='export_project'),
+    path('<int:pk>/export/<str:dataset>.<str:format>', views.export_project_dataset, name='export_project_dataset'),
+    path('exports/<int:pk>/', views.export_job_status, name='export_job_status'),
+    path('exports/<int:pk>/download/', views.export_job_download, name='export_job_download'),
 ] 
\ No newline at end of file
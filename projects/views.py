@@ -1,11 +1,29 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponseForbidden, JsonResponse, HttpResponse
-from django.db.models import Count, Q
-from .models import ProjectType, Project, Standard, Violation, ProjectViolation, ProjectStandard, Page, Milestone, Issue, Comment, IssueModification
+from django.http import HttpResponseForbidden, JsonResponse, HttpResponse, StreamingHttpResponse, Http404
+from django.db.models import Count, Q, Prefetch
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import SimpleLazyObject
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .access import ProjectAccess
+from .caching import project_etag
+from .models import ProjectType, Project, Standard, Violation, ProjectViolation, ProjectStandard, Page, Milestone, Issue, Comment, IssueModification, ExportJob, IssueStatusCounter
 from users.views import admin_required, staff_required
-from .forms import ProjectForm, StandardForm, ViolationForm, ProjectViolationForm, ProjectTypeForm, ProjectStandardForm, PageForm, MilestoneForm, IssueForm, CommentForm, IssueStatusForm
+from .exports import (
+    request_export,
+    stream_dataset_csv,
+    stream_export,
+    stream_dataset_ndjson,
+    STREAM_CONTENT_TYPES,
+    STREAM_DATASETS,
+    XLSX_CONTENT_TYPE,
+)
+from .forms import ProjectForm, StandardForm, ViolationForm, ProjectViolationForm, ProjectTypeForm, ProjectStandardForm, PageForm, MilestoneForm, IssueForm, CommentForm, IssueStatusForm, IssueFilterForm
 from perspectivetracker.utils import (
     send_project_created_email, 
     send_project_updated_email,
@@ -18,8 +36,6 @@ from perspectivetracker.utils import (
     send_assignment_notification_email,
     send_status_change_notification_email
 )
-import pandas as pd
-from io import BytesIO
 import logging
 
 logger = logging.getLogger(__name__)
@@ -28,34 +44,17 @@ logger = logging.getLogger(__name__)
 def project_list(request):
     """Display list of projects"""
     logger.info(f"User {request.user.email} accessing project list")
-    logger.info(f"User role: {request.user.role.name if hasattr(request.user, 'role') and request.user.role else 'None'}")
-    logger.info(f"User is superuser: {request.user.is_superuser}")
     
-    # Get all projects first for debugging
-    all_projects = Project.objects.all()
-    logger.info(f"Total projects in database: {all_projects.count()}")
-    
-    # Filter projects based on user role
-    if request.user.is_superuser or (hasattr(request.user, 'role') and request.user.role and request.user.role.name in ['admin', 'staff']):
-        projects = Project.objects.all()
-        logger.info(f"User has admin/staff role, showing all projects")
-    else:
-        projects = Project.objects.filter(assigned_to=request.user)
-        logger.info(f"User has regular role, showing only assigned projects")
-        logger.info(f"User's assigned projects: {[p.name for p in projects]}")
+    projects = Project.objects.visible_to(request.user).with_summary()
     
     # Filter by project type if specified
     project_type_slug = request.GET.get('type')
     if project_type_slug:
         projects = projects.filter(project_type__slug=project_type_slug)
-        logger.info(f"Filtered projects by type: {project_type_slug}")
     
     # Get all project types for filter dropdown
     project_types = ProjectType.objects.all()
     
-    # Log the number of projects visible to the user
-    logger.info(f"Number of projects visible to user: {projects.count()}")
-    
     context = {
         'projects': projects,
         'project_types': project_types,
@@ -63,65 +62,224 @@ def project_list(request):
     }
     return render(request, 'projects/project_list.html', context)
 
+def _project_detail_etag(request, pk):
+    return project_etag(request, pk, 'project_detail')
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_project_detail_etag)
 def project_detail(request, pk):
-    """Display project details"""
-    project = get_object_or_404(Project, pk=pk)
+    """
+    Display project details.
+
+    The page is a shell: its tab sections and issue previews are fetched from
+    project_section and issue_preview when first opened, so its size no longer
+    grows with the number of issues and comments.
+    """
+    project = get_object_or_404(Project.objects.select_related('client', 'project_type'), pk=pk)
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user in project.assigned_to.all()):
+    if not ProjectAccess.for_request(request).can_view(project):
         return HttpResponseForbidden("You don't have permission to access this project.")
     
-    # Get project standards
-    project_standards = ProjectStandard.objects.filter(project=project).select_related('standard')
-    
-    # Get project violations
-    violations = ProjectViolation.objects.filter(project=project)
-    
-    # Get project pages
+    # Choices of the add issue and add milestone forms. The querysets stay lazy,
+    # so a page whose forms come from the fragment cache runs none of them.
+    project_standards = ProjectStandard.objects.filter(project=project).select_related(
+        'standard', 'created_by'
+    ).prefetch_related('standard__violations')
     pages = Page.objects.filter(project=project).order_by('name')
-    
-    # Get project milestones
     milestones = Milestone.objects.filter(project=project).order_by('due_date', 'name')
-    
-    # Get accessibility issues
-    issues = Issue.objects.filter(project=project).order_by('-created_at')
-    
-    # Get team members
     team_members = project.assigned_to.all()
     
-    # Separate staff and client team members
-    staff_members = [member for member in team_members if member.is_superuser or 
-                    (hasattr(member, 'role') and member.role and member.role.name == 'admin')]
-    staff_members.sort(key=lambda x: x.first_name)
-    
-    client_members = [member for member in team_members if hasattr(member, 'role') and 
-                     member.role and member.role.name == 'client']
-    client_members.sort(key=lambda x: x.first_name)
-    
-    # Group violations by standard
-    grouped_violations = {}
-    for violation in violations:
-        standard = violation.violation.standard
-        if standard not in grouped_violations:
-            grouped_violations[standard] = []
-        grouped_violations[standard].append(violation)
-    
     context = {
         'project': project,
         'project_standards': project_standards,
-        'grouped_violations': grouped_violations,
         'pages': pages,
         'milestones': milestones,
-        'issues': issues,
         'team_members': team_members,
-        'staff_members': staff_members,
-        'client_members': client_members,
     }
     return render(request, 'projects/project_detail.html', context)
 
+def _standards_section(project):
+    return {
+        'project_standards': ProjectStandard.objects.filter(project=project).select_related('standard', 'created_by'),
+    }
+
+def _team_section(project):
+    team_members = project.assigned_to.select_related('role')
+    # Separate staff and client team members
+    return {
+        'staff_members': SimpleLazyObject(lambda: sorted(
+            [member for member in team_members if member.is_superuser or
+             (member.role and member.role.name == 'admin')],
+            key=lambda x: x.first_name,
+        )),
+        'client_members': SimpleLazyObject(lambda: sorted(
+            [member for member in team_members if member.role and member.role.name == 'client'],
+            key=lambda x: x.first_name,
+        )),
+    }
+
+def _pages_section(project):
+    return {'pages': Page.objects.filter(project=project).order_by('name')}
+
+def _issues_section(project):
+    # Only the first page of the issue table; the filters and later pages come from project_issues
+    first_page = SimpleLazyObject(lambda: _issue_page(project, {}))
+    return {
+        'issues': SimpleLazyObject(lambda: first_page[0]),
+        'next_cursor': SimpleLazyObject(lambda: first_page[1]),
+        'filter_form': IssueFilterForm(project=project),
+    }
+
+def _milestones_section(project):
+    return {
+        'milestones': Milestone.objects.filter(project=project).select_related(
+            'assigned_to', 'project__project_type'
+        ).order_by('due_date', 'name'),
+    }
+
+# Tab sections of project_detail by name. Each builds the context of
+# projects/includes/project_<name>.html lazily, so a section served from the
+# fragment cache runs no queries.
+PROJECT_SECTIONS = {
+    'standards': _standards_section,
+    'team': _team_section,
+    'pages': _pages_section,
+    'issues': _issues_section,
+    'milestones': _milestones_section,
+}
+
+def _project_section_etag(request, pk, section):
+    return project_etag(request, pk, 'project_section', section)
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_project_section_etag)
+def project_section(request, pk, section):
+    """Render one tab section of project_detail"""
+    if section not in PROJECT_SECTIONS:
+        raise Http404("Unknown project section")
+    project = get_object_or_404(Project.objects.select_related('client', 'project_type'), pk=pk)
+    
+    if not ProjectAccess.for_request(request).can_view(project):
+        return HttpResponseForbidden("You don't have permission to access this project.")
+    
+    context = {'project': project, **PROJECT_SECTIONS[section](project)}
+    return render(request, f'projects/includes/project_{section}.html', context)
+
+def _issue_preview_etag(request, project_id, pk):
+    return project_etag(request, project_id, 'issue_preview', pk)
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_issue_preview_etag)
+def issue_preview(request, project_id, pk):
+    """Render the comments modal of an issue, opened from the issues tab of project_detail"""
+    issue = get_object_or_404(Issue.objects.select_related('project'), pk=pk, project_id=project_id)
+    project = issue.project
+    
+    if not ProjectAccess.for_request(request).can_view(project):
+        return HttpResponseForbidden("You don't have permission to access this project.")
+    
+    context = {
+        'project': project,
+        'issue': issue,
+        'comments': issue.comments.select_related('author'),
+    }
+    return render(request, 'projects/includes/issue_preview.html', context)
+
+ISSUE_PAGE_SIZE = 50
+
+
+def _encode_cursor(obj):
+    """Encode the (created_at, id) keyset position of an issue or comment as an opaque cursor"""
+    return urlsafe_base64_encode(f"{obj.created_at.isoformat()}|{obj.pk}".encode())
+
+
+def _decode_cursor(cursor):
+    """Decode a cursor made by _encode_cursor, returning None if it is malformed"""
+    try:
+        created_at, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+    if created_at is None:
+        return None
+    return created_at, pk
+
+def _issue_page(project, filters, position=None):
+    """
+    Return one page of a project's issue table and the cursor of the next page.
+    
+    filters holds the cleaned IssueFilterForm fields; missing ones do not
+    filter. The cursor is empty on the last page.
+    """
+    issues = Issue.objects.filter(project=project)
+    for field in ['current_status', 'user_impact', 'tool_or_method', 'page', 'milestone', 'assigned_to']:
+        if filters.get(field):
+            issues = issues.filter(**{field: filters[field]})
+    
+    # Apply the cursor and sort direction
+    oldest_first = filters.get('sort') == 'oldest'
+    if position is not None:
+        created_at, last_id = position
+        if oldest_first:
+            issues = issues.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=last_id))
+        else:
+            issues = issues.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last_id))
+    if oldest_first:
+        issues = issues.order_by('created_at', 'id')
+    else:
+        issues = issues.order_by('-created_at', '-id')
+    
+    # Fetch one extra row to find out whether there is a next page
+    page_size = filters.get('page_size') or ISSUE_PAGE_SIZE
+    issues = list(
+        issues.select_related('project', 'page', 'milestone', 'assigned_to')
+        .annotate(comment_count=Count('comments'))[:page_size + 1]
+    )
+    has_next = len(issues) > page_size
+    issues = issues[:page_size]
+    return issues, _encode_cursor(issues[-1]) if has_next else ''
+
+@login_required
+def project_issues(request, pk):
+    """Return one page of a project's issue table as an HTML fragment.
+    
+    Pages are addressed with a keyset cursor on (created_at, id) instead of an
+    offset, so fetching any page costs the same however many issues the
+    project has. The cursor for the following page is sent in the
+    X-Next-Cursor header and is empty on the last page.
+    """
+    project = get_object_or_404(Project, pk=pk)
+    
+    # Check if user has access to this project
+    if not ProjectAccess.for_request(request).can_view(project):
+        return HttpResponseForbidden("You don't have permission to access this project.")
+    
+    form = IssueFilterForm(request.GET, project=project)
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'errors': form.errors}, status=400)
+    filters = form.cleaned_data
+    
+    position = None
+    if filters['cursor']:
+        position = _decode_cursor(filters['cursor'])
+        if position is None:
+            return JsonResponse({'success': False, 'errors': {'cursor': ['Invalid cursor.']}}, status=400)
+    issues, next_cursor = _issue_page(project, filters, position)
+    
+    context = {
+        'project': project,
+        'issues': issues,
+        'next_cursor': next_cursor,
+    }
+    response = render(request, 'projects/includes/issues_list.html', context)
+    response['X-Next-Cursor'] = next_cursor
+    return response
+
 @login_required
 @staff_required
 def project_create(request):
@@ -426,9 +584,7 @@ def project_violation_create(request, project_id):
     project = get_object_or_404(Project, pk=project_id)
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user in project.assigned_to.all()):
+    if not ProjectAccess.for_request(request).can_edit(project):
         return HttpResponseForbidden("You don't have permission to access this project.")
     
     # Check if project has standards
@@ -464,9 +620,7 @@ def project_violation_update(request, pk):
     project = project_violation.project
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user in project.assigned_to.all() or
+    if not (ProjectAccess.for_request(request).can_edit(project) or
             request.user == project_violation.assigned_to):
         return HttpResponseForbidden("You don't have permission to update this issue.")
     
@@ -494,8 +648,7 @@ def project_violation_delete(request, pk):
     project = project_violation.project
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin')):
+    if not ProjectAccess.for_request(request).is_admin:
         return HttpResponseForbidden("You don't have permission to delete this issue.")
     
     if request.method == 'POST':
@@ -515,9 +668,7 @@ def project_standard_create(request, project_id):
     project = get_object_or_404(Project, pk=project_id)
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user in project.assigned_to.all()):
+    if not ProjectAccess.for_request(request).can_edit(project):
         return HttpResponseForbidden("You don't have permission to access this project.")
     
     # Check if project already has a standard
@@ -551,9 +702,7 @@ def project_standard_delete(request, pk):
     project = project_standard.project
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user in project.assigned_to.all()):
+    if not ProjectAccess.for_request(request).can_edit(project):
         return HttpResponseForbidden("You don't have permission to remove this standard.")
     
     if request.method == 'POST':
@@ -716,9 +865,7 @@ def page_create(request, project_id):
     project = get_object_or_404(Project, pk=project_id)
     
     # Check if user has permission to add pages to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user in project.assigned_to.all()):
+    if not ProjectAccess.for_request(request).can_edit(project):
         return HttpResponseForbidden("You don't have permission to add pages to this project.")
     
     if request.method == 'POST':
@@ -747,9 +894,7 @@ def page_update(request, pk):
     project = page.project
     
     # Check if user has permission to edit this page
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user in project.assigned_to.all()):
+    if not ProjectAccess.for_request(request).can_edit(project):
         return HttpResponseForbidden("You don't have permission to edit this page.")
     
     if request.method == 'POST':
@@ -776,8 +921,7 @@ def page_delete(request, pk):
     project = page.project
     
     # Check if user has permission to delete this page
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin')):
+    if not ProjectAccess.for_request(request).is_admin:
         return HttpResponseForbidden("You don't have permission to delete this page.")
     
     if request.method == 'POST':
@@ -799,8 +943,7 @@ def milestone_create(request, project_id):
     project = get_object_or_404(Project, pk=project_id)
     
     # Check if user has permission to add milestones to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin')):
+    if not ProjectAccess.for_request(request).is_admin:
         return HttpResponseForbidden("You don't have permission to add milestones to this project.")
     
     if request.method == 'POST':
@@ -833,8 +976,7 @@ def milestone_update(request, pk):
     project = milestone.project
     
     # Check if user has permission to edit this milestone
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin')):
+    if not ProjectAccess.for_request(request).is_admin:
         return HttpResponseForbidden("You don't have permission to edit this milestone.")
     
     if request.method == 'POST':
@@ -912,8 +1054,7 @@ def milestone_delete(request, pk):
     project = milestone.project
     
     # Check if user has permission to delete this milestone
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin')):
+    if not ProjectAccess.for_request(request).is_admin:
         return HttpResponseForbidden("You don't have permission to delete this milestone.")
     
     if request.method == 'POST':
@@ -947,22 +1088,26 @@ def milestone_publish(request, pk):
     messages.success(request, f"Milestone '{milestone.name}' has been published successfully.")
     return redirect('projects:project_detail', pk=project.id)
 
+def _milestone_detail_etag(request, pk):
+    project_id = Milestone.objects.filter(pk=pk).values_list('project_id', flat=True).first()
+    # Recent modifications are those of the last seven days, so the page also changes daily
+    return project_etag(request, project_id, 'milestone_detail', pk, timezone.localdate())
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_milestone_detail_etag)
 def milestone_detail(request, pk):
     """Display milestone details"""
-    milestone = get_object_or_404(Milestone, pk=pk)
+    milestone = get_object_or_404(Milestone.objects.select_related('project'), pk=pk)
     project = milestone.project
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name in ['admin', 'staff']) or
-            request.user in project.assigned_to.all()):
+    access = ProjectAccess.for_request(request)
+    if not (access.is_staff_member or access.is_member(project)):
         return HttpResponseForbidden("You don't have permission to access this milestone.")
     
     # Check if user is a client and milestone is not published
-    is_client = (hasattr(request.user, 'role') and 
-                request.user.role and 
-                request.user.role.name == 'client')
+    is_client = access.is_client
     
     # Get all issues that need testing for this project
     issues_needing_testing = project.issues.filter(current_status='ready_for_testing')
@@ -989,12 +1134,21 @@ def milestone_detail(request, pk):
         issues_needing_testing = Issue.objects.none()  # Empty queryset for clients
         milestone_issues = Issue.objects.none()  # Empty queryset for clients
         recently_modified_issues = Issue.objects.none()  # Empty queryset for clients
+        status_summary = []
+    else:
+        # Read from the status counters rather than counting the issues, and only
+        # when the section is rendered rather than served from the fragment cache
+        def summarize():
+            status_counts = IssueStatusCounter.summary(milestone=milestone)
+            return [(label, status_counts[key]) for key, label in Issue.STATUS_CHOICES if status_counts.get(key)]
+        status_summary = SimpleLazyObject(summarize)
         
     context = {
         'milestone': milestone,
         'project': project,
         'issues_needing_testing': issues_needing_testing,
         'milestone_issues': milestone_issues,
+        'status_summary': status_summary,
         'recently_modified_issues': recently_modified_issues,
         'recent_modifications': recent_modifications,
         'is_client': is_client,
@@ -1008,9 +1162,7 @@ def issue_create(request, project_id):
     project = get_object_or_404(Project, pk=project_id)
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user in project.assigned_to.all()):
+    if not ProjectAccess.for_request(request).can_edit(project):
         return HttpResponseForbidden("You don't have permission to access this project.")
     
     if request.method == 'POST':
@@ -1043,9 +1195,7 @@ def issue_edit(request, project_id, pk):
     issue = get_object_or_404(Issue, pk=pk, project=project)
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user in project.assigned_to.all()):
+    if not ProjectAccess.for_request(request).can_edit(project):
         return HttpResponseForbidden("You don't have permission to access this project.")
     
     if request.method == 'POST':
@@ -1119,8 +1269,7 @@ def issue_delete(request, project_id, pk):
     issue = get_object_or_404(Issue, pk=pk, project=project)
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin')):
+    if not ProjectAccess.for_request(request).is_admin:
         return HttpResponseForbidden("You don't have permission to delete this issue.")
     
     if request.method == 'POST':
@@ -1135,16 +1284,19 @@ def issue_delete(request, project_id, pk):
     }
     return render(request, 'projects/issue_confirm_delete.html', context)
 
+def _issue_detail_etag(request, project_id, pk):
+    return project_etag(request, project_id, 'issue_detail', pk)
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_issue_detail_etag)
 def issue_detail(request, project_id, pk):
     """Display issue details"""
     project = get_object_or_404(Project, pk=project_id)
     issue = get_object_or_404(Issue, pk=pk, project=project)
     
     # Check if user is a client
-    is_client = (hasattr(request.user, 'role') and 
-                request.user.role and 
-                request.user.role.name == 'client')
+    is_client = ProjectAccess.for_request(request).is_client
     
     # Check if milestone is published
     milestone_published = issue.milestone and issue.milestone.status == 'published'
@@ -1155,14 +1307,9 @@ def issue_detail(request, project_id, pk):
         return redirect('projects:project_detail', pk=project.id)
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user in project.assigned_to.all()):
+    if not ProjectAccess.for_request(request).can_view(project):
         return HttpResponseForbidden("You don't have permission to access this project.")
     
-    # Get comments for this issue
-    comments = issue.comments.all()
-    
     # Handle POST requests
     if request.method == 'POST':
         comment_form = CommentForm(request.POST, user=request.user, issue=issue)
@@ -1228,27 +1375,21 @@ def issue_detail(request, project_id, pk):
             
             # Always handle AJAX requests consistently
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                # Determine if user can see internal comments
-                can_see_internal = request.user.is_superuser or (
-                    hasattr(request.user, 'role') and 
-                    request.user.role and 
-                    request.user.role.name in ['admin', 'staff']
-                )
-                
-                # Render the comments list to HTML
+                # Send only the new comment: the page adds it to the comments it already
+                # shows, so the response costs the same however long the thread is
                 from django.template.loader import render_to_string
-                comments_html = render_to_string('projects/includes/comments_list.html', {
-                    'comments': issue.comments.all(),
-                    'can_see_internal': can_see_internal,
+                comment_html = render_to_string('projects/includes/comment.html', {
+                    'comment': comment,
+                    'can_see_internal': ProjectAccess.for_request(request).is_staff_member,
                     'issue': issue,
-                    'project': project,
-                })
+                }, request=request)
                 
                 response_data = {
                     'success': True,
                     'message': 'Comment added successfully.',
-                    'comments_html': comments_html,
-                    'comment_count': issue.comments.count()
+                    'comment_id': comment.pk,
+                    'comment_html': comment_html,
+                    'comment_count_delta': 1,
                 }
                 
                 # Add status information if status was changed
@@ -1275,22 +1416,89 @@ def issue_detail(request, project_id, pk):
         comment_form = CommentForm(user=request.user, issue=issue)
     
     # Determine if user can see internal comments
-    can_see_internal = request.user.is_superuser or (
-        hasattr(request.user, 'role') and 
-        request.user.role and 
-        request.user.role.name in ['admin', 'staff']
-    )
+    can_see_internal = ProjectAccess.for_request(request).is_staff_member
+    
+    # Show the newest comments; older ones are loaded from issue_comments on demand
+    comments = _visible_comments(issue, can_see_internal)
+    comment_count = comments.count()
+    comments, next_cursor = _comment_page(comments)
     
     context = {
         'issue': issue,
         'project': project,
         'comments': comments,
+        'comment_count': comment_count,
+        'next_cursor': next_cursor,
         'comment_form': comment_form,
         'can_see_internal': can_see_internal,
     }
     
     return render(request, 'projects/issue_detail.html', context)
 
+COMMENT_PAGE_SIZE = 20
+
+
+def _visible_comments(issue, can_see_internal):
+    """Return the comments of an issue the viewer may read"""
+    comments = issue.comments.select_related('author')
+    if not can_see_internal:
+        comments = comments.exclude(comment_type='internal')
+    return comments
+
+
+def _comment_page(comments, position=None):
+    """
+    Return one page of comments, newest first, and the cursor of the next older page.
+    
+    Like the project issue table, pages are addressed with a keyset cursor on
+    (created_at, id), so every page costs the same however long the thread is.
+    The cursor is empty on the last page.
+    """
+    if position is not None:
+        created_at, last_id = position
+        comments = comments.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last_id))
+    # Fetch one extra row to find out whether there is an older page
+    comments = list(comments.order_by('-created_at', '-id')[:COMMENT_PAGE_SIZE + 1])
+    has_next = len(comments) > COMMENT_PAGE_SIZE
+    comments = comments[:COMMENT_PAGE_SIZE]
+    return comments, _encode_cursor(comments[-1]) if has_next else ''
+
+@login_required
+def issue_comments(request, project_id, pk):
+    """Return the page of an issue's comments before the cursor as an HTML fragment.
+    
+    The fragment ends with the button that loads the page after it, and the
+    cursor of that page is also sent in the X-Next-Cursor header.
+    """
+    project = get_object_or_404(Project, pk=project_id)
+    issue = get_object_or_404(Issue.objects.select_related('milestone'), pk=pk, project=project)
+    access = ProjectAccess.for_request(request)
+    
+    # The same rules as issue_detail: clients only see issues of published milestones
+    if not access.can_view(project) or (
+        access.is_client and not (issue.milestone and issue.milestone.status == 'published')
+    ):
+        return HttpResponseForbidden("You don't have permission to access this issue.")
+    
+    position = None
+    if request.GET.get('cursor'):
+        position = _decode_cursor(request.GET['cursor'])
+        if position is None:
+            return JsonResponse({'success': False, 'errors': {'cursor': ['Invalid cursor.']}}, status=400)
+    
+    can_see_internal = access.is_staff_member
+    comments, next_cursor = _comment_page(_visible_comments(issue, can_see_internal), position)
+    issue.project = project
+    context = {
+        'issue': issue,
+        'comments': comments,
+        'next_cursor': next_cursor,
+        'can_see_internal': can_see_internal,
+    }
+    response = render(request, 'projects/includes/comments_page.html', context)
+    response['X-Next-Cursor'] = next_cursor
+    return response
+
 @login_required
 def issue_update_status(request, project_id, pk):
     """Update just the status of an issue"""
@@ -1298,9 +1506,7 @@ def issue_update_status(request, project_id, pk):
     issue = get_object_or_404(Issue, pk=pk, project=project)
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user in project.assigned_to.all()):
+    if not ProjectAccess.for_request(request).can_edit(project):
         return HttpResponseForbidden("You don't have permission to access this project.")
     
     if request.method == 'POST':
@@ -1387,17 +1593,12 @@ def mark_issue_ready_for_testing(request, project_id, pk):
     issue = get_object_or_404(Issue, pk=pk, project=project)
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user in project.assigned_to.all()):
+    if not ProjectAccess.for_request(request).can_edit(project):
         return HttpResponseForbidden("You don't have permission to access this project.")
     
     # Check if user has permission to mark as ready for testing
-    if not (request.user.is_superuser or 
-           (request.user.is_authenticated and 
-           hasattr(request.user, 'role') and 
-           request.user.role and 
-           request.user.role.name != 'standard')):
+    role_name = ProjectAccess.for_request(request).role_name
+    if not (request.user.is_superuser or (role_name and role_name != 'standard')):
         return HttpResponseForbidden("You don't have permission to mark issues as ready for testing.")
     
     # Store the old status for the response
@@ -1459,8 +1660,7 @@ def issues_needing_testing(request, project_id, milestone_id):
     milestone = get_object_or_404(Milestone, pk=milestone_id)
     
     # Check if user has access to this project and is admin/superuser
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin')):
+    if not ProjectAccess.for_request(request).is_admin:
         return HttpResponseForbidden("You don't have permission to access this page.")
     
     # Get all issues that need testing for this project
@@ -1480,9 +1680,7 @@ def issue_comment(request, project_id, pk):
     issue = get_object_or_404(Issue, pk=pk, project=project)
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user in project.assigned_to.all()):
+    if not ProjectAccess.for_request(request).can_edit(project):
         return HttpResponseForbidden("You don't have permission to comment on this issue.")
     
     if request.method == 'POST':
@@ -1513,9 +1711,7 @@ def delete_comment(request, project_id, issue_id, comment_id):
     comment = get_object_or_404(Comment, id=comment_id, issue_id=issue_id)
     
     # Check if user has permission to delete this comment
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user == comment.author):
+    if not (ProjectAccess.for_request(request).is_admin or request.user == comment.author):
         return JsonResponse({'success': False, 'message': 'You do not have permission to delete this comment.'})
     
     if request.method == 'POST':
@@ -1535,37 +1731,27 @@ def edit_issue_comment(request, project_id, issue_id, comment_id):
     comment = get_object_or_404(Comment, id=comment_id, issue=issue)
     
     # Check if user has permission to edit this comment
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user == comment.author):
+    if not (ProjectAccess.for_request(request).is_admin or request.user == comment.author):
         return JsonResponse({'success': False, 'message': 'You do not have permission to edit this comment.'})
     
     if request.method == 'POST':
         form = CommentForm(request.POST, instance=comment, user=request.user, issue=issue)
         if form.is_valid():
-            form.save()
+            comment = form.save()
             
-            # Determine if user can see internal comments
-            can_see_internal = request.user.is_superuser or (
-                hasattr(request.user, 'role') and 
-                request.user.role and 
-                request.user.role.name in ['admin', 'staff']
-            )
-            
-            # Render the comments list to HTML
+            # Send only the edited comment for the page to swap in, like a new comment
             from django.template.loader import render_to_string
-            comments_html = render_to_string('projects/includes/comments_list.html', {
-                'comments': issue.comments.all(),
-                'can_see_internal': can_see_internal,
+            comment_html = render_to_string('projects/includes/comment.html', {
+                'comment': comment,
+                'can_see_internal': ProjectAccess.for_request(request).is_staff_member,
                 'issue': issue,
-                'project': project,
-            })
+            }, request=request)
             
             return JsonResponse({
                 'success': True,
                 'message': 'Comment updated successfully.',
-                'comments_html': comments_html,
-                'comment_count': issue.comments.count()
+                'comment_id': comment.pk,
+                'comment_html': comment_html,
             })
         else:
             return JsonResponse({
@@ -1584,147 +1770,76 @@ def edit_issue_comment(request, project_id, issue_id, comment_id):
     }
     return render(request, 'projects/includes/comment_form.html', context)
 
+def _export_job_data(job):
+    """Serialize an export job for the polling endpoints"""
+    data = {
+        'job_id': job.pk,
+        'status': job.status,
+        'status_url': reverse('projects:export_job_status', kwargs={'pk': job.pk}),
+        'download_url': None,
+    }
+    if job.status == 'completed':
+        data['download_url'] = reverse('projects:export_job_download', kwargs={'pk': job.pk})
+    elif job.status == 'failed':
+        data['error'] = job.error
+    return data
+
 @login_required
 def export_project_to_excel(request, pk):
-    """Export project data to Excel with multiple sheets"""
+    """Queue an Excel export of the project, or return the cached one if nothing has changed"""
+    project = get_object_or_404(Project.objects.select_related('client'), pk=pk)
+    
+    # Check if user has access to this project
+    if not ProjectAccess.for_request(request).can_view(project):
+        return HttpResponseForbidden("You don't have permission to access this project.")
+    
+    job = request_export(project, request.user)
+    return JsonResponse(_export_job_data(job), status=200 if job.status == 'completed' else 202)
+
+@login_required
+def export_project_dataset(request, pk, dataset, format):
+    """Stream a project's issues, comments or modification history as CSV or NDJSON"""
+    if dataset not in STREAM_DATASETS or format not in STREAM_CONTENT_TYPES:
+        raise Http404("Unknown export.")
+    
     project = get_object_or_404(Project, pk=pk)
     
     # Check if user has access to this project
-    if not (request.user.is_superuser or 
-            (hasattr(request.user, 'role') and request.user.role and request.user.role.name == 'admin') or
-            request.user in project.assigned_to.all()):
+    if not ProjectAccess.for_request(request).can_view(project):
         return HttpResponseForbidden("You don't have permission to access this project.")
     
-    # Create Excel writer
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        # Project Details Sheet
-        project_data = {
-            'Field': [
-                'Name', 'Client', 'Project Type', 'Status', 'Created At', 'Updated At',
-                'Team Members', 'Notes'
-            ],
-            'Value': [
-                project.name,
-                project.client.company_name if project.client else '',
-                project.project_type.name if project.project_type else '',
-                project.get_status_display(),
-                project.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                project.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
-                ', '.join([user.get_full_name() for user in project.assigned_to.all()]),
-                project.notes or ''
-            ]
-        }
-        pd.DataFrame(project_data).to_excel(writer, sheet_name='Project Details', index=False)
-        
-        # Pages Sheet
-        pages = Page.objects.filter(project=project)
-        pages_data = []
-        for page in pages:
-            pages_data.append({
-                'Name': page.name,
-                'URL': page.url,
-                'Status': getattr(page, 'status', ''),
-                'Last Checked': getattr(page, 'last_checked', '').strftime('%Y-%m-%d %H:%M:%S') if hasattr(page, 'last_checked') and page.last_checked else '',
-                'Notes': getattr(page, 'notes', '') or '',
-                'Created At': page.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'Updated At': page.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-            })
-        pd.DataFrame(pages_data).to_excel(writer, sheet_name='Pages', index=False)
-        
-        # Issues Sheet
-        issues = Issue.objects.filter(project=project)
-        issues_data = []
-        for issue in issues:
-            issues_data.append({
-                'Description': issue.issue_description,
-                'Status': issue.get_current_status_display(),
-                'Severity': getattr(issue, 'get_severity_display', lambda: '')() if hasattr(issue, 'severity') else '',
-                'Page': issue.page.name if issue.page else '',
-                'Milestone': issue.milestone.name if issue.milestone else '',
-                'Assigned To': issue.assigned_to.get_full_name() if issue.assigned_to else '',
-                'Steps to Reproduce': getattr(issue, 'steps_to_reproduce', '') or '',
-                'User Impact': getattr(issue, 'user_impact', '') or '',
-                'User Impact Description': getattr(issue, 'user_impact_description', '') or '',
-                'Created By': issue.created_by.get_full_name() if issue.created_by else '',
-                'Created At': issue.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'Updated At': issue.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-            })
-        pd.DataFrame(issues_data).to_excel(writer, sheet_name='Issues', index=False)
-        
-        # Milestones Sheet
-        milestones = Milestone.objects.filter(project=project)
-        milestones_data = []
-        for milestone in milestones:
-            milestones_data.append({
-                'Name': milestone.name,
-                'Description': getattr(milestone, 'description', '') or '',
-                'Due Date': milestone.due_date.strftime('%Y-%m-%d') if milestone.due_date else '',
-                'Completed Date': getattr(milestone, 'completed_date', '').strftime('%Y-%m-%d') if hasattr(milestone, 'completed_date') and milestone.completed_date else '',
-                'Status': milestone.get_status_display(),
-                'Type': getattr(milestone, 'milestone_type', '') if hasattr(milestone, 'milestone_type') else '',
-                'Assigned To': milestone.assigned_to.get_full_name() if milestone.assigned_to else '',
-                'Created By': milestone.created_by.get_full_name() if milestone.created_by else '',
-                'Notes': getattr(milestone, 'notes', '') or '',
-                'Created At': milestone.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'Updated At': milestone.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-            })
-        pd.DataFrame(milestones_data).to_excel(writer, sheet_name='Milestones', index=False)
-        
-        # Comments Sheet
-        comments = Comment.objects.filter(issue__project=project)
-        comments_data = []
-        for comment in comments:
-            comments_data.append({
-                'Issue': comment.issue.issue_description[:50] + '...' if len(comment.issue.issue_description) > 50 else comment.issue.issue_description,
-                'Author': comment.author.get_full_name() if comment.author else '',
-                'Type': comment.get_comment_type_display(),
-                'Text': comment.text,
-                'Status Changed': 'Yes' if comment.status_changed else 'No',
-                'Previous Status': comment.previous_status if comment.status_changed else '',
-                'New Status': comment.new_status if comment.status_changed else '',
-                'Created At': comment.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'Updated At': comment.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-            })
-        pd.DataFrame(comments_data).to_excel(writer, sheet_name='Comments', index=False)
-        
-        # Project Standards Sheet
-        if hasattr(project, 'standards'):
-            standards = project.standards.all()
-            standards_data = []
-            for standard in standards:
-                standards_data.append({
-                    'Name': standard.name,
-                    'Description': getattr(standard, 'description', '') or '',
-                    'Version': getattr(standard, 'version', '') or '',
-                    'Status': getattr(standard, 'get_status_display', lambda: '')() if hasattr(standard, 'status') else '',
-                    'Created At': standard.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    'Updated At': standard.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-                })
-            pd.DataFrame(standards_data).to_excel(writer, sheet_name='Standards', index=False)
-        
-        # Violations Sheet
-        if hasattr(project, 'violations'):
-            violations = project.violations.all()
-            violations_data = []
-            for violation in violations:
-                violations_data.append({
-                    'Standard': violation.standard.name if violation.standard else '',
-                    'Name': violation.name,
-                    'Description': getattr(violation, 'description', '') or '',
-                    'Severity': getattr(violation, 'get_severity_display', lambda: '')() if hasattr(violation, 'severity') else '',
-                    'Status': getattr(violation, 'get_status_display', lambda: '')() if hasattr(violation, 'status') else '',
-                    'Created At': violation.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    'Updated At': violation.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-                })
-            pd.DataFrame(violations_data).to_excel(writer, sheet_name='Violations', index=False)
+    if format == 'csv':
+        rows = stream_dataset_csv(project, dataset)
+    else:
+        rows = stream_dataset_ndjson(project, dataset)
     
-    # Prepare response
-    output.seek(0)
-    response = HttpResponse(
-        output.read(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{project.name}_export.xlsx"'
+    response = StreamingHttpResponse(rows, content_type=STREAM_CONTENT_TYPES[format])
+    response['Content-Disposition'] = f'attachment; filename="{project.name}_{dataset}.{format}"'
+    return response
+
+@login_required
+def export_job_status(request, pk):
+    """Return the status of an export job as JSON"""
+    job = get_object_or_404(ExportJob.objects.select_related('project'), pk=pk)
+    project = job.project
+    
+    # Check if user has access to this project
+    if not ProjectAccess.for_request(request).can_view(project):
+        return HttpResponseForbidden("You don't have permission to access this project.")
+    
+    return JsonResponse(_export_job_data(job))
+
+@login_required
+def export_job_download(request, pk):
+    """Stream a finished export from its stored chunks"""
+    job = get_object_or_404(ExportJob.objects.select_related('project'), pk=pk, status='completed')
+    project = job.project
     
+    # Check if user has access to this project
+    if not ProjectAccess.for_request(request).can_view(project):
+        return HttpResponseForbidden("You don't have permission to access this project.")
+    
+    response = StreamingHttpResponse(stream_export(job), content_type=XLSX_CONTENT_TYPE)
+    response['Content-Length'] = job.size
+    response['Content-Disposition'] = f'attachment; filename="{project.name}_export.xlsx"'
     return response
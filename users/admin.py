@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from django.db import models
-from .models import CustomUser, Role
+from django.utils import timezone
+from .models import CustomUser, Role, OutboundEmail
 
 class CustomUserCreationForm(UserCreationForm):
     class Meta:
@@ -24,6 +25,7 @@ class CustomUserAdmin(UserAdmin):
         (None, {'fields': ('email', 'password')}),
         ('Personal info', {'fields': ('first_name', 'last_name')}),
         ('Permissions', {'fields': ('role', 'no_manager', 'manager', 'additional_managers', 'is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions')}),
+        ('Notifications', {'fields': ('email_digest',)}),
         ('Important dates', {'fields': ('last_login', 'date_joined')}),
     )
     add_fieldsets = (
@@ -57,5 +59,19 @@ class RoleAdmin(admin.ModelAdmin):
     list_display = ('name',)
     search_fields = ('name',)
 
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'last_error')
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry_emails']
+
+    @admin.action(description='Retry selected emails')
+    def retry_emails(self, request, queryset):
+        # Give dead-lettered emails a fresh set of attempts
+        updated = queryset.exclude(status='sent').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f"{updated} emails queued for retry.")
+
 admin.site.register(CustomUser, CustomUserAdmin)
 admin.site.register(Role, RoleAdmin)
+admin.site.register(OutboundEmail, OutboundEmailAdmin)
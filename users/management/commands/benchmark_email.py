@@ -0,0 +1,129 @@
+from django.core.management.base import BaseCommand
+from django.core.mail import get_connection, EmailMultiAlternatives
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+import socketserver
+import threading
+import time
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP server that accepts and discards every message"""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        # Simulates the network round trips and TLS handshake of a real server
+        time.sleep(self.server.connect_delay)
+        self.reply('220 sink ESMTP')
+        in_data = False
+        for raw in self.rfile:
+            line = raw.decode(errors='replace').rstrip('\r\n')
+            if in_data:
+                if line == '.':
+                    in_data = False
+                    self.server.messages += 1
+                    self.reply('250 OK')
+                continue
+            command = line[:4].upper()
+            if command == 'EHLO':
+                self.reply('250-sink')
+                self.reply('250 8BITMIME')
+            elif command == 'DATA':
+                in_data = True
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class _SinkServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, connect_delay):
+        super().__init__(address, _SinkHandler)
+        self.connect_delay = connect_delay
+        self.messages = 0
+
+
+class Command(BaseCommand):
+    help = 'Compare email throughput of one SMTP connection per message against one connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200, help='Number of emails to send per run')
+        parser.add_argument('--batch-size', type=int, default=50, help='Emails sent over one connection')
+        parser.add_argument(
+            '--connect-delay',
+            type=float,
+            default=0.05,
+            help='Seconds the local sink waits before greeting, standing in for connection and TLS setup',
+        )
+        parser.add_argument('--host', help='Use an existing SMTP sink instead of starting one')
+        parser.add_argument('--port', type=int, default=1025, help='Port of the SMTP sink given with --host')
+
+    def handle(self, *args, **options):
+        server = None
+        if options['host']:
+            host, port = options['host'], options['port']
+        else:
+            server = _SinkServer(('127.0.0.1', 0), options['connect_delay'])
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            host, port = server.server_address
+
+        html_message = render_to_string('emails/base_email.html', {'company_name': 'Benchmark'})
+        plain_message = strip_tags(html_message)
+
+        def connection():
+            return get_connection(
+                backend='django.core.mail.backends.smtp.EmailBackend',
+                host=host,
+                port=port,
+                username='',
+                password='',
+                use_tls=False,
+                use_ssl=False,
+                fail_silently=False,
+            )
+
+        def message(i, connection):
+            email = EmailMultiAlternatives(
+                subject=f'Benchmark {i}',
+                body=plain_message,
+                from_email='benchmark@example.com',
+                to=[f'recipient{i}@example.com'],
+                connection=connection,
+            )
+            email.attach_alternative(html_message, 'text/html')
+            return email
+
+        try:
+            count = options['messages']
+            self.stdout.write(f"Sending {count} emails to {host}:{port}...")
+
+            # Previous behaviour: every send_email call opened its own connection
+            started = time.perf_counter()
+            for i in range(count):
+                message(i, connection()).send()
+            per_message = time.perf_counter() - started
+            self.report('connection per message', count, per_message)
+
+            started = time.perf_counter()
+            for start in range(0, count, options['batch_size']):
+                batch_connection = connection()
+                batch = [message(i, batch_connection) for i in range(start, min(start + options['batch_size'], count))]
+                batch_connection.send_messages(batch)
+            batched = time.perf_counter() - started
+            self.report(f"connection per {options['batch_size']} emails", count, batched)
+
+            self.stdout.write(self.style.SUCCESS(f"Batched delivery was {per_message / batched:.1f}x faster"))
+        finally:
+            if server:
+                server.shutdown()
+                server.server_close()
+
+    def report(self, name, count, seconds):
+        self.stdout.write(f"{name:>28}: {seconds:.2f}s, {count / seconds:.0f} emails/s")
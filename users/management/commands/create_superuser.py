@@ -23,7 +23,7 @@ class Command(BaseCommand):
             
             # Assign admin role if it exists
             try:
-                admin_role = Role.objects.get(name='admin')
+                admin_role = Role.cached(Role.ADMIN)
                 user.role = admin_role
                 user.save()
                 self.stdout.write(self.style.SUCCESS('Admin role assigned'))
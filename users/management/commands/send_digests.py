@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from perspectivetracker.utils import send_digests
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Send hourly or daily notification digests; schedule hourly and daily runs with cron or Heroku Scheduler'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--frequency',
+            choices=['hourly', 'daily'],
+            required=True,
+            help='Which digest preference to send',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Users rendered and delivered per batch',
+        )
+
+    def handle(self, *args, **options):
+        sent = send_digests(options['frequency'], options['batch_size'])
+        logger.info(f"Sent {sent} {options['frequency']} digests")
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} {options['frequency']} digests"))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from perspectivetracker.utils import claim_outbound_emails, send_outbound_emails
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Send queued notification emails from the outbox, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send the emails that are currently due and exit',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between polls when no email is due',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Maximum number of emails sent over one mail connection',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            emails = claim_outbound_emails(options['batch_size'])
+
+            if not emails:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+
+            sent, failed = send_outbound_emails(emails)
+            logger.info(f"Outbox batch: {sent} sent, {failed} failed")
+            self.stdout.write(self.style.SUCCESS(f"Sent {sent} emails"))
+            if failed:
+                self.stdout.write(self.style.WARNING(f"{failed} emails failed and were rescheduled or dead-lettered"))
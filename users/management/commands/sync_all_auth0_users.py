@@ -45,16 +45,16 @@ class Command(BaseCommand):
                     is_superuser = False
                     
                     if 'admin' in auth0_roles:
-                        new_role, _ = Role.objects.get_or_create(name='admin')
+                        new_role = Role.cached(Role.ADMIN)
                         is_staff = True
                         is_superuser = True
                     elif 'staff' in auth0_roles:
-                        new_role, _ = Role.objects.get_or_create(name='staff')
+                        new_role = Role.cached(Role.STAFF)
                         is_staff = True
                     elif 'client' in auth0_roles:
-                        new_role, _ = Role.objects.get_or_create(name='client')
+                        new_role = Role.cached(Role.CLIENT)
                     else:
-                        new_role, _ = Role.objects.get_or_create(name='user')
+                        new_role = Role.cached(Role.USER)
                     
                     # Check if update is needed
                     needs_update = (
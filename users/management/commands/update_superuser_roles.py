@@ -6,7 +6,7 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         try:
-            admin_role = Role.objects.get(name=Role.ADMIN)
+            admin_role = Role.cached(Role.ADMIN)
             superusers = CustomUser.objects.filter(is_superuser=True)
             
             if not superusers.exists():
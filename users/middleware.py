@@ -1,15 +1,41 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from social_django.models import UserSocialAuth
 from users.models import Role
+import hashlib
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
+def auth0_sync_cache_key(user_id):
+    return f'auth0_sync:{user_id}'
+
+def auth0_sync_fingerprint(auth0_roles, user):
+    """
+    Fingerprint of a user's Auth0 roles and local role state
+    """
+    state = [
+        sorted(auth0_roles) if auth0_roles is not None else None,
+        user.role_id,
+        user.is_staff,
+        user.is_superuser,
+        user.manually_modified,
+    ]
+    return hashlib.sha1(json.dumps(state).encode()).hexdigest()
+
 class Auth0SyncMiddleware:
     """
-    Middleware to check and sync Auth0 roles on each request
+    Middleware to check and sync Auth0 roles on each request.
+    
+    The Auth0 roles seen at the last sync are cached with a fingerprint of
+    them and the user's role state. While the fingerprint still matches the
+    user and AUTH0_SYNC_TTL has not expired the sync is skipped, so steady
+    requests add no queries. Saving the UserSocialAuth record (as a login
+    does) clears the cached entry.
     """
     def __init__(self, get_response):
         self.get_response = get_response
@@ -20,68 +46,82 @@ class Auth0SyncMiddleware:
         
         # Only check for authenticated users
         if request.user.is_authenticated:
+            cache_key = auth0_sync_cache_key(request.user.pk)
+            synced = cache.get(cache_key)
+            if synced and synced['fingerprint'] == auth0_sync_fingerprint(synced['roles'], request.user):
+                return response
+            
             try:
-                # Check if this is an Auth0 user
-                auth0_user = UserSocialAuth.objects.filter(provider='auth0', user=request.user).first()
-                if not auth0_user:
-                    return response
-                
-                # Skip sync if user has been manually modified in admin
-                if hasattr(request.user, 'manually_modified') and request.user.manually_modified:
-                    logger.info(f"Skipping Auth0 sync for manually modified user: {request.user.email}")
-                    return response
-                
-                # Get Auth0 roles
-                auth0_roles = auth0_user.extra_data.get('roles', [])
-                
-                # Determine the appropriate role based on Auth0 roles
-                new_role = None
-                is_staff = False
-                is_superuser = False
-                
-                if 'admin' in auth0_roles:
-                    new_role, _ = Role.objects.get_or_create(name='admin')
-                    is_staff = True
-                    is_superuser = True
-                elif 'staff' in auth0_roles:
-                    new_role, _ = Role.objects.get_or_create(name='staff')
-                    is_staff = True
-                elif 'client' in auth0_roles:
-                    new_role, _ = Role.objects.get_or_create(name='client')
-                else:
-                    new_role, _ = Role.objects.get_or_create(name='user')
-                
-                # Check if update is needed
-                needs_update = (
-                    request.user.role != new_role or
-                    request.user.is_staff != is_staff or
-                    request.user.is_superuser != is_superuser
-                )
-                
-                if needs_update:
-                    # Update user's role and permissions
-                    request.user.role = new_role
-                    request.user.is_staff = is_staff
-                    request.user.is_superuser = is_superuser
-                    
-                    # Ensure admins always have staff status and superusers always have staff access
-                    if request.user.role and request.user.role.name == 'admin':
-                        request.user.is_staff = True
-                        request.user.is_superuser = True
-                        logger.info(f"Ensuring admin {request.user.email} has staff and superuser status")
-                    
-                    if request.user.is_superuser:
-                        request.user.is_staff = True
-                        logger.info(f"Ensuring superuser {request.user.email} has staff access")
-                    
-                    request.user.save()
-                    
-                    logger.info(
-                        f"Auto-synced Auth0 user via middleware {request.user.email}: role={new_role.name}, "
-                        f"is_staff={request.user.is_staff}, is_superuser={request.user.is_superuser}"
-                    )
-                    
+                self.sync(request)
             except Exception as e:
                 logger.error(f"Error auto-syncing Auth0 user via middleware: {str(e)}")
         
-        return response 
\ No newline at end of file
+        return response
+
+    def sync(self, request):
+        """Run the Auth0 role sync and remember what it saw"""
+        # Check if this is an Auth0 user
+        auth0_user = UserSocialAuth.objects.filter(provider='auth0', user=request.user).first()
+        auth0_roles = auth0_user.extra_data.get('roles', []) if auth0_user else None
+        
+        if auth0_user:
+            # Skip sync if user has been manually modified in admin
+            if hasattr(request.user, 'manually_modified') and request.user.manually_modified:
+                logger.info(f"Skipping Auth0 sync for manually modified user: {request.user.email}")
+            else:
+                self.apply_roles(request, auth0_roles)
+        
+        cache.set(
+            auth0_sync_cache_key(request.user.pk),
+            {'roles': auth0_roles, 'fingerprint': auth0_sync_fingerprint(auth0_roles, request.user)},
+            settings.AUTH0_SYNC_TTL,
+        )
+
+    def apply_roles(self, request, auth0_roles):
+        """Give the user the role and staff flags their Auth0 roles call for"""
+        # Determine the appropriate role based on Auth0 roles
+        new_role = None
+        is_staff = False
+        is_superuser = False
+        
+        if 'admin' in auth0_roles:
+            new_role = Role.cached(Role.ADMIN)
+            is_staff = True
+            is_superuser = True
+        elif 'staff' in auth0_roles:
+            new_role = Role.cached(Role.STAFF)
+            is_staff = True
+        elif 'client' in auth0_roles:
+            new_role = Role.cached(Role.CLIENT)
+        else:
+            new_role = Role.cached(Role.USER)
+        
+        # Check if update is needed
+        needs_update = (
+            request.user.role != new_role or
+            request.user.is_staff != is_staff or
+            request.user.is_superuser != is_superuser
+        )
+        
+        if needs_update:
+            # Update user's role and permissions
+            request.user.role = new_role
+            request.user.is_staff = is_staff
+            request.user.is_superuser = is_superuser
+            
+            # Ensure admins always have staff status and superusers always have staff access
+            if request.user.role and request.user.role.name == 'admin':
+                request.user.is_staff = True
+                request.user.is_superuser = True
+                logger.info(f"Ensuring admin {request.user.email} has staff and superuser status")
+            
+            if request.user.is_superuser:
+                request.user.is_staff = True
+                logger.info(f"Ensuring superuser {request.user.email} has staff access")
+            
+            request.user.save()
+            
+            logger.info(
+                f"Auto-synced Auth0 user via middleware {request.user.email}: role={new_role.name}, "
+                f"is_staff={request.user.is_staff}, is_superuser={request.user.is_superuser}"
+            )
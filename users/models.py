@@ -1,7 +1,11 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
+from django.utils import timezone
+
+# Roles by name, loaded by Role.cached()
+_role_registry = {}
 
 class Role(models.Model):
     ADMIN = 'admin'
@@ -21,6 +25,41 @@ class Role(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def _registry(cls):
+        if not _role_registry:
+            _role_registry.update({role.name: role for role in cls.objects.all()})
+        return _role_registry
+
+    @classmethod
+    def cached(cls, name):
+        """
+        Return the role with this name from a registry loaded once per process.
+        
+        The registry is cleared when a role is saved or deleted. A default
+        role that is missing from the database is created.
+        """
+        role = cls._registry().get(name)
+        if role is None:
+            if name not in dict(cls.ROLE_CHOICES):
+                raise cls.DoesNotExist(f"Role matching name '{name}' does not exist.")
+            # Creating the role clears the registry, so it is reloaded on the next call
+            role, _ = cls.objects.get_or_create(name=name)
+        return role
+
+    @classmethod
+    def cached_by_pk(cls, pk):
+        """Return the role with this primary key from the registry"""
+        for role in cls._registry().values():
+            if role.pk == pk:
+                return role
+        return cls.objects.get(pk=pk)
+
+    @classmethod
+    def clear_cache(cls):
+        """Forget the loaded roles so the next Role.cached() call reloads them"""
+        _role_registry.clear()
+
     @classmethod
     def create_default_roles(cls):
         """Create default roles if they don't exist"""
@@ -36,6 +75,12 @@ def create_default_roles(sender, **kwargs):
     if sender.name == 'users':  # Only run for the users app
         Role.create_default_roles()
 
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def clear_role_registry(sender, **kwargs):
+    """Signal handler to reload the role registry after a role changes"""
+    Role.clear_cache()
+
 class AdminSettings(models.Model):
     """Model to store admin-specific settings"""
     receive_all_emails = models.BooleanField(
@@ -52,6 +97,84 @@ class AdminSettings(models.Model):
     def __str__(self):
         return "Admin Settings"
 
+class OutboundEmail(models.Model):
+    """Rendered email waiting in the outbox for the send_outbox worker"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    )
+
+    subject = models.TextField()
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} ({self.get_status_display()})"
+
+class FieldTrackingMixin:
+    """
+    Remember the values of tracked_fields as loaded from the database, so
+    save() and signal handlers can see what changed without another query.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked_fields()
+        return instance
+
+    def _tracked_attnames(self):
+        return {name: self._meta.get_field(name).attname for name in self.tracked_fields}
+
+    def _snapshot_tracked_fields(self, field_names=None):
+        loaded = getattr(self, '_loaded_values', {})
+        for name, attname in self._tracked_attnames().items():
+            if attname in self.__dict__ and (field_names is None or name in field_names or attname in field_names):
+                loaded[name] = self.__dict__[attname]
+        self._loaded_values = loaded
+
+    def loaded_value(self, field_name):
+        """Return the stored value of a tracked field as of the last load or save"""
+        loaded = getattr(self, '_loaded_values', {})
+        if field_name not in loaded:
+            # Deferred field or an instance built by hand, so read the stored row once
+            attnames = self._tracked_attnames()
+            row = type(self)._base_manager.filter(pk=self.pk).values(*attnames.values()).first() or {}
+            self._loaded_values = {**{name: row.get(attname) for name, attname in attnames.items()}, **loaded}
+        return self._loaded_values[field_name]
+
+    def has_changed(self, *field_names):
+        """Return True if any of the tracked fields differs from its stored value"""
+        if self._state.adding:
+            return True
+        attnames = self._tracked_attnames()
+        return any(getattr(self, attnames[name]) != self.loaded_value(name) for name in field_names)
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._snapshot_tracked_fields(fields)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot_tracked_fields(kwargs.get('update_fields'))
+
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
@@ -75,7 +198,7 @@ class CustomUserManager(BaseUserManager):
         
         # Assign admin role to superuser
         try:
-            admin_role = Role.objects.get(name=Role.ADMIN)
+            admin_role = Role.cached(Role.ADMIN)
             user.role = admin_role
             user.save(using=self._db)
         except Role.DoesNotExist:
@@ -84,7 +207,13 @@ class CustomUserManager(BaseUserManager):
             
         return user
 
-class CustomUser(AbstractUser):
+class CustomUser(FieldTrackingMixin, AbstractUser):
+    EMAIL_DIGEST_CHOICES = (
+        ('immediate', 'Immediately'),
+        ('hourly', 'Hourly digest'),
+        ('daily', 'Daily digest'),
+    )
+
     username = None
     email = models.EmailField(unique=True)
     role = models.ForeignKey(Role, on_delete=models.CASCADE, null=True, blank=True)
@@ -100,36 +229,45 @@ class CustomUser(AbstractUser):
                                              help_text="Additional managers for this user")
     no_manager = models.BooleanField(default=False, help_text="Check if this user does not require a manager")
     manually_modified = models.BooleanField(default=False, help_text="Indicates if user was manually modified in admin")
+    email_digest = models.CharField(
+        max_length=20,
+        choices=EMAIL_DIGEST_CHOICES,
+        default='immediate',
+        help_text="How often to receive issue status and comment notifications"
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
     objects = CustomUserManager()
 
+    # Fields whose loaded values save() and the signal handlers compare against
+    tracked_fields = ('email', 'first_name', 'last_name', 'role', 'manager', 'is_staff', 'is_superuser')
+
     def save(self, *args, **kwargs):
         # Check if this is a new user or if role/manager has changed
         is_new = self.pk is None
         if not is_new:
-            old_instance = CustomUser.objects.get(pk=self.pk)
-            role_changed = (not old_instance.role and self.role) or \
-                          (old_instance.role and not self.role) or \
-                          (old_instance.role and self.role and old_instance.role.name != self.role.name)
-            manager_changed = old_instance.manager != self.manager
+            role_changed = self.has_changed('role')
+            manager_changed = self.has_changed('manager')
+            old_role_id = self.loaded_value('role')
+            old_manager_id = self.loaded_value('manager')
         else:
-            role_changed = self.role is not None
-            manager_changed = self.manager is not None
+            role_changed = self.role_id is not None
+            manager_changed = self.manager_id is not None
             
         # If user is a superuser, ensure they have admin role
-        if self.is_superuser and (self.role is None or self.role.name != Role.ADMIN):
+        if self.is_superuser:
             try:
-                admin_role = Role.objects.get(name=Role.ADMIN)
-                self.role = admin_role
+                admin_role = Role.cached(Role.ADMIN)
+                if self.role_id != admin_role.pk:
+                    self.role = admin_role
             except Role.DoesNotExist:
                 # Role doesn't exist yet (might be during initial migration)
                 pass
                 
         # If no_manager is checked, clear the manager field
-        if self.no_manager and self.manager:
+        if self.no_manager and self.manager_id:
             self.manager = None
                 
         # Save the user
@@ -158,7 +296,7 @@ class CustomUser(AbstractUser):
             logger = logging.getLogger(__name__)
             
             try:
-                old_role = old_instance.role
+                old_role = Role.cached_by_pk(old_role_id) if old_role_id else None
                 new_role = self.role
                 
                 # Send the notification about the role change
@@ -176,7 +314,8 @@ class CustomUser(AbstractUser):
         if not is_new and manager_changed and self.manager:
             from perspectivetracker.utils import send_manager_assignment_email
             try:
-                send_manager_assignment_email(self, old_instance.manager)
+                previous_manager = CustomUser.objects.filter(pk=old_manager_id).first() if old_manager_id else None
+                send_manager_assignment_email(self, previous_manager)
             except Exception as e:
                 import logging
                 logger = logging.getLogger(__name__)
@@ -184,3 +323,20 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         return self.email
+
+class DigestEvent(models.Model):
+    """Notification held back for a user's next hourly or daily digest"""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='digest_events')
+    subject = models.TextField()
+    summary = models.TextField(blank=True)
+    url = models.URLField(max_length=500, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email}: {self.subject}"
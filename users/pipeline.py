@@ -13,7 +13,7 @@ def get_user_role(backend, user, response, *args, **kwargs):
     try:
         with transaction.atomic():
             # Get or create default role
-            default_role, _ = Role.objects.get_or_create(name='user')
+            default_role = Role.cached(Role.USER)
             
             # Get Auth0 email
             auth0_email = response.get('email')
@@ -35,16 +35,16 @@ def get_user_role(backend, user, response, *args, **kwargs):
                 # Check if user has admin role in Auth0
                 auth0_roles = response.get('roles', [])
                 if 'admin' in auth0_roles:
-                    admin_role, _ = Role.objects.get_or_create(name='admin')
+                    admin_role = Role.cached(Role.ADMIN)
                     user.role = admin_role
                     user.is_staff = True
                     user.is_superuser = True
                 elif 'staff' in auth0_roles:
-                    staff_role, _ = Role.objects.get_or_create(name='staff')
+                    staff_role = Role.cached(Role.STAFF)
                     user.role = staff_role
                     user.is_staff = True
                 elif 'client' in auth0_roles:
-                    client_role, _ = Role.objects.get_or_create(name='client')
+                    client_role = Role.cached(Role.CLIENT)
                     user.role = client_role
                 
                 user.save()
@@ -58,14 +58,14 @@ def get_user_role(backend, user, response, *args, **kwargs):
                 is_superuser = False
                 
                 if 'admin' in auth0_roles:
-                    role, _ = Role.objects.get_or_create(name='admin')
+                    role = Role.cached(Role.ADMIN)
                     is_staff = True
                     is_superuser = True
                 elif 'staff' in auth0_roles:
-                    role, _ = Role.objects.get_or_create(name='staff')
+                    role = Role.cached(Role.STAFF)
                     is_staff = True
                 elif 'client' in auth0_roles:
-                    role, _ = Role.objects.get_or_create(name='client')
+                    role = Role.cached(Role.CLIENT)
                 
                 # Create new user with appropriate role and permissions
                 user = User.objects.create(
@@ -1,8 +1,8 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from social_django.models import UserSocialAuth
-from users.models import Role
+from users.models import Role, AdminSettings
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +14,11 @@ def sync_auth0_user(sender, instance, created, **kwargs):
     """
     Automatically sync Auth0 user data when social auth record is created or updated
     """
+    # Make Auth0SyncMiddleware check the new roles on the next request
+    from django.core.cache import cache
+    from users.middleware import auth0_sync_cache_key
+    cache.delete(auth0_sync_cache_key(instance.user_id))
+    
     try:
         user = instance.user
         auth0_roles = instance.extra_data.get('roles', [])
@@ -29,16 +34,16 @@ def sync_auth0_user(sender, instance, created, **kwargs):
         is_superuser = False
         
         if 'admin' in auth0_roles:
-            new_role, _ = Role.objects.get_or_create(name='admin')
+            new_role = Role.cached(Role.ADMIN)
             is_staff = True
             is_superuser = True
         elif 'staff' in auth0_roles:
-            new_role, _ = Role.objects.get_or_create(name='staff')
+            new_role = Role.cached(Role.STAFF)
             is_staff = True
         elif 'client' in auth0_roles:
-            new_role, _ = Role.objects.get_or_create(name='client')
+            new_role = Role.cached(Role.CLIENT)
         else:
-            new_role, _ = Role.objects.get_or_create(name='user')
+            new_role = Role.cached(Role.USER)
         
         # Check if update is needed
         needs_update = (
@@ -83,7 +88,7 @@ def ensure_admin_staff_status(sender, instance, **kwargs):
         return
         
     # Ensure admins always have staff status
-    if instance.role and instance.role.name == 'admin':
+    if instance.role_id and instance.role_id == Role.cached(Role.ADMIN).pk:
         instance.is_staff = True
         instance.is_superuser = True
         logger.info(f"Ensuring admin {instance.email} has staff and superuser status")
@@ -102,21 +107,11 @@ def mark_user_as_manually_modified(sender, instance, **kwargs):
     if not instance.pk:
         return
         
-    # Get the original user from the database
-    try:
-        original_user = User.objects.get(pk=instance.pk)
-        
-        # Check if role, is_staff, or is_superuser has been changed
-        if (original_user.role != instance.role or 
-            original_user.is_staff != instance.is_staff or 
-            original_user.is_superuser != instance.is_superuser):
-            
-            # Mark as manually modified
-            instance.manually_modified = True
-            logger.info(f"User {instance.email} marked as manually modified in admin")
-            
-    except User.DoesNotExist:
-        pass
+    # Check if role, is_staff, or is_superuser has been changed since the user was loaded
+    if instance.has_changed('role', 'is_staff', 'is_superuser'):
+        # Mark as manually modified
+        instance.manually_modified = True
+        logger.info(f"User {instance.email} marked as manually modified in admin")
 
 @receiver(pre_save, sender=User)
 def sync_auth0_on_user_update(sender, instance, **kwargs):
@@ -128,6 +123,11 @@ def sync_auth0_on_user_update(sender, instance, **kwargs):
         # Skip if this is a new user
         if not instance.pk:
             return
+        
+        # Nothing to reconcile unless the role fields were edited; changes to the
+        # Auth0 roles themselves are applied by sync_auth0_user and the middleware
+        if not instance.has_changed('role', 'is_staff', 'is_superuser'):
+            return
             
         # Check if this is an Auth0 user
         auth0_user = UserSocialAuth.objects.filter(provider='auth0', user=instance).first()
@@ -143,45 +143,38 @@ def sync_auth0_on_user_update(sender, instance, **kwargs):
         is_superuser = False
         
         if 'admin' in auth0_roles:
-            new_role, _ = Role.objects.get_or_create(name='admin')
+            new_role = Role.cached(Role.ADMIN)
             is_staff = True
             is_superuser = True
         elif 'staff' in auth0_roles:
-            new_role, _ = Role.objects.get_or_create(name='staff')
+            new_role = Role.cached(Role.STAFF)
             is_staff = True
         elif 'client' in auth0_roles:
-            new_role, _ = Role.objects.get_or_create(name='client')
+            new_role = Role.cached(Role.CLIENT)
         else:
-            new_role, _ = Role.objects.get_or_create(name='user')
+            new_role = Role.cached(Role.USER)
         
         # If user has been manually modified, preserve all manually modified fields
         if instance.manually_modified:
             logger.info(f"User {instance.email} is manually modified - preserving all manually modified fields")
-            # Get the original user to check which fields were modified
-            try:
-                original_user = User.objects.get(pk=instance.pk)
-                
-                # Check if fields were modified by comparing with original values
-                role_modified = original_user.role != instance.role
-                staff_modified = original_user.is_staff != instance.is_staff
-                superuser_modified = original_user.is_superuser != instance.is_superuser
+            # Check which fields were modified since the user was loaded
+            role_modified = instance.has_changed('role')
+            staff_modified = instance.has_changed('is_staff')
+            superuser_modified = instance.has_changed('is_superuser')
+            
+            # Only update fields that weren't manually modified
+            if not role_modified:
+                instance.role = new_role
+            if not staff_modified:
+                instance.is_staff = is_staff
+            if not superuser_modified:
+                instance.is_superuser = is_superuser
                 
-                # Only update fields that weren't manually modified
-                if not role_modified:
-                    instance.role = new_role
-                if not staff_modified:
-                    instance.is_staff = is_staff
-                if not superuser_modified:
-                    instance.is_superuser = is_superuser
-                    
-                logger.info(
-                    f"Field modification status for {instance.email}: "
-                    f"role_modified={role_modified}, staff_modified={staff_modified}, "
-                    f"superuser_modified={superuser_modified}"
-                )
-                    
-            except User.DoesNotExist:
-                pass
+            logger.info(
+                f"Field modification status for {instance.email}: "
+                f"role_modified={role_modified}, staff_modified={staff_modified}, "
+                f"superuser_modified={superuser_modified}"
+            )
         else:
             # Update all fields
             instance.role = new_role
@@ -206,4 +199,41 @@ def sync_auth0_on_user_update(sender, instance, **kwargs):
         )
         
     except Exception as e:
-        logger.error(f"Error auto-syncing Auth0 user on update: {str(e)}") 
\ No newline at end of file
+        logger.error(f"Error auto-syncing Auth0 user on update: {str(e)}") 
+
+@receiver(post_save, sender=AdminSettings)
+@receiver(post_delete, sender=AdminSettings)
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_admin_cc_on_settings_change(sender, **kwargs):
+    """
+    Clear the cached admin CC list when admin settings or roles change
+    """
+    from perspectivetracker.utils import invalidate_admin_cc_emails
+    invalidate_admin_cc_emails()
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_admin_cc_on_user_change(sender, instance, **kwargs):
+    """
+    Clear the cached admin CC list when a user's admin status or email no
+    longer matches it
+    """
+    from django.core.cache import cache
+    from perspectivetracker.utils import ADMIN_CC_CACHE_KEY, invalidate_admin_cc_emails
+    
+    admin_emails = cache.get(ADMIN_CC_CACHE_KEY)
+    if admin_emails is None:
+        return
+    
+    # Saves such as last_login updates cannot change admin status
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not {'email', 'role', 'is_superuser'} & set(update_fields):
+        return
+    
+    if kwargs.get('signal') is post_delete:
+        is_admin = False
+    else:
+        is_admin = instance.is_superuser or bool(instance.role_id and instance.role_id == Role.cached(Role.ADMIN).pk)
+    if (instance.email in admin_emails) != is_admin:
+        invalidate_admin_cc_emails()
@@ -1,3 +1,377 @@
-from django.test import TestCase
+import io
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.tokens import default_token_generator
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from social_django.models import UserSocialAuth
+
+from perspectivetracker.query_budgets import QueryBudgetMixin, budget
+from perspectivetracker.utils import get_admin_cc_emails, send_email, send_personalized_emails
+from .middleware import Auth0SyncMiddleware
+from .models import AdminSettings, CustomUser, DigestEvent, OutboundEmail, Role
+
+
+@override_settings(EMAIL_USE_OUTBOX=True, EMAIL_OUTBOX_MAX_ATTEMPTS=3, EMAIL_OUTBOX_RETRY_DELAY=60)
+class OutboxTests(TestCase):
+    """Emails are queued on commit and delivered by the send_outbox worker"""
+
+    def setUp(self):
+        cache.clear()
+
+    def queue(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            send_email('Hello', 'emails/base_email.html', {}, ['someone@example.com'])
+        return OutboundEmail.objects.get()
+
+    def test_send_email_queues_without_sending(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            send_email('Hello', 'emails/base_email.html', {}, ['someone@example.com'])
+        self.assertEqual(OutboundEmail.objects.count(), 0)
+        self.assertEqual(len(callbacks), 1)
+
+        outbound = self.queue()
+        self.assertEqual(outbound.status, 'pending')
+        self.assertEqual(outbound.to, ['someone@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_worker_sends_queued_emails(self):
+        self.queue()
+        call_command('send_outbox', '--once', stdout=io.StringIO())
+
+        outbound = OutboundEmail.objects.get()
+        self.assertEqual(outbound.status, 'sent')
+        self.assertIsNotNone(outbound.sent_at)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Hello')
+
+    def test_failures_back_off_then_dead_letter(self):
+        outbound = self.queue()
+        failing = mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages',
+            side_effect=SMTPException('mail server unavailable'),
+        )
+        with failing:
+            call_command('send_outbox', '--once', stdout=io.StringIO())
+            outbound.refresh_from_db()
+            self.assertEqual(outbound.status, 'pending')
+            self.assertEqual(outbound.attempts, 1)
+            self.assertGreater(outbound.next_attempt_at, timezone.now())
+
+            # Not due yet, so the worker leaves it alone
+            call_command('send_outbox', '--once', stdout=io.StringIO())
+            outbound.refresh_from_db()
+            self.assertEqual(outbound.attempts, 1)
+
+            for _ in range(2):
+                OutboundEmail.objects.update(next_attempt_at=timezone.now())
+                call_command('send_outbox', '--once', stdout=io.StringIO())
+
+        outbound.refresh_from_db()
+        self.assertEqual(outbound.status, 'dead')
+        self.assertEqual(outbound.attempts, 3)
+        self.assertIn('mail server unavailable', outbound.last_error)
+        self.assertEqual(len(mail.outbox), 0)
+
+
+@override_settings(EMAIL_USE_OUTBOX=True)
+class PersonalizedEmailTests(TestCase):
+    """Per-recipient emails resolve users in one query and share renders"""
+
+    def send(self, recipients):
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                send_personalized_emails(
+                    'Status changed',
+                    'emails/status_change_notification.html',
+                    {'updater': self.updater},
+                    recipients,
+                )
+        return len(ctx.captured_queries)
+
+    def setUp(self):
+        cache.clear()
+        self.updater = CustomUser.objects.create_user(email='updater@example.com', first_name='Uma')
+
+    def test_query_count_does_not_grow_with_recipients(self):
+        for i in range(6):
+            CustomUser.objects.create_user(email=f'member{i}@example.com', first_name=f'Member{i}')
+        self.send(['updater@example.com'])
+        OutboundEmail.objects.all().delete()
+
+        small = self.send([f'member{i}@example.com' for i in range(2)])
+        large = self.send([f'member{i}@example.com' for i in range(6)] + ['guest@example.com'])
+
+        self.assertEqual(small, large)
+        emails = {outbound.to[0]: outbound for outbound in OutboundEmail.objects.all()}
+        self.assertEqual(len(emails), 7)
+        self.assertIn('Hello Member3,', emails['member3@example.com'].html_body)
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class AdminCCCacheTests(TestCase):
+    """The admin CC list is cached and cleared when admin membership changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_user(
+            email='admin@example.com',
+            role=Role.objects.get(name=Role.ADMIN),
+        )
+        self.staff = CustomUser.objects.create_user(
+            email='staff@example.com',
+            role=Role.objects.get(name=Role.STAFF),
+        )
+        self.settings = AdminSettings.objects.create(receive_all_emails=True)
+
+    def test_cached_list_costs_no_queries(self):
+        self.assertEqual(get_admin_cc_emails(), ['admin@example.com'])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_admin_cc_emails(), ['admin@example.com'])
+
+    def test_role_changes_refresh_the_list(self):
+        get_admin_cc_emails()
+        self.staff.role = Role.objects.get(name=Role.ADMIN)
+        self.staff.save()
+        self.assertCountEqual(get_admin_cc_emails(), ['admin@example.com', 'staff@example.com'])
+
+        self.admin.delete()
+        self.assertEqual(get_admin_cc_emails(), ['staff@example.com'])
+
+    def test_unrelated_saves_keep_the_cache(self):
+        get_admin_cc_emails()
+        self.staff.first_name = 'Sam'
+        self.staff.save()
+        with self.assertNumQueries(0):
+            get_admin_cc_emails()
+
+    def test_admin_settings_change_refreshes_the_list(self):
+        get_admin_cc_emails()
+        self.settings.receive_all_emails = False
+        self.settings.save()
+        self.assertEqual(get_admin_cc_emails(), [])
+
+
+@override_settings(EMAIL_USE_OUTBOX=True)
+class DigestTests(TestCase):
+    """Users who prefer digests get one email per period instead of one per event"""
+
+    def setUp(self):
+        cache.clear()
+        self.tester = CustomUser.objects.create_user(
+            email='tester@example.com', first_name='Tess', email_digest='hourly'
+        )
+        self.colleague = CustomUser.objects.create_user(email='colleague@example.com')
+
+    def notify(self, text):
+        with self.captureOnCommitCallbacks(execute=True):
+            send_email(
+                'New Comment on Issue: Audit',
+                'emails/base_email.html',
+                {},
+                ['tester@example.com', 'colleague@example.com'],
+                digest={'summary': text, 'url': 'https://example.com/issues/1/'},
+            )
+
+    def test_digest_users_are_held_back_and_sent_one_digest(self):
+        self.notify('First comment')
+        self.notify('Second comment')
+
+        self.assertEqual(
+            [outbound.to for outbound in OutboundEmail.objects.all()],
+            [['colleague@example.com'], ['colleague@example.com']],
+        )
+        self.assertEqual(DigestEvent.objects.filter(user=self.tester).count(), 2)
+
+        OutboundEmail.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('send_digests', '--frequency', 'daily', stdout=io.StringIO())
+        self.assertEqual(OutboundEmail.objects.count(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('send_digests', '--frequency', 'hourly', stdout=io.StringIO())
+        digest = OutboundEmail.objects.get()
+        self.assertEqual(digest.to, ['tester@example.com'])
+        self.assertIn('2 updates', digest.subject)
+        self.assertIn('First comment', digest.html_body)
+        self.assertIn('Second comment', digest.html_body)
+        self.assertFalse(DigestEvent.objects.exists())
+
+
+class Auth0SyncMiddlewareTests(TestCase):
+    """The Auth0 sync runs once and is skipped while nothing has changed"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email='tester@example.com',
+            role=Role.objects.get(name=Role.STAFF),
+            is_staff=True,
+        )
+        self.social = UserSocialAuth.objects.create(
+            user=self.user, provider='auth0', uid='auth0|tester', extra_data={'roles': ['staff']}
+        )
+        self.middleware = Auth0SyncMiddleware(lambda request: HttpResponse())
+
+    def request(self):
+        request = RequestFactory().get('/')
+        request.user = CustomUser.objects.get(pk=self.user.pk)
+        return request
+
+    def test_unchanged_claims_cost_no_queries(self):
+        request = self.request()
+        with CaptureQueriesContext(connection) as first:
+            self.middleware(request)
+        self.assertGreater(len(first.captured_queries), 0)
+
+        request = self.request()
+        with self.assertNumQueries(0):
+            self.middleware(request)
+
+    def test_users_without_auth0_are_cached_too(self):
+        self.social.delete()
+        self.middleware(self.request())
+        request = self.request()
+        with self.assertNumQueries(0):
+            self.middleware(request)
+
+    def test_saving_the_social_record_forces_a_new_sync(self):
+        self.middleware(self.request())
+
+        self.social.extra_data = {'roles': ['client']}
+        self.social.save()
+
+        request = self.request()
+        with CaptureQueriesContext(connection) as ctx:
+            self.middleware(request)
+        self.assertTrue(any('social_auth_usersocialauth' in query['sql'] for query in ctx.captured_queries))
+
+
+class RoleRegistryTests(TestCase):
+    """Role.cached() loads every role once and reloads after a role changes"""
+
+    def setUp(self):
+        Role.clear_cache()
+
+    def test_roles_are_loaded_once(self):
+        with self.assertNumQueries(1):
+            admin = Role.cached(Role.ADMIN)
+            Role.cached(Role.STAFF)
+        with self.assertNumQueries(0):
+            self.assertEqual(Role.cached(Role.ADMIN), admin)
+
+    def test_saving_a_role_clears_the_registry(self):
+        Role.cached(Role.ADMIN)
+        Role.objects.get(name=Role.USER).save()
+        with self.assertNumQueries(1):
+            Role.cached(Role.ADMIN)
+
+    def test_unknown_roles_are_not_created(self):
+        with self.assertRaises(Role.DoesNotExist):
+            Role.cached('owner')
+
+
+class CustomUserChangeTrackingTests(TestCase):
+    """Saving a loaded user compares against its loaded values instead of re-reading the row"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email='tester@example.com',
+            role=Role.objects.get(name=Role.STAFF),
+            is_staff=True,
+        )
+        UserSocialAuth.objects.create(
+            user=self.user, provider='auth0', uid='auth0|tester', extra_data={'roles': ['staff']}
+        )
+        Role.cached(Role.ADMIN)
+
+    def test_plain_save_is_a_single_update(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.first_name = 'Tess'
+        with CaptureQueriesContext(connection) as ctx:
+            user.save()
+        self.assertEqual([query['sql'].split()[0] for query in ctx.captured_queries], ['UPDATE'])
+
+    def test_has_changed_tracks_loaded_values(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertFalse(user.has_changed('role', 'manager'))
+
+        user.role = Role.cached(Role.CLIENT)
+        self.assertTrue(user.has_changed('role'))
+        self.assertEqual(user.loaded_value('role'), Role.cached(Role.STAFF).pk)
+
+        user.save()
+        self.assertFalse(user.has_changed('role'))
+        self.assertTrue(CustomUser.objects.get(pk=self.user.pk).manually_modified)
+
+    def test_refresh_from_db_takes_in_another_writers_changes(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        CustomUser.objects.filter(pk=self.user.pk).update(role=Role.cached(Role.CLIENT))
+
+        user.refresh_from_db()
+        self.assertFalse(user.has_changed('role'))
+        user.first_name = 'Tess'
+        user.save()
+        self.assertFalse(CustomUser.objects.get(pk=self.user.pk).manually_modified)
+
+    def test_role_change_does_not_reload_the_user(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.role = Role.cached(Role.CLIENT)
+        with CaptureQueriesContext(connection) as ctx:
+            user.save()
+        user_selects = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "users_customuser"' in query['sql']
+            and 'WHERE "users_customuser"."id" =' in query['sql']
+        ]
+        self.assertEqual(user_selects, [])
+
+
+def user_kwargs(data):
+    return {'user_id': data['user'].pk}
+
+
+def password_reset_kwargs(data):
+    return {
+        'uidb64': urlsafe_base64_encode(force_bytes(data['user'].pk)),
+        'token': default_token_generator.make_token(data['user']),
+    }
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Every users URL stays within its query budget however much data it shows"""
+    urlconf = 'users.urls'
+    budgets = {
+        'login': budget(6),
+        'logout': budget(5),
+        'profile': budget(7),
+        'edit_profile': budget(7),
+        'dashboard': budget(19),
+        'user_list': budget(10),
+        'user_create': budget(8),
+        'user_edit': budget(9, user_kwargs),
+        'user_delete': budget(9, user_kwargs),
+        'change_user_role': budget(10, user_kwargs),
+        'manager_assignment': budget(9),
+        'assign_manager': budget(11, user_kwargs),
+        'user_direct_reports': budget(11, lambda data: {'user_id': data['admin'].pk}),
+        'password_change': budget(7),
+        'password_change_done': budget(7),
+        'password_reset': budget(7),
+        'password_reset_done': budget(7),
+        'password_reset_confirm': budget(7, password_reset_kwargs),
+        'password_reset_complete': budget(7),
+        'test_email': budget(7),
+        'admin_settings': budget(11),
+    }
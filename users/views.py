@@ -188,28 +188,44 @@ def dashboard_view(request):
     from django.db.models import Q
     
     # Get all comments made by the user
-    user_comments = Comment.objects.filter(author=request.user).order_by('-created_at')
+    user_comments = Comment.objects.filter(author=request.user).select_related(
+        'issue__project', 'issue__milestone'
+    ).order_by('-created_at')
     
     # Get all issue modifications made by the user
-    user_modifications = IssueModification.objects.filter(modified_by=request.user).order_by('-created_at')
+    user_modifications = IssueModification.objects.filter(modified_by=request.user).select_related(
+        'issue__project', 'milestone'
+    ).order_by('-created_at')
     
     # Get issues assigned to the user
-    assigned_issues = Issue.objects.filter(assigned_to=request.user).order_by('-updated_at')
+    assigned_issues = Issue.objects.filter(assigned_to=request.user).select_related(
+        'project', 'milestone', 'page'
+    ).order_by('-updated_at')
     
     # Get milestones assigned to the user
-    assigned_milestones = Milestone.objects.filter(assigned_to=request.user).order_by('-updated_at')
+    assigned_milestones = Milestone.objects.filter(assigned_to=request.user).select_related(
+        'project__project_type'
+    ).order_by('-updated_at')
     
     # Get projects assigned to the user
-    assigned_projects = Project.objects.filter(assigned_to=request.user).order_by('-updated_at')
+    assigned_projects = Project.objects.filter(assigned_to=request.user).select_related(
+        'client', 'project_type'
+    ).order_by('-updated_at')
     
     # Get projects created by the user
-    created_projects = Project.objects.filter(created_by=request.user).order_by('-created_at')
+    created_projects = Project.objects.filter(created_by=request.user).select_related(
+        'client', 'project_type'
+    ).order_by('-created_at')
     
     # Get issues created by the user
-    created_issues = Issue.objects.filter(created_by=request.user).order_by('-created_at')
+    created_issues = Issue.objects.filter(created_by=request.user).select_related(
+        'project', 'milestone', 'page'
+    ).order_by('-created_at')
     
     # Get milestones created by the user
-    created_milestones = Milestone.objects.filter(created_by=request.user).order_by('-created_at')
+    created_milestones = Milestone.objects.filter(created_by=request.user).select_related(
+        'project__project_type'
+    ).order_by('-created_at')
     
     context = {
         'user_comments': user_comments,
@@ -293,7 +309,7 @@ def test_email(request):
 @admin_required
 def user_list(request):
     """View to list all users (for admin only)"""
-    users = CustomUser.objects.all().order_by('last_name', 'first_name')
+    users = CustomUser.objects.select_related('role').order_by('last_name', 'first_name')
     
     # Filter by role if requested
     role_filter = request.GET.get('role', '')
@@ -471,7 +487,7 @@ def manager_assignment_view(request):
     from perspectivetracker.utils import send_manager_assignment_email
     
     # Get list of all users
-    users = CustomUser.objects.all().order_by('last_name', 'first_name')
+    users = CustomUser.objects.select_related('role', 'manager').order_by('last_name', 'first_name')
     
     # Filter users by search or role if provided
     search_query = request.GET.get('search', '')
@@ -593,7 +609,7 @@ def user_direct_reports(request, user_id):
     user = get_object_or_404(CustomUser, id=user_id)
     
     # Get direct reports (users where this user is the manager)
-    direct_reports = CustomUser.objects.filter(manager=user).order_by('last_name', 'first_name')
+    direct_reports = CustomUser.objects.filter(manager=user).select_related('role').order_by('last_name', 'first_name')
     
     # Get all roles for filtering
     roles = Role.objects.all()